@@ -3,6 +3,10 @@ ASGI config for isp_management project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+The /api/events/ change stream (payments/events.py) is only served through
+this application, e.g. ``uvicorn isp_management.asgi:application``; under
+WSGI the frontend falls back to polling.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 """
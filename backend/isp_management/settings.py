@@ -11,7 +11,9 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
 from pathlib import Path
+from django.core.exceptions import ImproperlyConfigured
 from decouple import config
+from corsheaders.defaults import default_headers
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -55,6 +57,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'payments.middleware.RequestMetricsMiddleware',
 ]
 
 ROOT_URLCONF = 'isp_management.urls'
@@ -132,7 +135,7 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'payments.authentication.CachedJWTAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
@@ -181,4 +184,142 @@ CORS_ALLOWED_ORIGINS = [
 
 CORS_ALLOW_CREDENTIALS = True
 
+# Conditional GETs from the frontend (see payments/caching.py)
+CORS_ALLOW_HEADERS = (*default_headers, 'if-none-match')
+CORS_EXPOSE_HEADERS = ['ETag']
+
 AUTH_USER_MODEL = 'payments.User'
+
+# Audit logs: 'sync' inserts each Log row inside the request, 'buffered' queues
+# them and bulk inserts in batches (see payments/audit.py)
+AUDIT_LOG_MODE = config('AUDIT_LOG_MODE', default='sync')
+AUDIT_LOG_BATCH_SIZE = config('AUDIT_LOG_BATCH_SIZE', default=500, cast=int)
+AUDIT_LOG_FLUSH_INTERVAL = config('AUDIT_LOG_FLUSH_INTERVAL', default=2.0, cast=float)
+
+# Rows validated and inserted per transaction by the bulk import endpoints
+BULK_IMPORT_CHUNK_SIZE = config('BULK_IMPORT_CHUNK_SIZE', default=500, cast=int)
+
+# Rows fetched per database round trip by the streaming export endpoints
+EXPORT_CHUNK_SIZE = config('EXPORT_CHUNK_SIZE', default=2000, cast=int)
+
+# Cache: Redis when REDIS_URL is set (e.g. redis://127.0.0.1:6379/1),
+# otherwise a per-process in-memory cache
+REDIS_URL = config('REDIS_URL', default='')
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django_redis.cache.RedisCache',
+            'LOCATION': REDIS_URL,
+            'OPTIONS': {'CLIENT_CLASS': 'django_redis.client.DefaultClient'},
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'isp-management',
+        }
+    }
+
+# Seconds a cached list/stats response is kept (see payments/caching.py);
+# 0 disables response caching and conditional GETs. Off by default without
+# Redis: writes only invalidate the in-memory cache of their own process
+RESPONSE_CACHE_TIMEOUT = config('RESPONSE_CACHE_TIMEOUT', default=300 if REDIS_URL else 0, cast=int)
+
+# How paginated lists count their rows: 'exact', 'cached' or 'estimate' (see
+# payments/counting.py). 'estimate' counts exactly up to
+# PAGINATION_ESTIMATE_THRESHOLD rows, then estimates the payment and log
+# list counts from the rollup and the table
+PAGINATION_COUNT_STRATEGY = config('PAGINATION_COUNT_STRATEGY', default='exact')
+PAGINATION_COUNT_CACHE_TIMEOUT = config('PAGINATION_COUNT_CACHE_TIMEOUT', default=60, cast=int)
+PAGINATION_ESTIMATE_THRESHOLD = config('PAGINATION_ESTIMATE_THRESHOLD', default=10000, cast=int)
+
+# Change event stream (see payments/events.py); needs the ASGI application
+EVENT_BROKER = config('EVENT_BROKER', default='payments.events.InProcessBroker')
+EVENT_STREAM_KEEPALIVE = config('EVENT_STREAM_KEEPALIVE', default=15, cast=int)
+EVENT_STREAM_MAX_AGE = config('EVENT_STREAM_MAX_AGE', default=300, cast=int)
+
+# Seconds an authenticated user stays cached (see payments/authentication.py),
+# which is how long a role change or deactivation may take to apply; 0
+# disables the cache
+AUTH_USER_CACHE_TIMEOUT = config('AUTH_USER_CACHE_TIMEOUT', default=5, cast=int)
+
+# Request metrics (see payments/metrics.py): /metrics is served to these
+# addresses only, and requests slower than SLOW_REQUEST_THRESHOLD_MS or
+# running at least SLOW_REQUEST_QUERIES queries are logged (0 disables either)
+METRICS_ALLOWED_IPS = config(
+    'METRICS_ALLOWED_IPS', default='127.0.0.1,::1',
+    cast=lambda v: [s.strip() for s in v.split(',') if s.strip()]
+)
+SLOW_REQUEST_THRESHOLD_MS = config('SLOW_REQUEST_THRESHOLD_MS', default=1000, cast=int)
+SLOW_REQUEST_QUERIES = config('SLOW_REQUEST_QUERIES', default=50, cast=int)
+
+# Application logs go to the console; LOG_LEVEL=DEBUG shows the payment
+# filtering steps
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'simple': {'format': '{asctime} {levelname} {name}: {message}', 'style': '{'},
+    },
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler', 'formatter': 'simple'},
+    },
+    'loggers': {
+        'payments': {'handlers': ['console'], 'level': config('LOG_LEVEL', default='INFO')},
+    },
+}
+
+# Logs older than LOG_RETENTION_DAYS are moved into monthly gzip files in
+# LOG_ARCHIVE_DIR by the archive_logs command (see payments/archive.py)
+LOG_RETENTION_DAYS = config('LOG_RETENTION_DAYS', default=180, cast=int)
+LOG_ARCHIVE_DIR = config('LOG_ARCHIVE_DIR', default=str(BASE_DIR / 'log-archive'))
+
+# Audit log store (see payments/logstore.py): LOG_DATABASE is the path of a
+# separate SQLite database for the Log table, so log inserts don't take the
+# main database's write lock. Create it with `migrate --database=logs`
+LOG_DATABASE = config('LOG_DATABASE', default='')
+if LOG_DATABASE:
+    DATABASES['logs'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': LOG_DATABASE,
+    }
+DATABASE_ROUTERS = ['payments.logstore.LogRouter']
+
+# SQLite profiles: 'default' keeps the stock backend and only sets its busy
+# timeout. 'production' (see payments/backends/sqlite) begins transactions
+# IMMEDIATE, so a write waits for the lock instead of failing with "database
+# is locked", and sets WAL journaling, synchronous=NORMAL, a memory-mapped
+# file and a larger page cache on each connection, and keeps connections
+# open. Writes that still find the database busy are retried (see
+# payments/writes.py); SQLITE_RETRY_DELAY is the first delay in seconds
+SQLITE_PROFILE = config('SQLITE_PROFILE', default='default')
+SQLITE_BUSY_TIMEOUT_MS = config('SQLITE_BUSY_TIMEOUT_MS', default=5000, cast=int)
+SQLITE_WRITE_RETRIES = config('SQLITE_WRITE_RETRIES', default=3, cast=int)
+SQLITE_RETRY_DELAY = config('SQLITE_RETRY_DELAY', default=0.05, cast=float)
+SQLITE_PROFILES = {
+    'default': {
+        'OPTIONS': {'timeout': SQLITE_BUSY_TIMEOUT_MS / 1000},
+    },
+    'production': {
+        'ENGINE': 'payments.backends.sqlite',
+        'OPTIONS': {
+            'pragmas': {
+                'journal_mode': 'WAL',
+                'synchronous': 'NORMAL',
+                'busy_timeout': SQLITE_BUSY_TIMEOUT_MS,
+                'mmap_size': 256 * 1024 * 1024,
+                # Negative: KiB rather than pages
+                'cache_size': -64 * 1024,
+            },
+            'transaction_mode': 'IMMEDIATE',
+        },
+        'CONN_MAX_AGE': config('CONN_MAX_AGE', default=60, cast=int),
+        'CONN_HEALTH_CHECKS': True,
+    },
+}
+if SQLITE_PROFILE not in SQLITE_PROFILES:
+    raise ImproperlyConfigured(f"SQLITE_PROFILE must be one of {', '.join(SQLITE_PROFILES)}, not '{SQLITE_PROFILE}'")
+for database in DATABASES.values():
+    if database['ENGINE'] == 'django.db.backends.sqlite3':
+        database.update(SQLITE_PROFILES[SQLITE_PROFILE])
@@ -1,5 +1,6 @@
 from django.contrib import admin
-from .models import Payment, User, Customer, Log
+from .models import Payment, User, Customer, Log, DailyRevenue, CustomerLedger, Invoice
+from . import logstore
 
 @admin.register(User)
 class UserAdmin(admin.ModelAdmin):
@@ -23,11 +24,15 @@ class PaymentAdmin(admin.ModelAdmin):
 
 @admin.register(Log)
 class LogAdmin(admin.ModelAdmin):
-    list_display = ('user', 'action', 'description', 'created_at')
+    list_display = ('username', 'action', 'description', 'created_at')
     list_filter = ('action', 'created_at', 'user')
-    search_fields = ('user__username', 'action', 'description')
-    readonly_fields = ('user', 'action', 'description', 'created_at')
+    search_fields = ('username', 'action', 'description')
+    readonly_fields = ('user', 'username', 'action', 'description', 'created_at')
     ordering = ('-created_at',)
+
+    def get_queryset(self, request):
+        # Wherever the log store keeps them (see payments/logstore.py)
+        return super().get_queryset(request).using(logstore.database())
     
     def has_add_permission(self, request):
         return False  # Logs should only be created automatically
@@ -37,3 +42,32 @@ class LogAdmin(admin.ModelAdmin):
     
     def has_delete_permission(self, request, obj=None):
         return request.user.is_superuser  # Only superusers can delete logs
+
+@admin.register(DailyRevenue)
+class DailyRevenueAdmin(admin.ModelAdmin):
+    list_display = ('day', 'customer', 'created_by', 'amount', 'payment_count')
+    list_filter = ('day', 'created_by')
+    readonly_fields = ('day', 'customer', 'created_by', 'amount', 'payment_count')
+
+    def has_add_permission(self, request):
+        return False  # Rows are maintained from payments
+
+@admin.register(CustomerLedger)
+class CustomerLedgerAdmin(admin.ModelAdmin):
+    list_display = ('customer', 'period', 'expected', 'paid', 'balance', 'status')
+    list_filter = ('status', 'period')
+    search_fields = ('customer__name', 'customer__email')
+    readonly_fields = ('customer', 'period', 'expected', 'paid', 'balance', 'status')
+
+    def has_add_permission(self, request):
+        return False  # Rows are maintained from payments and customers
+
+@admin.register(Invoice)
+class InvoiceAdmin(admin.ModelAdmin):
+    list_display = ('number', 'customer', 'period', 'amount', 'due_date', 'created_at')
+    list_filter = ('period',)
+    search_fields = ('number', 'customer__name', 'customer__email')
+    readonly_fields = ('number', 'customer', 'period', 'amount', 'due_date', 'created_at')
+
+    def has_add_permission(self, request):
+        return False  # Issued by the generate_invoices command
@@ -1,4 +1,6 @@
 from django.apps import AppConfig
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_migrate
 
 
 class PaymentsConfig(AppConfig):
@@ -7,3 +9,7 @@ class PaymentsConfig(AppConfig):
     
     def ready(self):
         import payments.signals
+        from payments.search import ensure_search_index
+        post_migrate.connect(ensure_search_index, sender=self)
+        from payments.metrics import install_query_wrapper
+        connection_created.connect(install_query_wrapper)
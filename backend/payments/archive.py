@@ -0,0 +1,123 @@
+"""
+Retention for the audit log.
+
+``archive`` moves Log rows older than a cutoff out of the database into one
+gzip-compressed JSON Lines file per month (``logs-2024-05.jsonl.gz`` in
+``LOG_ARCHIVE_DIR``), which keeps the live table, its indexes and its search
+index small. Rows are moved in batches of the lowest ids: each batch is
+appended to its months' files as a new gzip member and fsynced, then deleted
+from the table. If the process dies between the two steps the next run
+appends the batch again; ``read`` drops the duplicate ids.
+
+``read`` loads one archived month on demand for the archived log endpoint,
+newest first like the live log list. Entries keep the username they were
+logged with, so they outlive the user.
+"""
+import datetime
+import gzip
+import json
+import os
+from collections import defaultdict
+from pathlib import Path
+
+from django.conf import settings
+
+from . import caching, logstore
+from .ledger import period_of
+from .models import Log
+
+ACTION_DISPLAY = dict(Log.ACTION_CHOICES)
+
+
+def archive_dir():
+    return Path(settings.LOG_ARCHIVE_DIR)
+
+
+def archive_path(month):
+    return archive_dir() / f'logs-{month:%Y-%m}.jsonl.gz'
+
+
+def archived_months():
+    """The first days of the months that have an archive, oldest first."""
+    months = []
+    for path in archive_dir().glob('logs-*.jsonl.gz'):
+        try:
+            months.append(datetime.date.fromisoformat(path.name[len('logs-'):-len('.jsonl.gz')] + '-01'))
+        except ValueError:
+            continue
+    return sorted(months)
+
+
+def to_record(row):
+    return {
+        'id': row['id'],
+        'user': row['user_id'],
+        'user_username': row['username'],
+        'action': row['action'],
+        'description': row['description'],
+        'created_at': row['created_at'].isoformat(),
+    }
+
+
+def append(month, records):
+    archive_dir().mkdir(parents=True, exist_ok=True)
+    with open(archive_path(month), 'ab') as raw:
+        with gzip.GzipFile(fileobj=raw, mode='ab') as compressed:
+            for record in records:
+                compressed.write(json.dumps(record, separators=(',', ':')).encode() + b'\n')
+        raw.flush()
+        os.fsync(raw.fileno())
+
+
+def archive(before, batch_size=5000):
+    """Move the logs created before the datetime ``before`` into the archive; returns how many."""
+    archived = 0
+    while True:
+        batch = list(
+            logstore.logs().filter(created_at__lt=before).order_by('id')
+            .values('id', 'user_id', 'username', 'action', 'description', 'created_at')[:batch_size]
+        )
+        if not batch:
+            break
+        by_month = defaultdict(list)
+        for row in batch:
+            by_month[period_of(row['created_at'])].append(to_record(row))
+        for month, records in sorted(by_month.items()):
+            append(month, records)
+        # The batch is exactly the matching rows up to its last id
+        logstore.logs().filter(created_at__lt=before, id__lte=batch[-1]['id']).delete()
+        archived += len(batch)
+    if archived:
+        caching.bump('logs')
+    return archived
+
+
+def read(month, user_id=None, action=None, search=None):
+    """
+    The archived entries of ``month``, newest first, optionally only those of
+    one user or action, or containing ``search`` (case-insensitively) in the
+    username, action or description like the live log search.
+    """
+    path = archive_path(month)
+    if not path.exists():
+        return None
+    search = search.lower() if search else None
+    entries, seen = [], set()
+    with gzip.open(path, 'rt', encoding='utf-8') as lines:
+        for line in lines:
+            entry = json.loads(line)
+            if entry['id'] in seen:
+                continue
+            seen.add(entry['id'])
+            if user_id is not None and entry['user'] != user_id:
+                continue
+            if action and entry['action'] != action:
+                continue
+            if search and not any(
+                search in (entry[field] or '').lower() for field in ('user_username', 'action', 'description')
+            ):
+                continue
+            entry['action_display'] = ACTION_DISPLAY.get(entry['action'], entry['action'])
+            entries.append(entry)
+    entries.sort(key=lambda entry: (entry['created_at'], entry['id']), reverse=True)
+    return entries
@@ -0,0 +1,194 @@
+"""
+Audit log writer used by the signal handlers in signals.py.
+
+``AUDIT_LOG_MODE = 'sync'`` (the default) inserts each Log row inside the
+request, exactly like calling ``Log.objects.create`` directly.
+
+``AUDIT_LOG_MODE = 'buffered'`` queues unsaved Log instances once the
+surrounding transaction commits and writes them with ``bulk_create`` in
+batches of ``AUDIT_LOG_BATCH_SIZE``. A background thread flushes the queue
+every ``AUDIT_LOG_FLUSH_INTERVAL`` seconds, or as soon as a full batch is
+waiting; with an interval of 0 no thread is started and full batches are
+flushed from the committing request instead. Whatever is left in the queue is
+flushed when the process exits.
+
+Buffered rows get their ``created_at`` when the batch is inserted, so it can
+lag the actual change by up to the flush interval.
+
+When the logs have their own database (see logstore.py), 'sync' rows are
+also inserted once the surrounding transaction commits, not inside it.
+Entries get the username of their user, from the authentication cache when
+it has the user.
+"""
+import atexit
+import logging
+import threading
+from collections import deque
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DatabaseError, close_old_connections, transaction
+
+from . import caching, events, logstore, writes
+from .authentication import user_cache_key
+from .models import Log, User
+
+logger = logging.getLogger(__name__)
+
+
+class LogWriter:
+    def __init__(self):
+        self._queue = deque()
+        self._flush_lock = threading.Lock()
+        self._worker_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._worker = None
+        self._registered_shutdown = False
+
+    @property
+    def mode(self):
+        return getattr(settings, 'AUDIT_LOG_MODE', 'sync')
+
+    @property
+    def batch_size(self):
+        return getattr(settings, 'AUDIT_LOG_BATCH_SIZE', 500)
+
+    @property
+    def flush_interval(self):
+        return getattr(settings, 'AUDIT_LOG_FLUSH_INTERVAL', 2.0)
+
+    def write(self, user_id, action, description, username=''):
+        """Record a log entry, either immediately or through the queue."""
+        entry = Log(user_id=user_id, username=username, action=action, description=description)
+        if self.mode != 'buffered':
+            self._after_commit(lambda: self.insert([entry]))
+            return
+        # Entries from a rolled back transaction are never queued
+        transaction.on_commit(lambda: self.enqueue(entry))
+
+    def write_many(self, entries):
+        """Record several ``(user_id, action, description)`` entries at once."""
+        entries = [
+            Log(user_id=user_id, action=action, description=description)
+            for user_id, action, description in entries
+        ]
+        if self.mode != 'buffered':
+            self._after_commit(lambda: self.insert(entries))
+            return
+        transaction.on_commit(lambda: [self.enqueue(entry) for entry in entries])
+
+    def _after_commit(self, insert):
+        # A separate log database has its own write lock, so there is no
+        # reason to hold the main one while inserting
+        if logstore.is_separate():
+            transaction.on_commit(insert)
+        else:
+            insert()
+
+    def insert(self, entries):
+        fill_usernames(entries)
+        database = logstore.database()
+
+        def insert():
+            if len(entries) == 1:
+                entries[0].save(using=database)
+            else:
+                for start in range(0, len(entries), self.batch_size):
+                    logstore.logs().bulk_create(entries[start:start + self.batch_size])
+
+        writes.run_write(insert, using=database)
+        self._written(entries)
+
+    def enqueue(self, entry):
+        if not self._registered_shutdown:
+            self._registered_shutdown = True
+            atexit.register(self.flush)
+        self._queue.append(entry)
+        full = len(self._queue) >= self.batch_size
+        if self.flush_interval > 0:
+            self._ensure_worker()
+            if full:
+                self._wakeup.set()
+        elif full:
+            self.flush()
+
+    def pending(self):
+        return len(self._queue)
+
+    def flush(self):
+        """Write every queued entry. Returns the number of rows inserted."""
+        written = 0
+        flushed = []
+        with self._flush_lock:
+            while self._queue:
+                batch = []
+                while self._queue and len(batch) < self.batch_size:
+                    batch.append(self._queue.popleft())
+                written += self._write_batch(batch)
+                flushed.extend(batch)
+        if written:
+            self._written(flushed)
+        return written
+
+    def _written(self, entries):
+        """Invalidate cached log responses and notify event streams of new rows."""
+        caching.bump('logs')
+        if len(entries) == 1:
+            events.publish('log', 'created', entries[0].pk, entries[0].user_id)
+            return
+        for user_id in {entry.user_id for entry in entries}:
+            events.publish('log', 'created', owner_id=user_id)
+
+    def _write_batch(self, batch):
+        fill_usernames(batch)
+        database = logstore.database()
+        try:
+            writes.run_write(lambda: logstore.logs().bulk_create(batch), using=database)
+            return len(batch)
+        except DatabaseError:
+            logger.warning('Bulk insert of %d log entries failed, retrying one by one', len(batch), exc_info=True)
+
+        # One bad row (e.g. a deleted user) shouldn't take the whole batch with it
+        written = 0
+        for entry in batch:
+            try:
+                writes.run_write(lambda: entry.save(using=database), using=database)
+                written += 1
+            except DatabaseError:
+                logger.exception('Dropping log entry %s: %s', entry.action, entry.description)
+        return written
+
+    def _ensure_worker(self):
+        if self._worker is not None and self._worker.is_alive():
+            return
+        with self._worker_lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, name='audit-log-writer', daemon=True)
+                self._worker.start()
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            close_old_connections()
+            try:
+                self.flush()
+            except Exception:
+                logger.exception('Audit log flush failed')
+
+
+def fill_usernames(entries):
+    """Set the username of entries that were written without one."""
+    missing = {entry.user_id for entry in entries if not entry.username and entry.user_id is not None}
+    if not missing:
+        return
+    cached = cache.get_many([user_cache_key(user_id) for user_id in missing])
+    usernames = {user.pk: user.username for user in cached.values()}
+    if missing - set(usernames):
+        usernames.update(User.objects.filter(pk__in=missing - set(usernames)).values_list('id', 'username'))
+    for entry in entries:
+        if not entry.username:
+            entry.username = usernames.get(entry.user_id, '')
+
+
+log_writer = LogWriter()
@@ -0,0 +1,65 @@
+"""
+JWT authentication that caches the token's user between requests.
+
+``CachedJWTAuthentication`` resolves the user from the cache when it can,
+so an authenticated request no longer starts with a SELECT on the users
+table. The cached instance only carries the fields request handling reads
+(the ``UserSummarySerializer`` fields: id, username, names, email,
+``user_type``, ``is_staff``, ``is_superuser``, ``is_active``); anything else,
+e.g. the password hash, is deferred and loaded on access, so it is never
+stored in the cache.
+
+The User post_save/post_delete handlers in signals.py delete the entry, but
+that reaches only the process's own cache under the default in-memory
+cache, and ``QuerySet.update()`` sends no signals. So entries are kept
+briefly, ``AUTH_USER_CACHE_TIMEOUT`` seconds (5 by default, 0 disables the
+cache): a role change, deactivation or deletion may take that long to
+apply everywhere.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+
+from .serializers import UserSummarySerializer
+
+
+def user_cache_key(user_id):
+    return f'auth:user:{user_id}'
+
+
+def invalidate_cached_user(user_id):
+    cache.delete(user_cache_key(user_id))
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    def get_user(self, validated_token):
+        # Revocation on password change compares against the password hash,
+        # which isn't cached
+        timeout = getattr(settings, 'AUTH_USER_CACHE_TIMEOUT', 5)
+        if timeout <= 0 or api_settings.CHECK_REVOKE_TOKEN or api_settings.USER_ID_FIELD != 'id':
+            return super().get_user(validated_token)
+
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_('Token contained no recognizable user identification'))
+
+        key = user_cache_key(user_id)
+        user = cache.get(key)
+        if user is None:
+            user = (
+                self.user_model.objects
+                .only(*UserSummarySerializer.Meta.fields)
+                .filter(pk=user_id)
+                .first()
+            )
+            if user is None:
+                raise AuthenticationFailed(_('User not found'), code='user_not_found')
+            cache.set(key, user, timeout)
+
+        if not user.is_active:
+            raise AuthenticationFailed(_('User is inactive'), code='user_inactive')
+        return user
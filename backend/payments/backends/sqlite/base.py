@@ -0,0 +1,50 @@
+"""
+The stock SQLite backend with two extra ``OPTIONS``, which the
+``production`` SQLite profile (``SQLITE_PROFILE`` in settings.py) sets:
+
+* ``pragmas``: a dict of ``PRAGMA name = value`` applied to every new
+  connection, e.g. ``{'journal_mode': 'WAL', 'busy_timeout': 5000}``.
+* ``transaction_mode``: ``DEFERRED`` (SQLite's default), ``IMMEDIATE`` or
+  ``EXCLUSIVE``, the kind of ``BEGIN`` that ``transaction.atomic`` issues.
+
+``IMMEDIATE`` matters for writers. A deferred transaction that has read
+takes the write lock only at its first write; if another connection holds
+it or has written since, SQLite fails with "database is locked" at once,
+without waiting out the busy timeout, since waiting could deadlock. An
+immediate transaction takes the lock at ``BEGIN``, where the busy timeout
+applies.
+
+Django 5.1 has both built in (``init_command`` and ``transaction_mode``);
+on that version this backend can be replaced by the stock one.
+"""
+from django.core.exceptions import ImproperlyConfigured
+from django.db.backends.sqlite3 import base
+
+TRANSACTION_MODES = ('DEFERRED', 'IMMEDIATE', 'EXCLUSIVE')
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    def get_connection_params(self):
+        kwargs = super().get_connection_params()
+        # Not arguments of sqlite3.connect()
+        kwargs.pop('pragmas', None)
+        kwargs.pop('transaction_mode', None)
+        return kwargs
+
+    def get_new_connection(self, conn_params):
+        conn = super().get_new_connection(conn_params)
+        for name, value in self.settings_dict['OPTIONS'].get('pragmas', {}).items():
+            conn.execute(f'PRAGMA {name} = {value}')
+        return conn
+
+    @property
+    def transaction_mode(self):
+        mode = self.settings_dict['OPTIONS'].get('transaction_mode', 'DEFERRED').upper()
+        if mode not in TRANSACTION_MODES:
+            raise ImproperlyConfigured(
+                f"transaction_mode must be one of {', '.join(TRANSACTION_MODES)}, not '{mode}'"
+            )
+        return mode
+
+    def _start_transaction_under_autocommit(self):
+        self.cursor().execute(f'BEGIN {self.transaction_mode}')
@@ -0,0 +1,112 @@
+"""
+Monthly invoice generation for active customers.
+
+``generate`` issues one Invoice per active customer with a package fee for a
+billing period (the first day of the month), for customers that existed
+before the month ended:
+
+* Customers are split into contiguous id ranges of ``chunk_size``, and each
+  range is one SELECT of the customers still lacking an invoice plus
+  ``bulk_create`` in batches, inside one transaction.
+* The (customer, period) unique constraint makes it idempotent: rerunning a
+  period, or running it while another run is in progress, inserts only the
+  missing invoices. Because finished chunks are committed and skipped by
+  the next run's NOT EXISTS filter, an interrupted run resumes where it
+  stopped.
+* With ``workers`` > 1 the ranges are spread over a process pool. That pays
+  off on a database that accepts concurrent writers (PostgreSQL); SQLite
+  serializes them, so one worker is as fast there.
+
+Invoice numbers are derived from the period and customer id
+(``INV-202405-000042``), so the same invoice always gets the same number.
+"""
+import datetime
+from concurrent.futures import ProcessPoolExecutor
+
+from django.db import connections
+
+from . import writes
+from .ledger import next_period, period_of
+from .models import Customer, Invoice
+
+# Days after the start of the period an invoice is due
+DUE_AFTER_DAYS = 10
+
+
+def invoice_number(customer_id, period):
+    return f'INV-{period:%Y%m}-{customer_id:06d}'
+
+
+def billable(period):
+    """Active customers with a fee, created before ``period`` ended, not yet invoiced for it."""
+    period_end = datetime.datetime.combine(next_period(period), datetime.time.min)
+    return (
+        Customer.objects
+        .filter(is_active=True, package_fee__gt=0, created_at__lt=period_end)
+        .exclude(invoices__period=period)
+    )
+
+
+def id_ranges(period, chunk_size):
+    """Split the billable customers into ``(first_id, last_id)`` ranges of ``chunk_size``."""
+    ids = list(billable(period).order_by('id').values_list('id', flat=True))
+    return [(chunk[0], chunk[-1]) for chunk in (ids[i:i + chunk_size] for i in range(0, len(ids), chunk_size))]
+
+
+def generate_range(period, first_id, last_id, batch_size=1000):
+    """Invoice the billable customers with ids in ``first_id..last_id``; returns the number created."""
+    due_date = period + datetime.timedelta(days=DUE_AFTER_DAYS)
+    customers = billable(period).filter(id__gte=first_id, id__lte=last_id).values_list('id', 'package_fee')
+    invoices = [
+        Invoice(customer_id=customer_id, number=invoice_number(customer_id, period),
+                period=period, amount=fee, due_date=due_date)
+        for customer_id, fee in customers
+    ]
+    issued = Invoice.objects.filter(period=period, customer__gte=first_id, customer__lte=last_id)
+
+    def insert():
+        # A concurrent run may have invoiced some of these since the SELECT,
+        # and bulk_create returns the skipped rows too: count what was added
+        before = issued.count()
+        Invoice.objects.bulk_create(invoices, batch_size=batch_size, ignore_conflicts=True)
+        return issued.count() - before
+
+    return writes.run_write(insert)
+
+
+def _generate_range_in_worker(args):
+    # Forked workers must not share the parent's database connections
+    connections.close_all()
+    try:
+        return generate_range(*args)
+    finally:
+        connections.close_all()
+
+
+def generate(period, chunk_size=5000, batch_size=1000, workers=1, progress=None):
+    """
+    Invoice every billable customer for the month containing ``period``.
+    ``progress`` is called with each finished range and its count. Returns
+    the number of invoices created.
+    """
+    period = period_of(period)
+    ranges = id_ranges(period, chunk_size)
+    jobs = [(period, first_id, last_id, batch_size) for first_id, last_id in ranges]
+    created = 0
+
+    if workers > 1 and len(jobs) > 1:
+        connections.close_all()
+        with ProcessPoolExecutor(workers) as executor:
+            results = executor.map(_generate_range_in_worker, jobs)
+            for (first_id, last_id), count in zip(ranges, results):
+                created += count
+                if progress:
+                    progress(first_id, last_id, count)
+        return created
+
+    for (first_id, last_id), job in zip(ranges, jobs):
+        count = generate_range(*job)
+        created += count
+        if progress:
+            progress(first_id, last_id, count)
+    return created
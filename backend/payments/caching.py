@@ -0,0 +1,170 @@
+"""
+Per-user response cache and conditional GETs for the list and stats endpoints.
+
+A cached response is keyed by view, user, the sorted query string and the
+current version of every data namespace the view reads (``customers``,
+``payments``, ``logs``, ``users``). Writes never delete cache entries: the
+signal handlers in signals.py (and the bulk importer and log writer, which
+bypass signals) call ``bump`` to increment a namespace version, so every key
+built afterwards is new and stale entries simply expire.
+
+The same versions make conditional GETs cheap: the ETag is a hash of the
+cache key, so a poll with a matching ``If-None-Match`` is answered 304
+without touching the database or the cached body. There is no
+Last-Modified: its one-second resolution would answer 304 to a poll made
+earlier in the same second as a change.
+
+So a view's response must be a function of the key: the user, the query
+string and the data in its namespaces. A view whose response also depends
+on anything else, typically today's date behind a default date range,
+passes it as ``extra`` (``cache_key_extra`` on ``CachedListMixin``), or
+every client would keep the old window until the next write.
+
+The backend is whatever ``CACHES['default']`` is: Redis when ``REDIS_URL`` is
+set, a per-process LocMemCache otherwise. ``RESPONSE_CACHE_TIMEOUT = 0``
+turns off both the cache and conditional GETs, since both trust versions
+that a bump in another process's LocMemCache never reaches; it is the
+default without Redis. Hits and misses are counted in the cache itself (so
+they are shared between processes on Redis) and returned by
+``get_counters``.
+"""
+import hashlib
+import time
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.utils.cache import patch_vary_headers
+from django.utils.http import parse_etags, quote_etag
+from rest_framework.response import Response
+
+KEY_PREFIX = 'response'
+HITS_KEY = f'{KEY_PREFIX}:hits'
+MISSES_KEY = f'{KEY_PREFIX}:misses'
+
+
+def version_key(namespace):
+    return f'{KEY_PREFIX}:version:{namespace}'
+
+
+def initial_version():
+    # A version key that was evicted restarts from the clock rather than 1,
+    # so it can't line up with entries cached under an earlier version
+    return int(time.time() * 1000)
+
+
+def increment(key, initial=0):
+    try:
+        return cache.incr(key)
+    except ValueError:
+        cache.add(key, initial, timeout=None)
+        return cache.incr(key)
+
+
+def get_versions(namespaces):
+    """Return the current versions of ``namespaces`` in one cache round trip."""
+    keys = [version_key(namespace) for namespace in namespaces]
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            cache.add(key, initial_version(), timeout=None)
+            versions[key] = cache.get(key)
+    return [versions[key] for key in keys]
+
+
+def bump(*namespaces):
+    """Invalidate every cached response that reads any of ``namespaces``."""
+    def do_bump():
+        for namespace in namespaces:
+            increment(version_key(namespace), initial_version())
+
+    do_bump()
+    # Bump again once the write commits, so a response cached from the
+    # pre-commit state in the meantime isn't served afterwards
+    if connection.in_atomic_block:
+        transaction.on_commit(do_bump)
+
+
+def response_key(view, request, versions, extra=()):
+    query = urlencode(sorted(request.query_params.lists()), doseq=True)
+    versions = '.'.join(str(version) for version in versions)
+    digest = hashlib.md5('|'.join([query, *map(str, extra)]).encode()).hexdigest()
+    return f'{KEY_PREFIX}:{view.__class__.__name__}:{request.user.pk}:{versions}:{digest}'
+
+
+def not_modified(request, etag):
+    etags = parse_etags(request.headers.get('If-None-Match', ''))
+    return '*' in etags or etag in etags or f'W/{etag}' in etags
+
+
+def set_validators(response, etag):
+    response['ETag'] = etag
+    # Responses are per user: browsers may store them but must revalidate
+    response['Cache-Control'] = 'private, no-cache'
+    patch_vary_headers(response, ['Authorization'])
+
+
+def cached_response(view, request, namespaces, compute, extra=()):
+    """
+    Answer a conditional GET with 304, else return the cached response for
+    this request, or ``compute()`` it and cache a 200. ``extra`` holds any
+    other values the response depends on (see the module docstring).
+    """
+    timeout = getattr(settings, 'RESPONSE_CACHE_TIMEOUT', 300)
+    if not timeout:
+        return compute()
+
+    versions = get_versions(namespaces)
+    key = response_key(view, request, versions, extra)
+    etag = quote_etag(hashlib.md5(key.encode()).hexdigest())
+
+    if not_modified(request, etag):
+        response = Response(status=304)
+        set_validators(response, etag)
+        return response
+
+    data = cache.get(key)
+    if data is not None:
+        increment(HITS_KEY)
+        response = Response(data)
+        response['X-Cache'] = 'HIT'
+    else:
+        response = compute()
+        increment(MISSES_KEY)
+        if response.status_code == 200:
+            cache.set(key, response.data, timeout)
+        response['X-Cache'] = 'MISS'
+
+    if response.status_code == 200:
+        set_validators(response, etag)
+    return response
+
+
+def get_counters():
+    counters = cache.get_many([HITS_KEY, MISSES_KEY])
+    hits, misses = counters.get(HITS_KEY, 0), counters.get(MISSES_KEY, 0)
+    total = hits + misses
+    return {
+        'hits': hits,
+        'misses': misses,
+        'hit_rate': round(hits / total, 4) if total else None,
+    }
+
+
+class CachedListMixin:
+    """
+    Serve ``list`` from the response cache; set ``cache_namespaces`` to the
+    data it reads and override ``cache_key_extra`` if it depends on more.
+    """
+    cache_namespaces = ()
+
+    def cache_key_extra(self):
+        return ()
+
+    def list(self, request, *args, **kwargs):
+        return cached_response(
+            self, request, self.cache_namespaces,
+            lambda: super(CachedListMixin, self).list(request, *args, **kwargs),
+            extra=self.cache_key_extra(),
+        )
@@ -0,0 +1,83 @@
+"""
+Time buckets for the payment chart endpoint.
+
+Each bucket is identified by the date it starts on (weeks start on Monday,
+like ``TruncWeek``) and has a display label, so clients can plot the
+response as is. ``bucket_range`` lists every bucket between two dates,
+which is what zero-fills the gaps in the aggregated series.
+
+Dates are local: with ``USE_TZ = False`` payment datetimes are stored as
+wall-clock times in ``TIME_ZONE`` (Asia/Karachi), and the DailyRevenue
+rollup is keyed by those local days.
+"""
+import datetime
+
+from django.db.models.functions import TruncDay, TruncMonth, TruncWeek, TruncYear
+
+from .ledger import next_period
+
+
+def _day_label(day):
+    return f'{day:%b} {day.day}'
+
+
+BUCKETS = {
+    # name: (truncation, buckets shown when no start date is given, label)
+    'day': (TruncDay, 30, _day_label),
+    'week': (TruncWeek, 12, lambda day: f'Week of {_day_label(day)}'),
+    'month': (TruncMonth, 12, lambda day: f'{day:%b %Y}'),
+    'year': (TruncYear, 5, lambda day: f'{day:%Y}'),
+}
+
+# Most buckets a single chart may zero-fill
+MAX_BUCKETS = 1000
+
+
+def bucket_start(day, bucket):
+    if bucket == 'week':
+        return day - datetime.timedelta(days=day.weekday())
+    if bucket == 'month':
+        return day.replace(day=1)
+    if bucket == 'year':
+        return day.replace(month=1, day=1)
+    return day
+
+
+def next_bucket(day, bucket):
+    if bucket == 'week':
+        return day + datetime.timedelta(days=7)
+    if bucket == 'month':
+        return next_period(day)
+    if bucket == 'year':
+        return day.replace(year=day.year + 1)
+    return day + datetime.timedelta(days=1)
+
+
+def default_start(end, bucket):
+    """The start of the default window: the last ``BUCKETS[bucket][1]`` buckets up to ``end``."""
+    start = bucket_start(end, bucket)
+    for _ in range(BUCKETS[bucket][1] - 1):
+        if bucket == 'week':
+            start -= datetime.timedelta(days=7)
+        elif bucket == 'month':
+            start = (start - datetime.timedelta(days=1)).replace(day=1)
+        elif bucket == 'year':
+            start = start.replace(year=start.year - 1)
+        else:
+            start -= datetime.timedelta(days=1)
+    return start
+
+
+def bucket_range(start, end, bucket):
+    """The starts of all buckets overlapping ``start``..``end``, or None past MAX_BUCKETS."""
+    starts, day = [], bucket_start(start, bucket)
+    while day <= end:
+        if len(starts) == MAX_BUCKETS:
+            return None
+        starts.append(day)
+        day = next_bucket(day, bucket)
+    return starts
+
+
+def label(day, bucket):
+    return BUCKETS[bucket][2](day)
@@ -0,0 +1,105 @@
+"""
+Count strategies for the page-number pagination.
+
+``CustomPagination`` reports ``count`` and ``total_pages``, which costs a
+``COUNT(*)`` over the filtered queryset on every page load; on large
+tables, and with a search term, that count can take longer than the page
+itself. A view's ``count_strategy`` (``PAGINATION_COUNT_STRATEGY`` when it
+sets none) picks how the count is obtained:
+
+* ``exact``: ``COUNT(*)`` every time.
+* ``cached``: the count is cached for ``PAGINATION_COUNT_CACHE_TIMEOUT``
+  seconds under the count query's SQL and parameters, so paging through the
+  same filters counts once. A count served from the cache may be that old.
+* ``estimate``: rows are counted up to ``PAGINATION_ESTIMATE_THRESHOLD``
+  (``COUNT(*)`` over a ``LIMIT``, so the cost is bounded); below it that is
+  the exact count. At the threshold the count is estimated instead: by the
+  view's ``estimate_count(queryset)`` if it has one (e.g. the payment list
+  sums the DailyRevenue rollup), else from the table statistics for an
+  unfiltered queryset, else it is counted as ``cached``.
+
+Responses carry ``count_is_estimate``, true when the count came from an
+estimate or the cache.
+"""
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+from django.db.models import Max, Min, QuerySet
+
+STRATEGIES = ('exact', 'cached', 'estimate')
+KEY_PREFIX = 'count'
+
+
+def get_strategy(view):
+    strategy = getattr(view, 'count_strategy', None) or settings.PAGINATION_COUNT_STRATEGY
+    if strategy not in STRATEGIES:
+        raise ValueError(f"Unknown count strategy '{strategy}'; choose from {', '.join(STRATEGIES)}")
+    return strategy
+
+
+def count_key(queryset):
+    # The filters decide the count, not the selected columns or the ordering
+    sql, params = queryset.values('pk').order_by().query.sql_with_params()
+    digest = hashlib.md5(f'{sql}:{params!r}'.encode()).hexdigest()
+    return f'{KEY_PREFIX}:{queryset.model._meta.label_lower}:{digest}'
+
+
+def cached_count(queryset):
+    key = count_key(queryset)
+    count = cache.get(key)
+    if count is not None:
+        return count, True
+    count = queryset.count()
+    cache.set(key, count, settings.PAGINATION_COUNT_CACHE_TIMEOUT)
+    return count, False
+
+
+def is_unfiltered(queryset):
+    query = queryset.query
+    return not query.where and not query.distinct and not query.is_sliced and not query.combinator
+
+
+def table_estimate(model, using):
+    """An approximate row count for ``model``'s table, without scanning it."""
+    connection = connections[using]
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass', [model._meta.db_table])
+            row = cursor.fetchone()
+        # -1 until the table was first analyzed
+        return row[0] if row and row[0] >= 0 else None
+    # Elsewhere the span of the primary key, two index lookups; deleted rows
+    # make it an overestimate
+    span = model._default_manager.using(using).aggregate(low=Min('pk'), high=Max('pk'))
+    if span['low'] is None:
+        return 0
+    return span['high'] - span['low'] + 1
+
+
+def estimated_count(queryset, view):
+    threshold = settings.PAGINATION_ESTIMATE_THRESHOLD
+    counted = queryset.order_by()[:threshold].count()
+    if counted < threshold:
+        return counted, False
+    estimate_count = getattr(view, 'estimate_count', None)
+    estimate = estimate_count(queryset) if estimate_count else None
+    if estimate is None and is_unfiltered(queryset):
+        estimate = table_estimate(queryset.model, queryset.db)
+    if estimate is None:
+        return cached_count(queryset)
+    # There are at least as many rows as were just counted
+    return max(estimate, threshold), True
+
+
+def count(queryset, view):
+    """``(count, is_estimate)`` for ``queryset`` by ``view``'s count strategy."""
+    if not isinstance(queryset, QuerySet):
+        return len(queryset), False
+    strategy = get_strategy(view)
+    if strategy == 'exact' or queryset.query.is_empty():
+        return queryset.count(), False
+    if strategy == 'estimate':
+        return estimated_count(queryset, view)
+    return cached_count(queryset)
@@ -0,0 +1,104 @@
+"""
+Change events pushed to clients over Server-Sent Events (``/api/events/``).
+
+The signal handlers in signals.py (plus the bulk importer and the audit log
+writer, which bypass signals) call ``publish`` when a payment, customer or
+log is created, updated or deleted. Events are handed to the broker once
+the surrounding transaction commits, so clients never refetch before the
+change is visible.
+
+An event is a small dict: ``{'kind': 'payment', 'action': 'created',
+'id': 12, 'owner_id': 3}``. ``id`` is None for batched writes (bulk
+imports, buffered logs). ``owner_id`` is the creating user for payments and
+the acting user for logs, and ``visible_to`` applies the same role rules as
+the list views: admins get everything, everyone gets customer events, and
+other users only get payment and log events they own.
+
+``EVENT_BROKER`` names the broker class. ``InProcessBroker`` fans events out
+to the streams served by the current process, which is enough for a single
+ASGI worker; a multi-process deployment needs a broker with the same
+``subscribe``/``unsubscribe``/``publish`` methods backed by something shared
+(e.g. Redis pub/sub). Streaming requires serving ``isp_management.asgi``.
+"""
+import asyncio
+import threading
+
+from django.conf import settings
+from django.db import transaction
+from django.utils.module_loading import import_string
+
+KINDS = ('payment', 'customer', 'log')
+
+# Events a slow client may fall behind by before newer ones are dropped;
+# clients only use events as a cue to refetch, so dropping is harmless
+SUBSCRIPTION_QUEUE_SIZE = 100
+
+
+class Subscription:
+    """One stream's queue, fed from any thread and read on the stream's event loop."""
+
+    def __init__(self, loop):
+        self.loop = loop
+        self.queue = asyncio.Queue(SUBSCRIPTION_QUEUE_SIZE)
+
+    def put(self, event):
+        self.loop.call_soon_threadsafe(self._put, event)
+
+    def _put(self, event):
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            pass
+
+    async def get(self, timeout):
+        return await asyncio.wait_for(self.queue.get(), timeout)
+
+
+class InProcessBroker:
+    def __init__(self):
+        self._subscriptions = set()
+        self._lock = threading.Lock()
+
+    def subscribe(self):
+        """Must be called from the event loop that will read the subscription."""
+        subscription = Subscription(asyncio.get_running_loop())
+        with self._lock:
+            self._subscriptions.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscriptions.discard(subscription)
+
+    def publish(self, event):
+        with self._lock:
+            subscriptions = list(self._subscriptions)
+        for subscription in subscriptions:
+            try:
+                subscription.put(event)
+            except RuntimeError:
+                # The stream's event loop is gone
+                self.unsubscribe(subscription)
+
+
+# One broker instance per EVENT_BROKER path
+_brokers = {}
+
+def get_broker():
+    path = getattr(settings, 'EVENT_BROKER', 'payments.events.InProcessBroker')
+    if path not in _brokers:
+        _brokers[path] = import_string(path)()
+    return _brokers[path]
+
+
+def publish(kind, action, id=None, owner_id=None):
+    event = {'kind': kind, 'action': action, 'id': id, 'owner_id': owner_id}
+    transaction.on_commit(lambda: get_broker().publish(event))
+
+
+def visible_to(event, user):
+    if user.is_superuser or user.is_staff:
+        return True
+    if event['kind'] == 'customer':
+        return True
+    return event['owner_id'] == user.id
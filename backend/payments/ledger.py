@@ -0,0 +1,236 @@
+"""
+Incremental maintenance of the CustomerLedger.
+
+Each row covers one customer and billing month (``period`` is the first day
+of the month): ``expected`` is the customer's ``package_fee``, ``paid`` the
+sum of the customer's payments dated in that month, ``balance`` is
+``expected - paid`` and ``status`` is ``paid`` (nothing due), ``partial``
+(something paid, something due) or ``unpaid``.
+
+* Payment signals in signals.py call ``apply_payment`` with +1/-1 (and -1/+1
+  for the previous/new values on update); the bulk importer calls
+  ``add_payments``. Each is one UPDATE on the (customer, period) row, which
+  is created on the first payment of the month.
+* A ``package_fee`` change updates ``expected`` from the current month on;
+  past months keep the fee that applied then.
+* New active customers get a row for the current month. ``ensure_period``
+  adds the zero-paid rows of active customers who have no row for a month
+  yet; the ``open_ledger_period`` command, scheduled for the start of each
+  month, runs it (through ``ensure_through``) for the current month and any
+  month missed since.
+* ``rebuild`` recomputes a range of months from payments and backs the
+  ``rebuild_ledger`` management command. It can only use today's fees.
+
+A row is overdue when it still has a balance after its month has ended.
+"""
+import datetime
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import IntegrityError
+from django.db.models import Case, DateField, F, Max, Min, Sum, Value, When
+from django.db.models.functions import TruncMonth
+from django.db.models.lookups import GreaterThan, LessThanOrEqual
+
+from . import caching, writes
+from .models import Customer, CustomerLedger, Payment
+
+PAID, PARTIAL, UNPAID = CustomerLedger.STATUS_PAID, CustomerLedger.STATUS_PARTIAL, CustomerLedger.STATUS_UNPAID
+OUTSTANDING = (PARTIAL, UNPAID)
+
+
+def period_of(value):
+    if isinstance(value, datetime.datetime):
+        value = value.date()
+    return value.replace(day=1)
+
+
+def current_period():
+    return period_of(datetime.date.today())
+
+
+def next_period(period):
+    return (period + datetime.timedelta(days=32)).replace(day=1)
+
+
+def month_range(start, end):
+    period = period_of(start)
+    while period <= end:
+        yield period
+        period = next_period(period)
+
+
+def status_for(paid, balance):
+    if balance <= 0:
+        return PAID
+    return PARTIAL if paid > 0 else UNPAID
+
+
+def status_expression(paid, balance):
+    """``status_for`` in SQL, over the values an UPDATE is about to write."""
+    return Case(
+        When(LessThanOrEqual(balance, 0), then=Value(PAID)),
+        When(GreaterThan(paid, 0), then=Value(PARTIAL)),
+        default=Value(UNPAID),
+    )
+
+
+def apply_delta(customer_id, period, amount):
+    paid, balance = F('paid') + amount, F('balance') - amount
+    updated = CustomerLedger.objects.filter(customer_id=customer_id, period=period).update(
+        paid=paid, balance=balance, status=status_expression(paid, balance)
+    )
+    if updated or amount <= 0:
+        # Removing from a missing row means the customer (and its ledger) is
+        # being deleted, so only additions create rows
+        return
+
+    expected = Customer.objects.filter(pk=customer_id).values_list('package_fee', flat=True).first()
+    if expected is None:
+        return
+    try:
+        writes.run_write(lambda: CustomerLedger.objects.create(
+            customer_id=customer_id, period=period, expected=expected, paid=amount,
+            balance=expected - amount, status=status_for(amount, expected - amount)
+        ))
+    except IntegrityError:
+        # Another request created the row first
+        apply_delta(customer_id, period, amount)
+
+
+def apply_payment(values, sign):
+    """Add (sign=1) or remove (sign=-1) one payment given its date/customer_id/amount."""
+    apply_delta(values['customer_id'], period_of(values['date']), Decimal(values['amount']) * sign)
+
+
+def add_payments(payments):
+    """Fold many new payments in with one UPDATE (or INSERT) per customer and month."""
+    totals = defaultdict(Decimal)
+    for payment in payments:
+        totals[payment.customer_id, period_of(payment.date)] += Decimal(payment.amount)
+    for (customer_id, period), amount in totals.items():
+        apply_delta(customer_id, period, amount)
+
+
+def set_expected(customer_id, fee):
+    """Apply a new package fee to the current and future months."""
+    balance = Value(fee) - F('paid')
+    CustomerLedger.objects.filter(customer_id=customer_id, period__gte=current_period()).update(
+        expected=fee, balance=balance, status=status_expression(F('paid'), balance)
+    )
+
+
+def unpaid_row(customer_id, period, fee):
+    fee = Decimal(fee)
+    return CustomerLedger(
+        customer_id=customer_id, period=period, expected=fee,
+        balance=fee, status=status_for(Decimal('0'), fee)
+    )
+
+
+def open_period(customers, period):
+    """Create the ``period`` rows of the given (new) active customers that have none."""
+    rows = [unpaid_row(customer.pk, period, customer.package_fee) for customer in customers if customer.is_active]
+    CustomerLedger.objects.bulk_create(rows, ignore_conflicts=True)
+
+
+def ensure_period(period, batch_size=1000):
+    """Create the rows of active customers that have none for ``period`` yet."""
+    period_end = datetime.datetime.combine(next_period(period), datetime.time.min)
+    missing = (
+        Customer.objects
+        .filter(is_active=True, created_at__lt=period_end)
+        .exclude(ledger__period=period)
+        .values_list('id', 'package_fee')
+    )
+    rows = [unpaid_row(customer_id, period, fee) for customer_id, fee in missing]
+    CustomerLedger.objects.bulk_create(rows, batch_size=batch_size, ignore_conflicts=True)
+    return len(rows)
+
+
+def ensure_through(period):
+    """
+    ``ensure_period`` for ``period`` and every month since the latest one in
+    the ledger, so overdue months exist even if a run was missed. Returns the
+    number of rows created.
+    """
+    # Payments and new customers create rows too, so the latest month may be
+    # incomplete: it is filled in again
+    latest = CustomerLedger.objects.aggregate(latest=Max('period'))['latest']
+    start = min(latest or period, period)
+    created = sum(ensure_period(month) for month in month_range(start, period))
+    if created:
+        caching.bump('customers')
+    return created
+
+
+def build_rows(customers, totals, periods):
+    """
+    Yield ledger row values for ``periods``.
+
+    ``customers`` holds ``(id, package_fee, is_active, created_at)`` tuples and
+    ``totals`` maps ``(customer_id, period)`` to the amount paid. Active
+    customers get a row for every month from the one they were created in;
+    inactive customers only for months they paid in.
+    """
+    for period in periods:
+        for customer_id, fee, is_active, created_at in customers:
+            paid = totals.get((customer_id, period), Decimal('0'))
+            if (is_active and period_of(created_at) <= period) or (customer_id, period) in totals:
+                yield {
+                    'customer_id': customer_id, 'period': period, 'expected': fee,
+                    'paid': paid, 'balance': fee - paid, 'status': status_for(paid, fee - paid),
+                }
+
+
+def payment_totals(payments):
+    """``{(customer_id, period): amount}`` for a Payment queryset, grouped in the database."""
+    grouped = (
+        payments
+        .annotate(period=TruncMonth('date', output_field=DateField()))
+        .values('customer_id', 'period')
+        .annotate(total=Sum('amount'))
+        .order_by()
+    )
+    return {(row['customer_id'], row['period']): row['total'] for row in grouped}
+
+
+def rebuild(start=None, end=None, batch_size=1000):
+    """
+    Recompute the ledger for the months ``start``..``end`` (dates in the first
+    and last month; default from the first customer or payment to the current
+    month). Returns the number of rows written.
+    """
+    if start is None:
+        firsts = [
+            Customer.objects.aggregate(first=Min('created_at'))['first'],
+            Payment.objects.aggregate(first=Min('date'))['first'],
+        ]
+        firsts = [first for first in firsts if first is not None]
+        if not firsts:
+            return 0
+        start = min(firsts)
+    start, end = period_of(start), period_of(end or datetime.date.today())
+    periods = list(month_range(start, end))
+
+    payments = Payment.objects.filter(
+        date__gte=datetime.datetime.combine(start, datetime.time.min),
+        date__lt=datetime.datetime.combine(next_period(end), datetime.time.min),
+    )
+    totals = payment_totals(payments)
+    customers = list(Customer.objects.values_list('id', 'package_fee', 'is_active', 'created_at'))
+
+    def replace():
+        CustomerLedger.objects.filter(period__gte=start, period__lte=end).delete()
+        written = 0
+        batch = []
+        for values in build_rows(customers, totals, periods):
+            batch.append(CustomerLedger(**values))
+            if len(batch) == batch_size:
+                CustomerLedger.objects.bulk_create(batch)
+                written += len(batch)
+                batch = []
+        CustomerLedger.objects.bulk_create(batch)
+        return written + len(batch)
+
+    return writes.run_write(replace)
@@ -0,0 +1,76 @@
+"""
+Where the audit log lives.
+
+By default Log rows are in the main database with everything else. Setting
+``LOG_DATABASE`` (a file path) adds a ``logs`` SQLite database and
+``LogRouter`` sends the Log model there, so audit inserts take that file's
+write lock instead of competing with payment and customer writes for the
+main one. In that mode the log writer (see audit.py) also waits for the
+change it records to commit before inserting, so a payment's transaction
+never holds the main database's lock while a log row is written.
+
+Create the table with ``migrate --database=logs``; ``move_logs`` moves the
+rows already in the main database over.
+
+Log rows keep the username they were written with and reference their
+user by id only (no foreign key constraint, no cascade), whether or not
+``LOG_DATABASE`` is set: the users table can't be joined from another
+database, and an audit log must outlive the users it records, like
+archived entries do. Deleting a user keeps their entries (it used to
+cascade) and adds a ``user_deleted`` one with the same id. Everything that reads or writes logs goes through
+``logs()``: the log list endpoints, LogAdmin, the writer and the archive.
+"""
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, router
+
+from .models import Log
+
+ALIAS = 'logs'
+LOG_MODEL = 'payments.log'
+
+
+def is_separate():
+    return ALIAS in settings.DATABASES
+
+
+def database():
+    """The alias of the database holding the logs."""
+    return router.db_for_write(Log)
+
+
+def logs():
+    return Log.objects.using(database())
+
+
+def is_log(model_or_obj):
+    return model_or_obj is not None and model_or_obj._meta.label_lower == LOG_MODEL
+
+
+class LogRouter:
+    """Routes the Log model to the ``logs`` database when one is configured."""
+
+    def db_for_read(self, model, **hints):
+        if not is_separate():
+            return None
+        if is_log(model):
+            return ALIAS
+        # Related objects are looked up in the instance's database unless a
+        # router says otherwise; a log's user is in the main one
+        if is_log(hints.get('instance')):
+            return DEFAULT_DB_ALIAS
+        return None
+
+    db_for_write = db_for_read
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Log.user references users across databases by id
+        if is_separate() and (is_log(obj1) or is_log(obj2)):
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # The main database keeps its (possibly empty) log table, which
+        # move_logs reads from
+        if db == ALIAS:
+            return app_label == 'payments' and model_name == 'log'
+        return None
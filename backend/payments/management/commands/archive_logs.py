@@ -0,0 +1,30 @@
+import datetime
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from payments import archive, logstore
+
+
+class Command(BaseCommand):
+    help = 'Move logs older than the retention period into monthly gzip JSON Lines archives'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, help='Keep this many days of logs (default: LOG_RETENTION_DAYS)')
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--dry-run', action='store_true', help='Only count the logs that would be archived')
+
+    def handle(self, *args, **options):
+        days = settings.LOG_RETENTION_DAYS if options['days'] is None else options['days']
+        if days < 0 or options['batch_size'] < 1:
+            raise CommandError('--days must not be negative and --batch-size must be positive')
+        before = datetime.datetime.combine(datetime.date.today() - datetime.timedelta(days=days), datetime.time.min)
+
+        if options['dry_run']:
+            count = logstore.logs().filter(created_at__lt=before).count()
+            self.stdout.write(f'{count} logs from before {before:%Y-%m-%d} would be archived')
+            return
+        count = archive.archive(before, batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Archived {count} logs from before {before:%Y-%m-%d} to {archive.archive_dir()}'
+        ))
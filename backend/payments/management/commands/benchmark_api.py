@@ -0,0 +1,253 @@
+import datetime
+import json
+import platform
+import statistics
+import time
+from pathlib import Path
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from payments import urls as payment_urls
+from payments.models import Customer, Log, Payment, User
+
+DEFAULT_BASELINE = Path(settings.BASE_DIR) / 'benchmark-baseline.json'
+
+# (label, method, url name, needs a pk of, query string or body).
+# Writes run in a transaction that is rolled back, so repeated runs see the
+# same data.
+SCENARIOS = [
+    ('payments', 'get', 'payment-list-create', None, {'page_size': 20}),
+    ('payments search', 'get', 'payment-list-create', None, {'page_size': 20, 'search': 'Customer 1'}),
+    ('payments cursor', 'get', 'payment-list-create', None, {'page_size': 20, 'cursor': ''}),
+    ('payment create', 'post', 'payment-list-create', None, 'payment'),
+    ('payment stats', 'get', 'payment-stats', None, {'period': 'monthly'}),
+    ('payment chart', 'get', 'payment-chart', None, {'bucket': 'day', 'by_user': '1'}),
+    ('payment bulk', 'post', 'payment-bulk-create', None, 'payments'),
+    ('payment export', 'get', 'payment-export', None, {'start_date': 'week_ago', 'end_date': 'today'}),
+    ('payment detail', 'get', 'payment-retrieve-update-destroy', Payment, None),
+    ('payment update', 'patch', 'payment-retrieve-update-destroy', Payment, {'description': 'Benchmark'}),
+    ('customers', 'get', 'customer-list-create', None, {'page_size': 20}),
+    ('customer create', 'post', 'customer-list-create', None, 'customer'),
+    ('customer ledger', 'get', 'customer-ledger', None, {'status': 'overdue', 'page_size': 20}),
+    ('customer bulk', 'post', 'customer-bulk-create', None, 'customers'),
+    ('customer detail', 'get', 'customer-retrieve-update-destroy', Customer, None),
+    ('user register', 'post', 'user-register', None, 'user'),
+    ('users', 'get', 'user-list', None, None),
+    ('current user', 'get', 'current-user', None, None),
+    ('user detail', 'get', 'user-retrieve-update-destroy', User, None),
+    ('logs', 'get', 'log-list', None, {'page_size': 20}),
+    ('log export', 'get', 'log-export', None, {'start_date': 'week_ago', 'end_date': 'today'}),
+    ('log archive', 'get', 'log-archive', None, None),
+    ('cache stats', 'get', 'cache-stats', None, None),
+    ('async payments', 'get', 'async-payment-list', None, {'page_size': 20}),
+    ('async payment detail', 'get', 'async-payment-detail', Payment, None),
+    ('async customers', 'get', 'async-customer-list', None, {'page_size': 20}),
+    ('async customer detail', 'get', 'async-customer-detail', Customer, None),
+    ('async logs', 'get', 'async-log-list', None, {'page_size': 20}),
+    ('async current user', 'get', 'async-current-user', None, None),
+    ('token obtain', 'post', 'token_obtain_pair', None, 'credentials'),
+    ('token refresh', 'post', 'token_refresh', None, 'refresh'),
+]
+
+# Routes that can't be timed request by request
+SKIPPED_ROUTES = {
+    'event-stream': 'an open-ended Server-Sent Events stream, served over ASGI only',
+}
+
+# Metrics compared against the baseline, and whether higher is worse
+COMPARED = {'throughput': False, 'p95': True, 'queries': True}
+
+
+def percentile(sorted_values, fraction):
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * fraction))]
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        'Time every API route (plus the token endpoints) and record throughput, p50/p95/p99 '
+        'latency and query counts to a JSON baseline, or compare a run against it'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=50, help='Timed requests per scenario')
+        parser.add_argument('--warmup', type=int, default=3, help='Untimed requests per scenario')
+        parser.add_argument('--user', help='Admin username to authenticate as (default: first superuser)')
+        parser.add_argument('--password', default='benchmark', help="The user's password, for the token endpoint")
+        parser.add_argument('--only', nargs='+', metavar='LABEL', help='Run only these scenarios')
+        parser.add_argument('--baseline', type=Path, default=DEFAULT_BASELINE)
+        parser.add_argument('--save', action='store_true', help='Write the results as the new baseline')
+        parser.add_argument('--tolerance', type=float, default=0.25,
+                            help='Allowed relative slowdown before a scenario is flagged')
+        parser.add_argument('--fail-on-regression', action='store_true', help='Exit with an error on regressions')
+        parser.add_argument('--with-cache', action='store_true', help='Keep the response cache enabled')
+
+    def handle(self, *args, **options):
+        users = User.objects.filter(username=options['user']) if options['user'] else User.objects.filter(is_superuser=True)
+        self.user = users.order_by('id').first()
+        if self.user is None:
+            raise CommandError('No admin user to authenticate as; run seed_data or pass --user')
+        if not Payment.objects.exists():
+            raise CommandError('No payments to benchmark against; run seed_data first')
+        self.password = options['password']
+        self.authorization = f'Bearer {RefreshToken.for_user(self.user).access_token}'
+        self.warn_about_uncovered_routes()
+
+        scenarios = [s for s in SCENARIOS if not options['only'] or s[0] in options['only']]
+        overrides = {'ALLOWED_HOSTS': [*settings.ALLOWED_HOSTS, 'testserver'], 'SLOW_REQUEST_THRESHOLD_MS': 0,
+                     'SLOW_REQUEST_QUERIES': 0}
+        if not options['with_cache']:
+            overrides['RESPONSE_CACHE_TIMEOUT'] = 0
+
+        self.stdout.write(f"{'scenario':<24}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'queries':>9}")
+        results = {}
+        with override_settings(**overrides):
+            self.client = Client()
+            for label, method, url_name, model, data in scenarios:
+                result = self.run_scenario(method, url_name, model, data, options['requests'], options['warmup'])
+                if result is None:
+                    self.stdout.write(f'{label:<24}skipped: password "{self.password}" rejected')
+                    continue
+                results[label] = result
+                self.stdout.write(
+                    f"{label:<24}{result['throughput']:>9.1f}{result['p50']:>9.1f}{result['p95']:>9.1f}"
+                    f"{result['p99']:>9.1f}{result['queries']:>9}"
+                )
+
+        report = {'meta': self.meta(options), 'scenarios': results}
+        if options['save']:
+            options['baseline'].write_text(json.dumps(report, indent=2) + '\n')
+            self.stdout.write(self.style.SUCCESS(f'Saved baseline to {options["baseline"]}'))
+            return
+
+        if not options['baseline'].exists():
+            self.stdout.write(f'No baseline at {options["baseline"]}; pass --save to record one')
+            return
+        regressions = self.compare(json.loads(options['baseline'].read_text()), report, options['tolerance'])
+        for regression in regressions:
+            self.stdout.write(self.style.ERROR(f'REGRESSION {regression}'))
+        if not regressions:
+            self.stdout.write(self.style.SUCCESS('No regressions against the baseline'))
+        elif options['fail_on_regression']:
+            raise CommandError(f'{len(regressions)} regressions against {options["baseline"]}')
+
+    def warn_about_uncovered_routes(self):
+        covered = {scenario[2] for scenario in SCENARIOS} | set(SKIPPED_ROUTES)
+        for pattern in payment_urls.urlpatterns:
+            if pattern.name not in covered:
+                self.stdout.write(self.style.WARNING(f'No benchmark scenario for route "{pattern.name}"'))
+
+    def meta(self, options):
+        return {
+            'date': datetime.datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'database': connection.vendor,
+            'requests': options['requests'],
+            'response_cache': options['with_cache'],
+            'rows': {
+                'customers': Customer.objects.count(),
+                'payments': Payment.objects.count(),
+                'logs': Log.objects.count(),
+            },
+        }
+
+    def request_data(self, data):
+        """Resolve the placeholders in a scenario's query string or body."""
+        today = datetime.date.today()
+        customer = Customer.objects.order_by('id').values_list('id', flat=True).first()
+        stamp = time.perf_counter_ns()
+        if data == 'payment':
+            return {'customer_id': customer, 'amount': '1000.00'}
+        if data == 'payments':
+            return [{'customer_id': customer, 'amount': '1000.00'}] * 50
+        if data == 'customer':
+            return {'name': 'Benchmark', 'email': f'benchmark-{stamp}@example.invalid', 'package_fee': '1000.00'}
+        if data == 'customers':
+            return [{'name': 'Benchmark', 'email': f'benchmark-{stamp}-{i}@example.invalid'} for i in range(50)]
+        if data == 'user':
+            return {'username': f'benchmark-{stamp}', 'password': 'benchmark-password', 'email': 'b@example.invalid'}
+        if data == 'credentials':
+            return {'username': self.user.username, 'password': self.password}
+        if data == 'refresh':
+            return {'refresh': str(RefreshToken.for_user(self.user))}
+        if isinstance(data, dict):
+            placeholders = {'today': today, 'week_ago': today - datetime.timedelta(days=7)}
+            return {key: placeholders.get(value, value) for key, value in data.items()}
+        return data
+
+    def send(self, method, url, data):
+        kwargs = {'HTTP_AUTHORIZATION': self.authorization}
+        if method == 'get':
+            response = self.client.get(url, data, **kwargs)
+        else:
+            response = getattr(self.client, method)(url, json.dumps(data), content_type='application/json', **kwargs)
+        if response.streaming:
+            # Exports are only done when the whole body has been produced
+            for _ in response.streaming_content:
+                pass
+        return response
+
+    def run_scenario(self, method, url_name, model, data, total, warmup):
+        kwargs = {'pk': model.objects.order_by('id').values_list('id', flat=True).first()} if model else {}
+        url = reverse(url_name, kwargs=kwargs)
+        latencies, queries = [], []
+
+        for i in range(warmup + total):
+            body = self.request_data(data)
+            with CaptureQueriesContext(connection) as captured:
+                start = time.perf_counter()
+                try:
+                    with transaction.atomic():
+                        response = self.send(method, url, body)
+                        if method != 'get':
+                            raise Rollback
+                except Rollback:
+                    pass
+                elapsed = time.perf_counter() - start
+            if response.status_code == 401 and url_name == 'token_obtain_pair':
+                return None
+            if response.status_code >= 400:
+                raise CommandError(f'{method.upper()} {url} returned {response.status_code}: {response.content[:200]!r}')
+            if i >= warmup:
+                latencies.append(elapsed)
+                queries.append(len(captured))
+
+        run_time = sum(latencies)
+        latencies.sort()
+        return {
+            'throughput': round(total / run_time, 1),
+            'p50': round(statistics.median(latencies) * 1000, 2),
+            'p95': round(percentile(latencies, 0.95) * 1000, 2),
+            'p99': round(percentile(latencies, 0.99) * 1000, 2),
+            'queries': max(queries),
+        }
+
+    def compare(self, baseline, report, tolerance):
+        regressions = []
+        for label, result in report['scenarios'].items():
+            previous = baseline['scenarios'].get(label)
+            if previous is None:
+                continue
+            for metric, higher_is_worse in COMPARED.items():
+                old, new = previous[metric], result[metric]
+                if metric == 'queries':
+                    # Query counts are deterministic, so any increase counts
+                    worse = new > old
+                elif higher_is_worse:
+                    worse = new > old * (1 + tolerance)
+                else:
+                    worse = new < old / (1 + tolerance)
+                if worse:
+                    regressions.append(f'{label}: {metric} {old} -> {new}')
+        return regressions
@@ -0,0 +1,106 @@
+import asyncio
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test import AsyncClient, Client, override_settings
+from django.urls import reverse
+from rest_framework_simplejwt.tokens import AccessToken
+
+from payments.models import User
+
+# (label, sync url name, async url name)
+ENDPOINTS = [
+    ('payments', 'payment-list-create', 'async-payment-list'),
+    ('customers', 'customer-list-create', 'async-customer-list'),
+    ('logs', 'log-list', 'async-log-list'),
+    ('current user', 'current-user', 'async-current-user'),
+]
+
+
+def summarize(latencies, elapsed):
+    latencies = sorted(latencies)
+    return {
+        'throughput': len(latencies) / elapsed,
+        'p50': statistics.median(latencies) * 1000,
+        'p99': latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000,
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare concurrent-request throughput and p50/p99 latency of the sync views '
+        '(WSGI handler, one thread per concurrent request) with their async variants '
+        '(ASGI handler, one event loop) against the configured database'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200, help='Requests per endpoint and mode')
+        parser.add_argument('--concurrency', type=int, default=20)
+        parser.add_argument('--user', help='Username to authenticate as (default: first superuser)')
+        parser.add_argument('--page-size', type=int, default=10)
+
+    def handle(self, *args, **options):
+        users = User.objects.filter(username=options['user']) if options['user'] else User.objects.filter(is_superuser=True)
+        user = users.order_by('id').first()
+        if user is None:
+            raise CommandError('No user to authenticate as; create one or pass --user')
+        self.authorization = f'Bearer {AccessToken.for_user(user)}'
+        self.params = {'page_size': options['page_size']}
+        total, concurrency = options['requests'], options['concurrency']
+
+        self.stdout.write(f'{total} requests per run, {concurrency} concurrent, as "{user.username}"')
+        self.stdout.write(f"{'endpoint':<14}{'mode':<7}{'req/s':>9}{'p50 ms':>9}{'p99 ms':>9}")
+        # Measure the views themselves, not the response cache
+        with override_settings(RESPONSE_CACHE_TIMEOUT=0, ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']):
+            for label, sync_name, async_name in ENDPOINTS:
+                for mode, result in (
+                    ('sync', self.run_sync(reverse(sync_name), total, concurrency)),
+                    ('async', asyncio.run(self.run_async(reverse(async_name), total, concurrency))),
+                ):
+                    self.stdout.write(
+                        f"{label:<14}{mode:<7}{result['throughput']:>9.1f}{result['p50']:>9.1f}{result['p99']:>9.1f}"
+                    )
+
+    def check_response(self, url, response):
+        if response.status_code != 200:
+            raise CommandError(f'GET {url} returned {response.status_code}')
+
+    def run_sync(self, url, total, concurrency):
+        local = threading.local()
+
+        def request(_):
+            if not hasattr(local, 'client'):
+                local.client = Client()
+            start = time.perf_counter()
+            response = local.client.get(url, self.params, HTTP_AUTHORIZATION=self.authorization)
+            self.check_response(url, response)
+            return time.perf_counter() - start
+
+        def close_connections(_):
+            connections.close_all()
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(concurrency) as executor:
+            latencies = list(executor.map(request, range(total)))
+            executor.map(close_connections, range(concurrency))
+        return summarize(latencies, time.perf_counter() - start)
+
+    async def run_async(self, url, total, concurrency):
+        client = AsyncClient()
+        slots = asyncio.Semaphore(concurrency)
+
+        async def request():
+            async with slots:
+                start = time.perf_counter()
+                response = await client.get(url, self.params, headers={'Authorization': self.authorization})
+                self.check_response(url, response)
+                return time.perf_counter() - start
+
+        start = time.perf_counter()
+        latencies = await asyncio.gather(*(request() for _ in range(total)))
+        return summarize(latencies, time.perf_counter() - start)
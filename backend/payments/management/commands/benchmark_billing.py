@@ -0,0 +1,49 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from payments import billing, ledger
+from payments.models import Customer
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        'Time invoice generation for a period over a number of synthetic customers. '
+        'Everything the benchmark creates is rolled back'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--customers', type=int, default=100000)
+        parser.add_argument('--chunk-size', type=int, default=5000)
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        total = options['customers']
+        period = ledger.current_period()
+        try:
+            with transaction.atomic():
+                start = time.perf_counter()
+                # Bypass the Customer signals; only invoicing is measured
+                Customer.objects.bulk_create(
+                    (Customer(name=f'Benchmark {i}', email=f'benchmark-{i}@example.invalid', package_fee=1000)
+                     for i in range(total)),
+                    batch_size=options['batch_size'],
+                )
+                self.stdout.write(f'Created {total} customers in {time.perf_counter() - start:.1f}s')
+
+                start = time.perf_counter()
+                created = billing.generate(period, chunk_size=options['chunk_size'], batch_size=options['batch_size'])
+                elapsed = time.perf_counter() - start
+                self.stdout.write(f'Issued {created} invoices in {elapsed:.1f}s ({created / elapsed:.0f}/s)')
+
+                start = time.perf_counter()
+                billing.generate(period, chunk_size=options['chunk_size'])
+                self.stdout.write(f'Rerun (nothing to issue) took {time.perf_counter() - start:.1f}s')
+                raise Rollback
+        except Rollback:
+            pass
@@ -0,0 +1,95 @@
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from rest_framework.renderers import JSONRenderer
+
+from payments import logstore
+from payments.fastlist import plan_for
+from payments.models import Customer, Log, Payment, User
+from payments.renderers import FastJSONRenderer
+from payments.serializers import CustomerSerializer, LogSerializer, PaymentSerializer
+from payments.sparse import narrow, projection
+
+# (label, serializer, fields, expand), as the list endpoints build them
+SHAPES = [
+    ('payments', PaymentSerializer, None, {}),
+    ('payments expanded', PaymentSerializer, None, {'customer': {'created_by': {}}, 'created_by': {}}),
+    ('payments sparse', PaymentSerializer, {'id': {}, 'amount': {}, 'date': {}, 'customer': {'name': {}}}, {}),
+    ('customers', CustomerSerializer, None, {}),
+    ('logs', LogSerializer, None, {}),
+]
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare rendering list pages through the serializers with the values_list plans of '
+        'payments/fastlist.py, over synthetic rows that are rolled back afterwards'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=100, help='Rows per page')
+        parser.add_argument('--repeat', type=int, default=50, help='Timed renders per shape and path')
+
+    def handle(self, *args, **options):
+        if min(options['rows'], options['repeat']) < 1:
+            raise CommandError('--rows and --repeat must be positive')
+        try:
+            with transaction.atomic(), transaction.atomic(using=logstore.database()):
+                self.create_rows(options['rows'])
+                self.stdout.write(f"{'shape':<20}{'serializer ms':>15}{'plan ms':>10}{'speedup':>9}{'bytes':>9}")
+                for label, serializer_class, fields, expand in SHAPES:
+                    self.compare(label, serializer_class, fields, expand, options['rows'], options['repeat'])
+                raise Rollback
+        except Rollback:
+            pass
+
+    def create_rows(self, total):
+        user = User.objects.create(username=f'benchmark-{time.time_ns()}', first_name='Bench', user_type='admin')
+        # bulk_create skips the signals; only rendering is measured
+        customers = Customer.objects.bulk_create(
+            Customer(name=f'Benchmark {i}', email=f'benchmark-{i}@example.invalid', phone='03001234567',
+                     address=f'House {i}', package_fee='1500.00', created_by=user)
+            for i in range(total)
+        )
+        Payment.objects.bulk_create(
+            Payment(customer=customer, amount='1500.00', description='Monthly fee', created_by=user)
+            for customer in customers
+        )
+        Log.objects.bulk_create(
+            Log(user=user, username=user.username, action='create_payment', description=f'Payment {i}')
+            for i in range(total)
+        )
+
+    def compare(self, label, serializer_class, fields, expand, total, repeat):
+        model = serializer_class.Meta.model
+        queryset = model.objects.order_by('-id')
+
+        def serializer_path():
+            serializer = serializer_class(fields=fields, expand=expand)
+            page = narrow(queryset, *projection(serializer, model))
+            data = serializer_class(list(page[:total]), many=True, fields=fields, expand=expand).data
+            return JSONRenderer().render(data)
+
+        def plan_path():
+            plan = plan_for(serializer_class, fields, expand)
+            return FastJSONRenderer().render(plan.render(list(plan.values(queryset)[:total])))
+
+        expected = serializer_path()
+        if plan_path() != expected:
+            raise CommandError(f'{label}: the plan renders different bytes than the serializer')
+        slow, fast = self.time(serializer_path, repeat), self.time(plan_path, repeat)
+        self.stdout.write(f'{label:<20}{slow:>15.2f}{fast:>10.2f}{slow / fast:>8.1f}x{len(expected):>9}')
+
+    def time(self, render, repeat):
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            render()
+            timings.append(time.perf_counter() - start)
+        return statistics.median(timings) * 1000
@@ -0,0 +1,162 @@
+import json
+import logging
+import random
+import statistics
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test import Client, override_settings
+from django.urls import reverse
+from rest_framework_simplejwt.tokens import AccessToken
+
+from payments.models import Customer, User
+
+STOCK = {'ENGINE': 'django.db.backends.sqlite3', 'OPTIONS': {}, 'CONN_MAX_AGE': 0, 'CONN_HEALTH_CHECKS': False}
+
+
+def percentile(latencies, fraction):
+    return latencies[min(len(latencies) - 1, int(len(latencies) * fraction))]
+
+
+@contextmanager
+def scratch_databases(directory, name, overrides):
+    """Point every database at a new, migrated file in ``directory`` with ``overrides`` applied."""
+    saved = {alias: dict(database) for alias, database in connections.settings.items()}
+
+    def reconnect():
+        # Connections are created from the settings dicts, which the wrappers share
+        for alias in connections.settings:
+            try:
+                del connections[alias]
+            except AttributeError:
+                pass
+
+    connections.close_all()
+    for alias, database in connections.settings.items():
+        database.update(overrides, NAME=str(Path(directory) / f'{name}-{alias}.sqlite3'))
+    reconnect()
+    try:
+        for alias in connections.settings:
+            call_command('migrate', database=alias, verbosity=0)
+        yield
+    finally:
+        connections.close_all()
+        for alias, database in connections.settings.items():
+            database.clear()
+            database.update(saved[alias])
+        reconnect()
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare concurrent payment POST throughput, latency and "database is locked" failures '
+        'of the stock SQLite backend without retries against each SQLITE_PROFILE '
+        '(see payments/backends/sqlite and payments/writes.py), on scratch databases'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--writers', type=int, default=8, help='Concurrent writing clients')
+        parser.add_argument('--writes', type=int, default=50, help='Payments POSTed per writer')
+        parser.add_argument('--readers', type=int, default=2, help='Clients listing payments meanwhile')
+
+    def handle(self, *args, **options):
+        if min(options['writers'], options['writes']) < 1 or options['readers'] < 0:
+            raise CommandError('--writers and --writes must be positive, --readers not negative')
+        profiles = settings.SQLITE_PROFILES.values()
+        engines = {STOCK['ENGINE'], *(profile.get('ENGINE', STOCK['ENGINE']) for profile in profiles)}
+        if any(database['ENGINE'] not in engines for database in connections.settings.values()):
+            raise CommandError('Every configured database must be SQLite')
+        runs = [
+            ('stock', STOCK, 0),
+            *((profile, {**STOCK, **overrides}, settings.SQLITE_WRITE_RETRIES)
+              for profile, overrides in settings.SQLITE_PROFILES.items()),
+        ]
+
+        self.stdout.write(
+            f"{options['writers']} writers x {options['writes']} payments, {options['readers']} readers"
+        )
+        self.stdout.write(
+            f"{'profile':<17}{'writes/s':>9}{'p50 ms':>9}{'p99 ms':>9}{'failed':>8}{'reads/s':>9}{'failed':>8}"
+        )
+        with tempfile.TemporaryDirectory() as directory:
+            for number, (label, overrides, retries) in enumerate(runs):
+                with (
+                    scratch_databases(directory, f'run{number}', overrides),
+                    override_settings(
+                        SQLITE_WRITE_RETRIES=retries, RESPONSE_CACHE_TIMEOUT=0,
+                        ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver'],
+                    ),
+                ):
+                    result = self.run(options['writers'], options['writes'], options['readers'])
+                self.stdout.write(
+                    f"{label:<17}{result['writes']:>9.1f}{result['p50']:>9.1f}{result['p99']:>9.1f}"
+                    f"{result['failed_writes']:>8}{result['reads']:>9.1f}{result['failed_reads']:>8}"
+                )
+
+    def run(self, writers, writes, readers):
+        user = User.objects.create_user(
+            username='benchmark', password='benchmark', user_type='admin', is_staff=True, is_superuser=True
+        )
+        customers = [
+            Customer.objects.create(name=f'Benchmark {i}', email=f'benchmark-{i}@example.invalid', created_by=user).pk
+            for i in range(20)
+        ]
+        authorization = f'Bearer {AccessToken.for_user(user)}'
+        url = reverse('payment-list-create')
+        done = threading.Event()
+
+        def write(_):
+            client = Client(raise_request_exception=False)
+            latencies, failed = [], 0
+            for _ in range(writes):
+                body = json.dumps({'customer_id': random.choice(customers), 'amount': '1500.00'})
+                start = time.perf_counter()
+                response = client.post(url, body, content_type='application/json', HTTP_AUTHORIZATION=authorization)
+                latencies.append(time.perf_counter() - start)
+                failed += response.status_code != 201
+            connections.close_all()
+            return latencies, failed
+
+        def read(_):
+            client = Client(raise_request_exception=False)
+            succeeded = failed = 0
+            while not done.is_set():
+                response = client.get(url, {'page_size': 20}, HTTP_AUTHORIZATION=authorization)
+                if response.status_code == 200:
+                    succeeded += 1
+                else:
+                    failed += 1
+            connections.close_all()
+            return succeeded, failed
+
+        # Failed requests would log a traceback each
+        logging.disable(logging.CRITICAL)
+        try:
+            with ThreadPoolExecutor(writers + readers) as executor:
+                reading = [executor.submit(read, i) for i in range(readers)]
+                start = time.perf_counter()
+                written = list(executor.map(write, range(writers)))
+                elapsed = time.perf_counter() - start
+                done.set()
+                read_counts = [future.result() for future in reading]
+        finally:
+            logging.disable(logging.NOTSET)
+
+        latencies = sorted(latency for thread_latencies, _ in written for latency in thread_latencies)
+        failed_writes = sum(failed for _, failed in written)
+        return {
+            'writes': (len(latencies) - failed_writes) / elapsed,
+            'p50': statistics.median(latencies) * 1000,
+            'p99': percentile(latencies, 0.99) * 1000,
+            'failed_writes': failed_writes,
+            'reads': sum(succeeded for succeeded, _ in read_counts) / elapsed,
+            'failed_reads': sum(failed for _, failed in read_counts),
+        }
@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from payments import billing, ledger
+from payments.management.commands.rebuild_ledger import parse_month
+
+
+class Command(BaseCommand):
+    help = (
+        'Issue the monthly invoices of all active customers for a billing period. '
+        'Safe to rerun: customers already invoiced for the period are skipped, '
+        'so an interrupted run resumes where it stopped'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--period', type=parse_month, help='Billing month (YYYY-MM, default: current)')
+        parser.add_argument('--chunk-size', type=int, default=5000, help='Customers per id range')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Invoices per INSERT')
+        parser.add_argument('--workers', type=int, default=1, help='Processes generating id ranges in parallel')
+
+    def handle(self, *args, **options):
+        if options['chunk_size'] < 1 or options['batch_size'] < 1 or options['workers'] < 1:
+            raise CommandError('--chunk-size, --batch-size and --workers must be positive')
+        period = options['period'] or ledger.current_period()
+
+        def progress(first_id, last_id, count):
+            if options['verbosity'] > 1:
+                self.stdout.write(f'Customers {first_id}-{last_id}: {count} invoices')
+
+        created = billing.generate(
+            period, chunk_size=options['chunk_size'], batch_size=options['batch_size'],
+            workers=options['workers'], progress=progress,
+        )
+        self.stdout.write(self.style.SUCCESS(f'Created {created} invoices for {period:%Y-%m}'))
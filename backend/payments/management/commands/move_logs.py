@@ -0,0 +1,48 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, transaction
+
+from payments import caching, logstore
+from payments.models import Log
+
+# Columns that tell a copy from a different entry with the same id
+IDENTITY = ('id', 'created_at', 'action', 'description')
+
+
+class Command(BaseCommand):
+    help = (
+        'Move the logs in the main database into the separate log database (LOG_DATABASE). '
+        'Ids are kept, so an interrupted run can simply be repeated'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        if not logstore.is_separate():
+            raise CommandError('LOG_DATABASE is not set; the logs already live in the main database')
+        source = Log.objects.using(DEFAULT_DB_ALIAS).order_by('id')
+        moved = 0
+        while True:
+            batch = list(source[:options['batch_size']])
+            if not batch:
+                break
+            self.check_copies(batch)
+            with transaction.atomic(using=logstore.database()):
+                # Rows copied by an interrupted run are already there
+                logstore.logs().bulk_create(batch, ignore_conflicts=True)
+            Log.objects.using(DEFAULT_DB_ALIAS).filter(id__lte=batch[-1].id).delete()
+            moved += len(batch)
+            self.stdout.write(f'Moved {moved} logs')
+        if moved:
+            caching.bump('logs')
+        self.stdout.write(self.style.SUCCESS(f'Moved {moved} logs to the log database'))
+
+    def check_copies(self, batch):
+        copied = set(logstore.logs().filter(id__in=[log.id for log in batch]).values_list(*IDENTITY))
+        ids = {row[0] for row in copied}
+        for log in batch:
+            if log.id in ids and tuple(getattr(log, column) for column in IDENTITY) not in copied:
+                raise CommandError(
+                    f'The log database already has a different entry with id {log.id}; '
+                    'move the logs before the application writes to LOG_DATABASE'
+                )
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from payments import ledger
+from payments.management.commands.rebuild_ledger import parse_month
+
+
+class Command(BaseCommand):
+    help = (
+        'Create the unpaid ledger rows of active customers for a month and any month missed '
+        'since the latest one in the ledger. Schedule it for the start of every month; '
+        'safe to rerun'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--period', type=parse_month, help='Last month to open (YYYY-MM, default: current)')
+
+    def handle(self, *args, **options):
+        period = options['period'] or ledger.current_period()
+        created = ledger.ensure_through(period)
+        self.stdout.write(self.style.SUCCESS(f'Created {created} ledger rows through {period:%Y-%m}'))
@@ -0,0 +1,28 @@
+import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from payments import ledger
+
+
+def parse_month(value):
+    try:
+        return datetime.date.fromisoformat(f'{value[:7]}-01')
+    except ValueError:
+        raise CommandError(f'Invalid month "{value}", expected YYYY-MM')
+
+
+class Command(BaseCommand):
+    help = 'Rebuild or backfill the customer ledger from payments (optionally for a range of months)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start', type=parse_month, help='First month to rebuild (YYYY-MM)')
+        parser.add_argument('--end', type=parse_month, help='Last month to rebuild (YYYY-MM, default: current)')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        start, end = options['start'], options['end']
+        if start and end and start > end:
+            raise CommandError('--start must not be after --end')
+        written = ledger.rebuild(start=start, end=end, batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Wrote {written} ledger rows'))
@@ -0,0 +1,147 @@
+import datetime
+import random
+import time
+from contextlib import contextmanager
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from payments import caching, ledger, logstore, rollup
+from payments.models import Customer, Log, Payment, User
+
+PACKAGE_FEES = [Decimal(fee) for fee in ('500.00', '800.00', '1000.00', '1500.00', '2500.00', '4000.00')]
+LOG_ACTIONS = [action for action, _ in Log.ACTION_CHOICES]
+DESCRIPTIONS = ['', '', 'Monthly fee', 'Advance payment', 'Partial payment', 'Reconnection charge']
+
+
+@contextmanager
+def explicit_timestamps(*fields):
+    """Let bulk_create write the given auto_now_add fields instead of stamping them with now()."""
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
+
+
+class Command(BaseCommand):
+    help = (
+        'Insert synthetic users, customers, payments and logs for load testing, then rebuild '
+        'the revenue rollup and customer ledger. The same --seed produces the same data'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=20, help='Employees (plus one admin)')
+        parser.add_argument('--customers', type=int, default=50000)
+        parser.add_argument('--payments', type=int, default=2000000)
+        parser.add_argument('--logs', type=int, default=5000000)
+        parser.add_argument('--days', type=int, default=365, help='Spread timestamps over this many past days')
+        parser.add_argument('--password', default='benchmark', help='Password of the seeded users')
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        if min(options['users'], options['customers'], options['days'], options['batch_size']) < 1:
+            raise CommandError('--users, --customers, --days and --batch-size must be positive')
+        self.random = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        self.now = datetime.datetime.now().replace(microsecond=0)
+        self.span = options['days'] * 86400
+        # Runs are told apart by a prefix so seeding twice doesn't clash on unique fields
+        self.prefix = f'seed{options["seed"]}-{int(time.time())}'
+
+        users = self.timed('users', lambda: self.create_users(options['users'], options['password']))
+        customers = self.timed('customers', lambda: self.create_customers(options['customers'], users))
+        self.timed('payments', lambda: self.create_payments(options['payments'], customers))
+        self.timed('logs', lambda: self.create_logs(options['logs'], users))
+        self.timed('rollup and ledger', self.rebuild)
+
+    def timed(self, label, step):
+        start = time.perf_counter()
+        result = step()
+        self.stdout.write(f'{label}: {time.perf_counter() - start:.1f}s')
+        return result
+
+    def timestamp(self):
+        return self.now - datetime.timedelta(seconds=self.random.randrange(self.span))
+
+    def batches(self, total, make):
+        """Yield lists of up to batch_size objects built by ``make(index)``."""
+        for start in range(0, total, self.batch_size):
+            yield [make(i) for i in range(start, min(start + self.batch_size, total))]
+
+    def create_users(self, count, password):
+        # Hashing is slow by design, so every seeded user shares one hash
+        template = User()
+        template.set_password(password)
+        users = [
+            User(username=f'{self.prefix}-employee{i}', email=f'{self.prefix}-employee{i}@example.com',
+                 password=template.password, user_type='employee')
+            for i in range(count)
+        ]
+        users.append(User(
+            username=f'{self.prefix}-admin', email=f'{self.prefix}-admin@example.com', password=template.password,
+            user_type='admin', is_staff=True, is_superuser=True,
+        ))
+        with transaction.atomic():
+            User.objects.bulk_create(users)
+        users = list(User.objects.filter(username__startswith=f'{self.prefix}-').values_list('id', flat=True))
+        self.stdout.write(f'Created {len(users)} users with password "{password}"')
+        return users
+
+    def create_customers(self, count, users):
+        def make(i):
+            return Customer(
+                name=f'Customer {i}', email=f'{self.prefix}-customer{i}@example.com',
+                phone=f'03{self.random.randrange(10 ** 9):09d}', address=f'House {i}, Street {i % 97}',
+                package_fee=self.random.choice(PACKAGE_FEES), is_active=self.random.random() > 0.1,
+                created_by_id=self.random.choice(users), created_at=self.timestamp(),
+            )
+
+        with explicit_timestamps(Customer._meta.get_field('created_at')), transaction.atomic():
+            for batch in self.batches(count, make):
+                Customer.objects.bulk_create(batch)
+        return list(
+            Customer.objects.filter(email__startswith=f'{self.prefix}-')
+            .values_list('id', 'created_by_id', 'package_fee')
+        )
+
+    def create_payments(self, count, customers):
+        def make(i):
+            customer_id, created_by_id, fee = self.random.choice(customers)
+            return Payment(
+                customer_id=customer_id, created_by_id=created_by_id, date=self.timestamp(),
+                amount=fee if self.random.random() > 0.2 else (fee / 2).quantize(Decimal('0.01')),
+                description=self.random.choice(DESCRIPTIONS),
+            )
+
+        with explicit_timestamps(Payment._meta.get_field('date')), transaction.atomic():
+            for batch in self.batches(count, make):
+                Payment.objects.bulk_create(batch)
+
+    def create_logs(self, count, users):
+        usernames = dict(User.objects.filter(id__in=users).values_list('id', 'username'))
+
+        def make(i):
+            action = self.random.choice(LOG_ACTIONS)
+            user_id = self.random.choice(users)
+            return Log(
+                user_id=user_id, username=usernames[user_id], action=action, created_at=self.timestamp(),
+                description=f'{action.replace("_", " ").capitalize()}: record {i}',
+            )
+
+        with (
+            explicit_timestamps(Log._meta.get_field('created_at')),
+            transaction.atomic(using=logstore.database()),
+        ):
+            for batch in self.batches(count, make):
+                Log.objects.bulk_create(batch)
+
+    def rebuild(self):
+        # bulk_create skips the signals that maintain these
+        rollup.rebuild(batch_size=self.batch_size)
+        ledger.rebuild(batch_size=self.batch_size)
+        caching.bump('payments', 'customers', 'logs', 'users')
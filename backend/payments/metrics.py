@@ -0,0 +1,155 @@
+"""
+Per-view request telemetry, recorded by ``RequestMetricsMiddleware`` and
+served in the Prometheus text format at ``/metrics``.
+
+For every request the middleware measures wall time, the number and total
+time of database queries (through ``record_query``, an execute wrapper on
+every connection that finds the request through a context variable, so
+queries run by ``sync_to_async`` on another thread count too), the time
+spent turning model instances into primitives (``TimedSerializerMixin``) and
+the response size. They are added to ``registry``, keyed by the URL name of
+the view (``payment-list-create``), the method and the status code.
+Requests slower than ``SLOW_REQUEST_THRESHOLD_MS`` or running more than
+``SLOW_REQUEST_QUERIES`` queries are also logged as warnings on the
+``payments.metrics`` logger.
+
+The registry lives in the process: each worker of a multi-process server
+exposes its own counters, which Prometheus sums when scraping every worker.
+"""
+import bisect
+import contextvars
+import threading
+import time
+from collections import defaultdict
+
+# Upper bounds (seconds) of the request duration histogram buckets
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+
+class RequestMetrics:
+    """What one request spent its time on."""
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.queries = 0
+        self.db_time = 0.0
+        self.serializer_time = 0.0
+        self.serializing = False
+
+    def __call__(self, execute, sql, params, many, context):
+        # Installed as a database execute wrapper
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_time += time.perf_counter() - start
+            self.queries += 1
+
+
+_current = contextvars.ContextVar('request_metrics', default=None)
+
+
+def current():
+    """The RequestMetrics of the request being handled, or None."""
+    return _current.get()
+
+
+def activate(request_metrics):
+    return _current.set(request_metrics)
+
+
+def deactivate(token):
+    _current.reset(token)
+
+
+def record_query(execute, sql, params, many, context):
+    request_metrics = current()
+    if request_metrics is None:
+        return execute(sql, params, many, context)
+    return request_metrics(execute, sql, params, many, context)
+
+
+def install_query_wrapper(connection, **kwargs):
+    """``connection_created`` receiver adding ``record_query`` to a connection once."""
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+class ViewStats:
+    def __init__(self):
+        self.requests = 0
+        self.duration = 0.0
+        self.queries = 0
+        self.db_time = 0.0
+        self.serializer_time = 0.0
+        self.response_bytes = 0
+        self.buckets = [0] * len(DURATION_BUCKETS)
+
+
+class Registry:
+    def __init__(self):
+        self._stats = defaultdict(ViewStats)
+        self._lock = threading.Lock()
+
+    def record(self, view, method, status, duration, request_metrics, response_bytes):
+        bucket = bisect.bisect_left(DURATION_BUCKETS, duration)
+        with self._lock:
+            stats = self._stats[view, method, status]
+            stats.requests += 1
+            stats.duration += duration
+            stats.queries += request_metrics.queries
+            stats.db_time += request_metrics.db_time
+            stats.serializer_time += request_metrics.serializer_time
+            stats.response_bytes += response_bytes
+            if bucket < len(stats.buckets):
+                stats.buckets[bucket] += 1
+
+    def snapshot(self):
+        with self._lock:
+            return {key: vars(stats).copy() | {'buckets': list(stats.buckets)} for key, stats in self._stats.items()}
+
+    def clear(self):
+        with self._lock:
+            self._stats.clear()
+
+
+registry = Registry()
+
+
+def _labels(view, method, status, **extra):
+    labels = {'view': view, 'method': method, 'status': status, **extra}
+    return ','.join(f'{name}="{value}"' for name, value in labels.items())
+
+
+COUNTERS = [
+    # (metric name, help, ViewStats attribute)
+    ('http_request_db_queries_total', 'Database queries run while handling requests.', 'queries'),
+    ('http_request_db_duration_seconds_total', 'Time spent in database queries.', 'db_time'),
+    ('http_request_serializer_duration_seconds_total', 'Time spent serializing model instances.', 'serializer_time'),
+    ('http_response_size_bytes_total', 'Bytes of response bodies (excluding streamed responses).', 'response_bytes'),
+]
+
+
+def render():
+    """The registry in the Prometheus text exposition format."""
+    snapshot = sorted(registry.snapshot().items())
+    lines = [
+        '# HELP http_request_duration_seconds Wall time of requests per view.',
+        '# TYPE http_request_duration_seconds histogram',
+    ]
+    for (view, method, status), stats in snapshot:
+        cumulative = 0
+        for bound, count in zip(DURATION_BUCKETS, stats['buckets']):
+            cumulative += count
+            lines.append(f'http_request_duration_seconds_bucket{{{_labels(view, method, status, le=bound)}}} {cumulative}')
+        lines.append(f'http_request_duration_seconds_bucket{{{_labels(view, method, status, le="+Inf")}}} {stats["requests"]}')
+        lines.append(f'http_request_duration_seconds_sum{{{_labels(view, method, status)}}} {stats["duration"]:.6f}')
+        lines.append(f'http_request_duration_seconds_count{{{_labels(view, method, status)}}} {stats["requests"]}')
+
+    for name, help_text, attribute in COUNTERS:
+        lines += [f'# HELP {name} {help_text}', f'# TYPE {name} counter']
+        for (view, method, status), stats in snapshot:
+            value = stats[attribute]
+            value = f'{value:.6f}' if isinstance(value, float) else value
+            lines.append(f'{name}{{{_labels(view, method, status)}}} {value}')
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,68 @@
+import logging
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+from . import metrics
+
+logger = logging.getLogger('payments.metrics')
+
+
+class RequestMetricsMiddleware:
+    """
+    Records wall time, query count and time, serializer time and response
+    size of every request in ``metrics.registry`` and logs slow requests
+    (see payments/metrics.py).
+
+    Sync and async: under ASGI an adapted sync middleware would run every
+    request, async views included, through the one thread of
+    ``sync_to_async``.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        request_metrics = metrics.RequestMetrics()
+        token = metrics.activate(request_metrics)
+        try:
+            response = self.get_response(request)
+        finally:
+            metrics.deactivate(token)
+        self.record(request, response, request_metrics)
+        return response
+
+    async def __acall__(self, request):
+        request_metrics = metrics.RequestMetrics()
+        token = metrics.activate(request_metrics)
+        try:
+            response = await self.get_response(request)
+        finally:
+            metrics.deactivate(token)
+        self.record(request, response, request_metrics)
+        return response
+
+    def record(self, request, response, request_metrics):
+        duration = time.perf_counter() - request_metrics.start
+        match = request.resolver_match
+        view = match.view_name if match and match.view_name else 'unresolved'
+        size = 0 if response.streaming else len(response.content)
+        metrics.registry.record(view, request.method, response.status_code, duration, request_metrics, size)
+        self.log_if_slow(request, response, view, duration, request_metrics, size)
+
+    def log_if_slow(self, request, response, view, duration, request_metrics, size):
+        threshold = settings.SLOW_REQUEST_THRESHOLD_MS
+        max_queries = settings.SLOW_REQUEST_QUERIES
+        if (threshold and duration * 1000 >= threshold) or (max_queries and request_metrics.queries >= max_queries):
+            logger.warning(
+                'Slow request: %s %s (%s) %s in %.0f ms, %d queries in %.0f ms, serializer %.0f ms, %d bytes',
+                request.method, request.get_full_path(), view, response.status_code, duration * 1000,
+                request_metrics.queries, request_metrics.db_time * 1000, request_metrics.serializer_time * 1000, size,
+            )
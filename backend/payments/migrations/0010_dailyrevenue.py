@@ -0,0 +1,56 @@
+# Generated by Django 4.2.7 on 2026-10-17 07:04
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+from django.db.models.functions import TruncDay
+
+
+def backfill_daily_revenue(apps, schema_editor):
+    Payment = apps.get_model('payments', 'Payment')
+    DailyRevenue = apps.get_model('payments', 'DailyRevenue')
+    grouped = (
+        Payment.objects
+        .annotate(day=TruncDay('date', output_field=models.DateField()))
+        .values('day', 'created_by_id', 'customer_id')
+        .annotate(total=models.Sum('amount'), total_count=models.Count('id'))
+        .order_by()
+    )
+    DailyRevenue.objects.bulk_create(
+        [
+            DailyRevenue(
+                day=row['day'], created_by_id=row['created_by_id'], customer_id=row['customer_id'],
+                amount=row['total'], payment_count=row['total_count']
+            )
+            for row in grouped.iterator()
+        ],
+        batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payments', '0009_search_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyRevenue',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('amount', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('payment_count', models.IntegerField(default=0)),
+                ('created_by', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='daily_revenue', to=settings.AUTH_USER_MODEL)),
+                ('customer', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_revenue', to='payments.customer')),
+            ],
+            options={
+                'verbose_name': 'Daily Revenue',
+                'verbose_name_plural': 'Daily Revenue',
+                'ordering': ['-day'],
+                'indexes': [models.Index(fields=['day', 'created_by', 'customer'], name='daily_revenue_key_idx'), models.Index(fields=['created_by', 'day'], name='daily_revenue_created_by_idx')],
+            },
+        ),
+        migrations.RunPython(backfill_daily_revenue, migrations.RunPython.noop),
+    ]
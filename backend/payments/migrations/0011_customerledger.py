@@ -0,0 +1,57 @@
+# Generated by Django 4.2.7 on 2026-10-17 07:22
+
+import datetime
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def backfill_ledger(apps, schema_editor):
+    from payments.ledger import build_rows, month_range, payment_totals
+
+    Customer = apps.get_model('payments', 'Customer')
+    Payment = apps.get_model('payments', 'Payment')
+    CustomerLedger = apps.get_model('payments', 'CustomerLedger')
+    customers = list(Customer.objects.values_list('id', 'package_fee', 'is_active', 'created_at'))
+    if not customers:
+        return
+    firsts = [created_at for _, _, _, created_at in customers]
+    first_payment = Payment.objects.aggregate(first=models.Min('date'))['first']
+    if first_payment is not None:
+        firsts.append(first_payment)
+    periods = month_range(min(firsts), datetime.date.today())
+    rows = build_rows(customers, payment_totals(Payment.objects.all()), periods)
+    CustomerLedger.objects.bulk_create((CustomerLedger(**values) for values in rows), batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payments', '0010_dailyrevenue'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CustomerLedger',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period', models.DateField()),
+                ('expected', models.DecimalField(decimal_places=2, default=0, max_digits=10)),
+                ('paid', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('balance', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('status', models.CharField(choices=[('paid', 'Paid'), ('partial', 'Partially Paid'), ('unpaid', 'Unpaid')], default='unpaid', max_length=10)),
+                ('customer', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ledger', to='payments.customer')),
+            ],
+            options={
+                'verbose_name': 'Customer Ledger',
+                'verbose_name_plural': 'Customer Ledger',
+                'ordering': ['-period', '-balance', 'id'],
+                'indexes': [models.Index(fields=['period', 'status', '-balance'], name='ledger_period_status_idx'), models.Index(fields=['status', 'period'], name='ledger_status_period_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='customerledger',
+            constraint=models.UniqueConstraint(fields=('customer', 'period'), name='ledger_customer_period_unique'),
+        ),
+        migrations.RunPython(backfill_ledger, migrations.RunPython.noop),
+    ]
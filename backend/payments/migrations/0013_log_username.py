@@ -0,0 +1,35 @@
+# Generated by Django 4.2.7 on 2026-10-17 08:06
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+from django.db.models.functions import Coalesce
+
+
+def backfill_usernames(apps, schema_editor):
+    Log = apps.get_model('payments', 'Log')
+    User = apps.get_model('payments', 'User')
+    db = schema_editor.connection.alias
+    username = User.objects.using(db).filter(pk=models.OuterRef('user_id')).values('username')[:1]
+    Log.objects.using(db).update(username=Coalesce(models.Subquery(username), models.Value('')))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payments', '0012_invoice'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='log',
+            name='username',
+            field=models.CharField(blank=True, default='', max_length=150),
+        ),
+        migrations.AlterField(
+            model_name='log',
+            name='user',
+            field=models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='logs', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.RunPython(backfill_usernames, migrations.RunPython.noop),
+    ]
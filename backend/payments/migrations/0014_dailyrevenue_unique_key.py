@@ -0,0 +1,40 @@
+# Generated by Django 4.2.7 on 2026-10-17 08:57
+
+from django.db import migrations, models
+
+
+def merge_duplicate_keys(apps, schema_editor):
+    DailyRevenue = apps.get_model('payments', 'DailyRevenue')
+    db = schema_editor.connection.alias
+    rows = DailyRevenue.objects.using(db).exclude(created_by=None)
+    duplicates = (
+        rows
+        .values('day', 'created_by_id', 'customer_id')
+        .annotate(keep=models.Min('id'), total=models.Sum('amount'), total_count=models.Sum('payment_count'),
+                  rows=models.Count('id'))
+        .filter(rows__gt=1)
+        .order_by()
+    )
+    for key in list(duplicates):
+        same_key = rows.filter(day=key['day'], created_by_id=key['created_by_id'], customer_id=key['customer_id'])
+        same_key.filter(pk=key['keep']).update(amount=key['total'], payment_count=key['total_count'])
+        same_key.exclude(pk=key['keep']).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payments', '0013_log_username'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_keys, migrations.RunPython.noop),
+        migrations.RemoveIndex(
+            model_name='dailyrevenue',
+            name='daily_revenue_key_idx',
+        ),
+        migrations.AddConstraint(
+            model_name='dailyrevenue',
+            constraint=models.UniqueConstraint(fields=('day', 'created_by', 'customer'), name='daily_revenue_key_unique'),
+        ),
+    ]
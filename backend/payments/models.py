@@ -37,6 +37,9 @@ class Customer(models.Model):
         verbose_name = 'Customer'
         verbose_name_plural = 'Customers'
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['-created_at', '-id'], name='customer_created_at_idx'),
+        ]
     
     def __str__(self):
         return f"{self.name} ({self.email})"
@@ -60,6 +63,14 @@ class Payment(models.Model):
         verbose_name = 'Payment'
         verbose_name_plural = 'Payments'
         ordering = ['-date']
+        # Match the list filters: all payments by date, a user's payments by
+        # date (non-admins, ?created_by=) and a customer's payments by date.
+        # The trailing id matches the keyset pagination order.
+        indexes = [
+            models.Index(fields=['-date', '-id'], name='payment_date_idx'),
+            models.Index(fields=['created_by', '-date', '-id'], name='payment_created_by_date_idx'),
+            models.Index(fields=['customer', '-date', '-id'], name='payment_customer_date_idx'),
+        ]
     
     def __str__(self):
         return f"{self.customer.name} - {self.amount} on {self.date}"
@@ -80,13 +91,129 @@ class Log(models.Model):
         ('payment_deleted', 'Payment Deleted'),
     ]
     
-    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='logs')
+    # A plain id with no constraint or cascade, so logs may live in their own
+    # database and outlive the user (see payments/logstore.py). Also with one
+    # database: deleting a user keeps their entries, and the entry recording
+    # the deletion itself, where a cascade used to delete them
+    user = models.ForeignKey(User, on_delete=models.DO_NOTHING, db_constraint=False, related_name='logs')
+    username = models.CharField(max_length=150, blank=True, default='')
     action = models.CharField(max_length=20, choices=ACTION_CHOICES)
     description = models.TextField()
     created_at = models.DateTimeField(auto_now_add=True)
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['-created_at', '-id'], name='log_created_at_idx'),
+            models.Index(fields=['user', '-created_at', '-id'], name='log_user_created_at_idx'),
+        ]
     
+    def save(self, *args, **kwargs):
+        # Entries created with a user object get its name without a query
+        if not self.username and Log.user.is_cached(self) and self.user is not None:
+            self.username = self.user.username
+        super().save(*args, **kwargs)
+
+    def __str__(self):
+        return f"{self.username} - {self.get_action_display()} - {self.created_at}"
+
+
+class DailyRevenue(models.Model):
+    """
+    Payment totals per day, creator and customer, maintained from Payment
+    signals (see payments/rollup.py). Readers always Sum() over matching rows:
+    the constraint can't cover creator-less rows, of which deleting users
+    (SET_NULL) may leave several per day and customer.
+    """
+    day = models.DateField()
+    created_by = models.ForeignKey(
+        User,
+        on_delete=models.SET_NULL,
+        null=True,
+        related_name='daily_revenue'
+    )
+    customer = models.ForeignKey(Customer, on_delete=models.CASCADE, related_name='daily_revenue')
+    amount = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    payment_count = models.IntegerField(default=0)
+
+    class Meta:
+        verbose_name = 'Daily Revenue'
+        verbose_name_plural = 'Daily Revenue'
+        ordering = ['-day']
+        constraints = [
+            models.UniqueConstraint(fields=['day', 'created_by', 'customer'], name='daily_revenue_key_unique'),
+        ]
+        indexes = [
+            models.Index(fields=['created_by', 'day'], name='daily_revenue_created_by_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.day} - {self.amount} ({self.payment_count} payments)"
+
+
+class CustomerLedger(models.Model):
+    """
+    What a customer owes and has paid for one billing month, maintained from
+    Payment and Customer signals (see payments/ledger.py).
+    """
+    STATUS_PAID = 'paid'
+    STATUS_PARTIAL = 'partial'
+    STATUS_UNPAID = 'unpaid'
+    status_choices = (
+        (STATUS_PAID, 'Paid'),
+        (STATUS_PARTIAL, 'Partially Paid'),
+        (STATUS_UNPAID, 'Unpaid'),
+    )
+
+    customer = models.ForeignKey(Customer, on_delete=models.CASCADE, related_name='ledger')
+    period = models.DateField()  # First day of the billing month
+    expected = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    paid = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    balance = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    status = models.CharField(max_length=10, choices=status_choices, default=STATUS_UNPAID)
+
+    class Meta:
+        verbose_name = 'Customer Ledger'
+        verbose_name_plural = 'Customer Ledger'
+        ordering = ['-period', '-balance', 'id']
+        constraints = [
+            models.UniqueConstraint(fields=['customer', 'period'], name='ledger_customer_period_unique'),
+        ]
+        # A month's ledger by status and balance, and overdue (unpaid or
+        # partial) rows across months
+        indexes = [
+            models.Index(fields=['period', 'status', '-balance'], name='ledger_period_status_idx'),
+            models.Index(fields=['status', 'period'], name='ledger_status_period_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.customer.name} - {self.period:%Y-%m}: {self.balance} due"
+
+
+class Invoice(models.Model):
+    """
+    A customer's bill for one month's package fee, issued in bulk by the
+    generate_invoices command (see payments/billing.py).
+    """
+    customer = models.ForeignKey(Customer, on_delete=models.CASCADE, related_name='invoices')
+    number = models.CharField(max_length=20, unique=True)
+    period = models.DateField()  # First day of the billing month
+    amount = models.DecimalField(max_digits=10, decimal_places=2)
+    due_date = models.DateField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = 'Invoice'
+        verbose_name_plural = 'Invoices'
+        ordering = ['-period', 'customer_id']
+        # One invoice per customer and month is what makes generating a
+        # period idempotent
+        constraints = [
+            models.UniqueConstraint(fields=['customer', 'period'], name='invoice_customer_period_unique'),
+        ]
+        indexes = [
+            models.Index(fields=['period', 'customer'], name='invoice_period_customer_idx'),
+        ]
+
     def __str__(self):
-        return f"{self.user.username} - {self.get_action_display()} - {self.created_at}"
+        return f"{self.number} - {self.customer.name}: {self.amount}"
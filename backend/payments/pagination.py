@@ -1,15 +1,198 @@
-from rest_framework.pagination import PageNumberPagination
+import base64
+import json
+
+from asgiref.sync import sync_to_async
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.core.paginator import InvalidPage
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
 from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+from . import counting
+
+
+class KeysetPagination(BasePagination):
+    """
+    Keyset (cursor) pagination over a fixed, unique ordering.
+
+    The view's ``cursor_ordering`` (e.g. ``('-date', '-id')``) decides the
+    sort; the last field must be unique so every row has a distinct position.
+    Pages are fetched with a ``WHERE (date, id) < (...)`` style filter instead
+    of OFFSET, and no COUNT(*) is run. Cursor fields must not be nullable.
+    """
+    cursor_query_param = 'cursor'
+    default_ordering = ('-pk',)
+    invalid_cursor_message = 'Invalid cursor'
+
+    def __init__(self, page_size):
+        self.page_size = page_size
+
+    def encode_cursor(self, obj, reverse):
+        position = []
+        for field in self.ordering:
+            value = getattr(obj, field.lstrip('-'))
+            position.append(value.isoformat() if hasattr(value, 'isoformat') else value)
+        payload = json.dumps({'p': position, 'r': reverse}, separators=(',', ':'))
+        return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+    def decode_cursor(self, token):
+        try:
+            padded = token + '=' * (-len(token) % 4)
+            payload = json.loads(base64.urlsafe_b64decode(padded.encode()).decode())
+            position, reverse = payload['p'], bool(payload['r'])
+        except (TypeError, ValueError, KeyError):
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(position, list) or len(position) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+        return position, reverse
+
+    def get_position_filter(self, position, reverse):
+        # Rows strictly after ``position`` in the (possibly reversed) ordering:
+        # (a > x) OR (a = x AND b > y) OR ...
+        condition = Q()
+        equal = Q()
+        for field, value in zip(self.ordering, position):
+            name = field.lstrip('-')
+            descending = field.startswith('-') != reverse
+            lookup = 'lt' if descending else 'gt'
+            condition |= equal & Q(**{f'{name}__{lookup}': value})
+            equal &= Q(**{name: value})
+        # A plain range on the leading field lets the database walk the index
+        # in order; the OR alone turns into a multi-index OR plus a sort.
+        first, first_value = self.ordering[0], position[0]
+        descending = first.startswith('-') != reverse
+        bound = Q(**{f"{first.lstrip('-')}__{'lte' if descending else 'gte'}": first_value})
+        return bound & condition
+
+    def paginate_queryset(self, queryset, request, view=None):
+        queryset = self.get_page_queryset(queryset, request, view)
+        return self.get_page_rows(list(queryset))
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        queryset = self.get_page_queryset(queryset, request, view)
+        return self.get_page_rows([row async for row in queryset.aiterator()])
+
+    def get_page_queryset(self, queryset, request, view):
+        self.request = request
+        self.ordering = tuple(getattr(view, 'cursor_ordering', self.default_ordering))
+
+        token = request.query_params.get(self.cursor_query_param)
+        position, reverse = self.decode_cursor(token) if token else (None, False)
+
+        if reverse:
+            ordering = [field[1:] if field.startswith('-') else f'-{field}' for field in self.ordering]
+        else:
+            ordering = list(self.ordering)
+        queryset = queryset.order_by(*ordering)
+        if position is not None:
+            try:
+                queryset = queryset.filter(self.get_position_filter(position, reverse))
+            except (DjangoValidationError, ValueError, TypeError):
+                # A well-formed token carrying values the fields can't parse
+                raise NotFound(self.invalid_cursor_message)
+
+        # Fetch one extra row to find out whether there is another page
+        self.reverse, self.position = reverse, position
+        return queryset[:self.page_size + 1]
+
+    def get_page_rows(self, rows):
+        reverse, position = self.reverse, self.position
+        has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+
+        if reverse:
+            rows.reverse()
+            self.has_next, self.has_previous = True, has_more
+        else:
+            self.has_next, self.has_previous = has_more, position is not None
+
+        self.next_cursor = self.encode_cursor(rows[-1], False) if rows and self.has_next else None
+        self.previous_cursor = self.encode_cursor(rows[0], True) if rows and self.has_previous else None
+        return rows
+
+    def get_link(self, cursor):
+        if cursor is None:
+            return None
+        url = self.request.build_absolute_uri()
+        url = remove_query_param(url, 'page')
+        return replace_query_param(url, self.cursor_query_param, cursor)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_link(self.next_cursor),
+            'previous': self.get_link(self.previous_cursor),
+            'next_cursor': self.next_cursor,
+            'previous_cursor': self.previous_cursor,
+            'has_next': self.has_next,
+            'has_previous': self.has_previous,
+            'page_size': self.page_size,
+            'results': data
+        })
 
 
 class CustomPagination(PageNumberPagination):
     page_size = 10  # Default to 10 records per page
     page_size_query_param = 'page_size'
     max_page_size = 100
-    
+
+    # Passing ?cursor= (even empty) switches to keyset pagination
+    cursor_query_param = KeysetPagination.cursor_query_param
+    keyset = None
+    count_is_estimate = False
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if self.cursor_query_param in request.query_params:
+            self.keyset = KeysetPagination(self.get_page_size(request))
+            return self.keyset.paginate_queryset(queryset, request, view)
+
+        self.request = request
+        page_size = self.get_page_size(request)
+        if not page_size:
+            return None
+        paginator = self.django_paginator_class(queryset, page_size)
+        # The view's count strategy (see payments/counting.py) primes the
+        # paginator's cached count
+        paginator.count, self.count_is_estimate = counting.count(queryset, view)
+        self.page = self.get_page(paginator, request)
+        if paginator.num_pages > 1 and self.template is not None:
+            self.display_page_controls = True
+        return list(self.page)
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """``paginate_queryset`` for async views, using ``acount`` and ``aiterator``."""
+        if self.cursor_query_param in request.query_params:
+            self.keyset = KeysetPagination(self.get_page_size(request))
+            return await self.keyset.apaginate_queryset(queryset, request, view)
+
+        self.request = request
+        page_size = self.get_page_size(request)
+        if not page_size:
+            return None
+        paginator = self.django_paginator_class(queryset, page_size)
+        # Prime the paginator's cached count so page() doesn't run it synchronously
+        if counting.get_strategy(view) == 'exact':
+            paginator.count, self.count_is_estimate = await queryset.acount(), False
+        else:
+            paginator.count, self.count_is_estimate = await sync_to_async(counting.count)(queryset, view)
+        self.page = self.get_page(paginator, request)
+        self.page.object_list = [row async for row in self.page.object_list.aiterator()]
+        return list(self.page)
+
+    def get_page(self, paginator, request):
+        page_number = self.get_page_number(request, paginator)
+        try:
+            return paginator.page(page_number)
+        except InvalidPage as exc:
+            raise NotFound(self.invalid_page_message.format(page_number=page_number, message=str(exc)))
+
     def get_paginated_response(self, data):
+        if self.keyset is not None:
+            return self.keyset.get_paginated_response(data)
         return Response({
             'count': self.page.paginator.count,
+            'count_is_estimate': self.count_is_estimate,
             'next': self.get_next_link(),
             'previous': self.get_previous_link(),
             'current_page': self.page.number,
@@ -18,4 +201,4 @@ class CustomPagination(PageNumberPagination):
             'has_previous': self.page.has_previous(),
             'page_size': self.get_page_size(self.request),
             'results': data
-        }) 
\ No newline at end of file
+        })
@@ -0,0 +1,121 @@
+"""
+Incremental maintenance of the DailyRevenue rollup.
+
+Every payment contributes its amount and a count of one to the row keyed by
+(day of ``date``, ``created_by``, ``customer``). Signal handlers in signals.py
+call ``apply_payment`` with +1 on create, -1 on delete, and -1/+1 for the
+previous/new values on update; the bulk importer calls ``add_payments``.
+``rebuild`` recomputes a day range from the payments table and backs the
+``rebuild_daily_revenue`` management command.
+"""
+import datetime
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import IntegrityError
+from django.db.models import Count, DateField, F, Sum
+from django.db.models.functions import TruncDay
+
+from . import writes
+from .models import DailyRevenue, Payment
+
+
+def rollup_key(date, created_by_id, customer_id):
+    return (date.date() if hasattr(date, 'date') else date, created_by_id, customer_id)
+
+
+def apply_delta(key, amount, count):
+    day, created_by_id, customer_id = key
+    rows = DailyRevenue.objects.filter(day=day, created_by_id=created_by_id, customer_id=customer_id)
+    if created_by_id is None:
+        # Keys are unique per creator, but deleting users (SET_NULL) can leave
+        # several creator-less rows for a key; change one of them
+        rows = rows.filter(pk=rows.order_by('pk').values('pk')[:1])
+    updated = rows.update(amount=F('amount') + amount, payment_count=F('payment_count') + count)
+    if updated:
+        if count < 0:
+            # Only rows that no longer add anything; a creator-less row may
+            # have given up more than it held to one of its duplicates
+            rows.filter(payment_count__lte=0, amount=0).delete()
+        return
+    if count <= 0:
+        # Removing from a missing row means the customer (and its rollup) is
+        # being deleted, so only additions create rows
+        return
+
+    try:
+        writes.run_write(lambda: DailyRevenue.objects.create(
+            day=day, created_by_id=created_by_id, customer_id=customer_id,
+            amount=amount, payment_count=count
+        ))
+    except IntegrityError:
+        # Another request created the row first
+        apply_delta(key, amount, count)
+
+
+def apply_payment(values, sign):
+    """Add (sign=1) or remove (sign=-1) one payment given its date/created_by_id/customer_id/amount."""
+    key = rollup_key(values['date'], values['created_by_id'], values['customer_id'])
+    apply_delta(key, Decimal(values['amount']) * sign, sign)
+
+
+def payment_values(payment):
+    return {
+        'date': payment.date,
+        'created_by_id': payment.created_by_id,
+        'customer_id': payment.customer_id,
+        'amount': payment.amount,
+    }
+
+
+def add_payments(payments):
+    """Fold many new payments in with one update or insert per distinct key."""
+    totals = defaultdict(lambda: [Decimal('0'), 0])
+    for payment in payments:
+        total = totals[rollup_key(payment.date, payment.created_by_id, payment.customer_id)]
+        total[0] += Decimal(payment.amount)
+        total[1] += 1
+    for key, (amount, count) in totals.items():
+        apply_delta(key, amount, count)
+
+
+def rebuild(start=None, end=None, batch_size=1000):
+    """
+    Recompute rollup rows for ``start``..``end`` (inclusive dates, either may
+    be None for an open range) from the payments table. Returns the number of
+    rollup rows written.
+    """
+    payments = Payment.objects.all()
+    rollups = DailyRevenue.objects.all()
+    if start:
+        payments = payments.filter(date__gte=datetime.datetime.combine(start, datetime.time.min))
+        rollups = rollups.filter(day__gte=start)
+    if end:
+        payments = payments.filter(date__lte=datetime.datetime.combine(end, datetime.time.max))
+        rollups = rollups.filter(day__lte=end)
+
+    grouped = (
+        payments
+        .annotate(day=TruncDay('date', output_field=DateField()))
+        .values('day', 'created_by_id', 'customer_id')
+        .annotate(total=Sum('amount'), total_count=Count('id'))
+        .order_by()
+    )
+
+    def replace():
+        rollups.delete()
+        written = 0
+        batch = []
+        for row in grouped.iterator(chunk_size=batch_size):
+            batch.append(DailyRevenue(
+                day=row['day'], created_by_id=row['created_by_id'], customer_id=row['customer_id'],
+                amount=row['total'], payment_count=row['total_count']
+            ))
+            if len(batch) == batch_size:
+                DailyRevenue.objects.bulk_create(batch)
+                written += len(batch)
+                batch = []
+        DailyRevenue.objects.bulk_create(batch)
+        return written + len(batch)
+
+    return writes.run_write(replace)
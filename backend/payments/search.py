@@ -0,0 +1,206 @@
+"""
+Indexed text search for the payment, customer and log list views.
+
+The views describe what they search with ``search_fields`` (e.g.
+``['customer__name', 'customer__email', 'description']``) and hand the term
+to the active backend:
+
+* ``SQLiteFTSSearchBackend`` - used on SQLite when FTS5 with the trigram
+  tokenizer is available. Each searchable model gets an external-content
+  FTS5 table (``<table>_fts``) kept in sync by triggers, so every write path
+  (save, delete, bulk_create, update) maintains it. Trigram matching is
+  case-insensitive substring matching, i.e. the same results as
+  ``icontains``, for terms of three or more characters; shorter terms fall
+  back to ``icontains``.
+* ``IcontainsSearchBackend`` - plain ``icontains`` OR'd across the fields.
+  On PostgreSQL the search index is a set of ``pg_trgm`` GIN indexes on
+  ``UPPER(column)``, which is exactly what Django's ``icontains`` compiles
+  to, so this backend is the indexed path there too.
+
+``SEARCH_BACKEND`` may be set to ``'icontains'`` to bypass the index.
+"""
+from django.conf import settings
+from django.db import connection, connections
+from django.db.migrations.recorder import MigrationRecorder
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+from rest_framework import filters
+
+# Columns indexed per table. Models whose fields aren't listed here are
+# always searched with icontains.
+SEARCH_INDEXES = {
+    'payments_customer': ['name', 'email', 'phone'],
+    'payments_payment': ['description'],
+    'payments_log': ['action', 'description'],
+}
+
+# Trigrams need at least three characters to match anything
+MIN_INDEXED_TERM_LENGTH = 3
+
+
+def fts_table(table):
+    return f'{table}_fts'
+
+
+def sqlite_supports_trigram(conn):
+    with conn.cursor() as cursor:
+        try:
+            cursor.execute("CREATE VIRTUAL TABLE temp.fts_trigram_probe USING fts5(a, tokenize='trigram')")
+        except Exception:
+            return False
+        cursor.execute('DROP TABLE temp.fts_trigram_probe')
+    return True
+
+
+def install_search_index(conn):
+    """
+    Create the search index for ``conn``'s vendor. Idempotent: on SQLite,
+    missing triggers (Django drops them when it rebuilds a table during a
+    migration) are recreated and the index is rebuilt from the table.
+    """
+    if conn.vendor == 'sqlite':
+        if not sqlite_supports_trigram(conn):
+            return
+        with conn.cursor() as cursor:
+            # A separate log database only has the log table
+            tables = set(conn.introspection.table_names(cursor))
+            for table, columns in SEARCH_INDEXES.items():
+                if table in tables:
+                    install_sqlite_table_index(cursor, table, columns)
+    elif conn.vendor == 'postgresql':
+        with conn.cursor() as cursor:
+            cursor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+            for table, columns in SEARCH_INDEXES.items():
+                for column in columns:
+                    cursor.execute(
+                        f'CREATE INDEX IF NOT EXISTS {table}_{column}_trgm '
+                        f'ON {table} USING gin (UPPER({column}::text) gin_trgm_ops)'
+                    )
+
+
+def install_sqlite_table_index(cursor, table, columns):
+    fts = fts_table(table)
+    column_list = ', '.join(columns)
+    new_values = ', '.join(f'new.{column}' for column in columns)
+    old_values = ', '.join(f'old.{column}' for column in columns)
+    triggers = {
+        f'{fts}_ai': f'AFTER INSERT ON {table} BEGIN '
+                     f'INSERT INTO {fts}(rowid, {column_list}) VALUES (new.id, {new_values}); END',
+        f'{fts}_ad': f'AFTER DELETE ON {table} BEGIN '
+                     f"INSERT INTO {fts}({fts}, rowid, {column_list}) VALUES ('delete', old.id, {old_values}); END",
+        f'{fts}_au': f'AFTER UPDATE ON {table} BEGIN '
+                     f"INSERT INTO {fts}({fts}, rowid, {column_list}) VALUES ('delete', old.id, {old_values}); "
+                     f'INSERT INTO {fts}(rowid, {column_list}) VALUES (new.id, {new_values}); END',
+    }
+
+    cursor.execute(
+        f'CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5('
+        f"{column_list}, content='{table}', content_rowid='id', tokenize='trigram')"
+    )
+    cursor.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'trigger' AND tbl_name = %s", [table]
+    )
+    existing = {row[0] for row in cursor.fetchall()}
+    missing = [name for name in triggers if name not in existing]
+    for name in missing:
+        cursor.execute(f'CREATE TRIGGER {name} {triggers[name]}')
+    if missing:
+        cursor.execute(f"INSERT INTO {fts}({fts}) VALUES ('rebuild')")
+
+
+def uninstall_search_index(conn):
+    with conn.cursor() as cursor:
+        for table, columns in SEARCH_INDEXES.items():
+            if conn.vendor == 'sqlite':
+                fts = fts_table(table)
+                for suffix in ('ai', 'ad', 'au'):
+                    cursor.execute(f'DROP TRIGGER IF EXISTS {fts}_{suffix}')
+                cursor.execute(f'DROP TABLE IF EXISTS {fts}')
+            elif conn.vendor == 'postgresql':
+                for column in columns:
+                    cursor.execute(f'DROP INDEX IF EXISTS {table}_{column}_trgm')
+
+
+class IcontainsSearchBackend:
+    def filter(self, queryset, search_fields, term):
+        condition = Q()
+        for field in search_fields:
+            condition |= Q(**{f'{field}__icontains': term})
+        return queryset.filter(condition)
+
+
+class SQLiteFTSSearchBackend(IcontainsSearchBackend):
+    def filter(self, queryset, search_fields, term):
+        if len(term) < MIN_INDEXED_TERM_LENGTH:
+            return super().filter(queryset, search_fields, term)
+
+        # Group fields by the relation they live on so each related table is
+        # matched with a single FTS query: {'customer': ['name', 'email'], ...}
+        indexed = {}
+        unindexed = []
+        for field in search_fields:
+            *path, column = field.split('__')
+            model = queryset.model
+            for name in path:
+                model = model._meta.get_field(name).related_model
+            if column in SEARCH_INDEXES.get(model._meta.db_table, ()):
+                indexed.setdefault('__'.join(path), (model, []))[1].append(column)
+            else:
+                unindexed.append(field)
+
+        # A quoted FTS5 string matches the term as a substring; embedded
+        # quotes are escaped by doubling them
+        phrase = '"' + term.replace('"', '""') + '"'
+        condition = Q()
+        for path, (model, columns) in indexed.items():
+            fts = fts_table(model._meta.db_table)
+            matches = RawSQL(
+                f'SELECT rowid FROM {fts} WHERE {fts} MATCH %s',
+                ['{' + ' '.join(columns) + '} : ' + phrase]
+            )
+            condition |= Q(**{f'{path}__pk__in' if path else 'pk__in': matches})
+        for field in unindexed:
+            condition |= Q(**{f'{field}__icontains': term})
+        return queryset.filter(condition)
+
+
+_fts_available = {}
+
+def get_search_backend(conn=connection):
+    if getattr(settings, 'SEARCH_BACKEND', 'auto') == 'icontains' or conn.vendor != 'sqlite':
+        return IcontainsSearchBackend()
+    if conn.alias not in _fts_available:
+        with conn.cursor() as cursor:
+            # Any of the tables will do: a separate log database only has the log's
+            tables = [fts_table(table) for table in SEARCH_INDEXES]
+            cursor.execute(
+                f"SELECT 1 FROM sqlite_master WHERE type = 'table' AND name IN ({', '.join(['%s'] * len(tables))})",
+                tables
+            )
+            _fts_available[conn.alias] = cursor.fetchone() is not None
+    if _fts_available[conn.alias]:
+        return SQLiteFTSSearchBackend()
+    return IcontainsSearchBackend()
+
+
+class IndexedSearchFilter(filters.SearchFilter):
+    """SearchFilter that runs each search term through the active search backend."""
+
+    def filter_queryset(self, request, queryset, view):
+        search_fields = self.get_search_fields(view, request)
+        search_terms = self.get_search_terms(request)
+        if not search_fields or not search_terms:
+            return queryset
+
+        backend = get_search_backend(connections[queryset.db])
+        for term in search_terms:
+            queryset = backend.filter(queryset, search_fields, term)
+        return queryset
+
+
+def ensure_search_index(sender, using, **kwargs):
+    """post_migrate: put back SQLite triggers dropped by table rebuilds."""
+    conn = connections[using]
+    applied = MigrationRecorder(conn).applied_migrations()
+    if ('payments', '0009_search_index') in applied:
+        install_search_index(conn)
@@ -1,7 +1,59 @@
+import time
+
 from rest_framework import serializers
-from .models import Payment, User, Customer, Log
+from .models import Payment, User, Customer, Log, CustomerLedger
+from . import metrics
+
+class TimedSerializerMixin:
+    """Adds the time spent in ``to_representation`` to the request's metrics."""
+
+    def to_representation(self, instance):
+        request_metrics = metrics.current()
+        if request_metrics is None or request_metrics.serializing:
+            return super().to_representation(instance)
+        # Only the outermost serializer is timed, nested ones are part of it
+        request_metrics.serializing = True
+        start = time.perf_counter()
+        try:
+            return super().to_representation(instance)
+        finally:
+            request_metrics.serializer_time += time.perf_counter() - start
+            request_metrics.serializing = False
+
+
+class ExpandableFieldsMixin:
+    """
+    Sparse fieldsets (see payments/sparse.py). ``fields`` limits the output
+    to the named fields and ``expand`` names the ``expandable_fields`` to
+    render nested; the other relations are rendered as ids. Both are trees
+    from ``sparse.parse``, so they carry on into the nested serializers.
+    ``expand=None`` expands everything.
+    """
+    expandable_fields = {}
+
+    def __init__(self, *args, fields=None, expand=None, **kwargs):
+        self.requested_fields = fields
+        self.requested_expand = expand
+        super().__init__(*args, **kwargs)
+
+    def get_fields(self):
+        fields = super().get_fields()
+        for name, serializer_class in self.expandable_fields.items():
+            nested_fields = (self.requested_fields or {}).get(name) or None
+            if self.requested_expand is None or name in self.requested_expand or nested_fields:
+                nested_expand = None if self.requested_expand is None else self.requested_expand.get(name, {})
+                fields[name] = serializer_class(read_only=True, fields=nested_fields, expand=nested_expand)
+            else:
+                fields[name] = serializers.PrimaryKeyRelatedField(read_only=True)
 
-class UserSerializer(serializers.ModelSerializer):
+        if self.requested_fields:
+            unknown = set(self.requested_fields) - set(fields)
+            if unknown:
+                raise serializers.ValidationError({'fields': f"Unknown fields: {', '.join(sorted(unknown))}"})
+            fields = {name: field for name, field in fields.items() if name in self.requested_fields or field.write_only}
+        return fields
+
+class UserSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     password = serializers.CharField(write_only=True, required=False)
 
     class Meta:
@@ -50,32 +102,70 @@ class UserSerializer(serializers.ModelSerializer):
         instance.save()
         return instance
 
-class CustomerSerializer(serializers.ModelSerializer):
-    created_by = UserSerializer(read_only=True)
+class UserSummarySerializer(ExpandableFieldsMixin, serializers.ModelSerializer):
+    """Read-only user representation used when nesting users in other resources."""
+
+    class Meta:
+        model = User
+        fields = [
+            'id', 'username', 'first_name', 'last_name', 'email',
+            'user_type', 'is_staff', 'is_superuser', 'is_active'
+        ]
+        read_only_fields = fields
+
+class CustomerSerializer(TimedSerializerMixin, ExpandableFieldsMixin, serializers.ModelSerializer):
+    created_by = UserSummarySerializer(read_only=True)
+    expandable_fields = {'created_by': UserSummarySerializer}
     
     class Meta:
         model = Customer
         fields = ['id', 'name', 'email', 'phone', 'address', 'package_fee', 'is_active', 
                  'created_at', 'updated_at', 'created_by']
 
-class PaymentSerializer(serializers.ModelSerializer):
+class PaymentSerializer(TimedSerializerMixin, ExpandableFieldsMixin, serializers.ModelSerializer):
     customer = CustomerSerializer(read_only=True)
     customer_id = serializers.PrimaryKeyRelatedField(
         queryset=Customer.objects.all(), 
         source='customer', 
         write_only=True
     )
-    created_by = UserSerializer(read_only=True)
+    created_by = UserSummarySerializer(read_only=True)
+    expandable_fields = {'customer': CustomerSerializer, 'created_by': UserSummarySerializer}
     
     class Meta:
         model = Payment
         fields = ['id', 'customer', 'customer_id', 'amount', 'date', 'description', 'created_by']
 
-class LogSerializer(serializers.ModelSerializer):
-    user_username = serializers.CharField(source='user.username', read_only=True)
+class LogSerializer(TimedSerializerMixin, ExpandableFieldsMixin, serializers.ModelSerializer):
+    expandable_fields = {'user': UserSummarySerializer}
+    user_username = serializers.CharField(source='username', read_only=True)
     action_display = serializers.CharField(source='get_action_display', read_only=True)
     
     class Meta:
         model = Log
         fields = ['id', 'user', 'user_username', 'action', 'action_display', 'description', 'created_at']
-        read_only_fields = ['id', 'created_at'] 
\ No newline at end of file
+        read_only_fields = ['id', 'created_at']
+
+class CustomerLedgerSerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    customer_name = serializers.CharField(source='customer.name', read_only=True)
+
+    class Meta:
+        model = CustomerLedger
+        fields = ['id', 'customer', 'customer_name', 'period', 'expected', 'paid', 'balance', 'status']
+        read_only_fields = fields
+
+class PaymentImportSerializer(serializers.ModelSerializer):
+    """Row validation for bulk payment imports; customers are checked per chunk."""
+    customer_id = serializers.IntegerField()
+
+    class Meta:
+        model = Payment
+        fields = ['customer_id', 'amount', 'description']
+
+class CustomerImportSerializer(serializers.ModelSerializer):
+    """Row validation for bulk customer imports; email uniqueness is checked per chunk."""
+
+    class Meta:
+        model = Customer
+        fields = ['name', 'email', 'phone', 'address', 'package_fee', 'is_active']
+        extra_kwargs = {'email': {'validators': []}}
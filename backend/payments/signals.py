@@ -1,22 +1,60 @@
-from django.db.models.signals import post_save, post_delete
+from decimal import Decimal
+
+from django.db.models.signals import pre_save, post_save, post_delete
 from django.dispatch import receiver
 from django.contrib.auth import get_user_model
 from .models import User, Customer, Payment, Log
+from .audit import log_writer
+from .authentication import invalidate_cached_user
+from . import caching, events, ledger, rollup
 
 User = get_user_model()
 
+def get_system_user_id():
+    # The 'system' user that payment logs fall back to when a payment has no
+    # creator. Looked up every time: that is rare, and a remembered id would
+    # outlive the user being deleted and recreated, with no foreign key on
+    # Log.user to catch it
+    return User.objects.values_list('id', flat=True).get(username='system')
+
+def get_payment_log_user_id(payment):
+    return payment.created_by_id or get_system_user_id()
+
+def get_creator_username(instance):
+    # The creator is usually loaded already (perform_create passes request.user);
+    # otherwise the log writer looks the username up
+    if type(instance).created_by.is_cached(instance) and instance.created_by is not None:
+        return instance.created_by.username
+    return ''
+
+def get_customer_name(payment):
+    # Use the customer already loaded on the payment and only query for the name otherwise
+    if Payment.customer.is_cached(payment):
+        return payment.customer.name
+    return Customer.objects.values_list('name', flat=True).get(pk=payment.customer_id)
+
+def describe_customer_created(customer):
+    return f'Customer "{customer.name}" ({customer.email}) was created'
+
+def describe_payment_created(customer_name, amount):
+    return f'Customer "{customer_name}" were paid {amount} rupees.'
+
 @receiver(post_save, sender=User)
 def log_user_action(sender, instance, created, **kwargs):
     """Log user creation and updates"""
+    caching.bump('users')
+    invalidate_cached_user(instance.pk)
     if created:
-        Log.objects.create(
-            user=instance,
+        log_writer.write(
+            user_id=instance.pk,
+            username=instance.username,
             action='user_created',
             description=f'User "{instance.username}" was created'
         )
     else:
-        Log.objects.create(
-            user=instance,
+        log_writer.write(
+            user_id=instance.pk,
+            username=instance.username,
             action='user_updated',
             description=f'User "{instance.username}" was updated'
         )
@@ -24,24 +62,50 @@ def log_user_action(sender, instance, created, **kwargs):
 @receiver(post_delete, sender=User)
 def log_user_deletion(sender, instance, **kwargs):
     """Log user deletion"""
-    Log.objects.create(
-        user=instance,
+    caching.bump('users')
+    invalidate_cached_user(instance.pk)
+    log_writer.write(
+        user_id=instance.pk,
+        username=instance.username,
         action='user_deleted',
         description=f'User "{instance.username}" was deleted'
     )
 
+@receiver(pre_save, sender=Customer)
+def remember_customer_package_fee(sender, instance, **kwargs):
+    """Keep the stored package fee so a change can be applied to the ledger"""
+    if not instance._state.adding and instance.pk:
+        instance._ledger_previous_fee = (
+            Customer.objects.filter(pk=instance.pk).values_list('package_fee', flat=True).first()
+        )
+
+@receiver(post_save, sender=Customer)
+def update_customer_ledger(sender, instance, created, **kwargs):
+    """Open the current month for new customers and apply package fee changes"""
+    if created:
+        ledger.open_period([instance], ledger.current_period())
+        return
+    previous_fee = getattr(instance, '_ledger_previous_fee', None)
+    instance._ledger_previous_fee = None
+    if previous_fee is not None and previous_fee != Decimal(instance.package_fee):
+        ledger.set_expected(instance.pk, Decimal(instance.package_fee))
+
 @receiver(post_save, sender=Customer)
 def log_customer_action(sender, instance, created, **kwargs):
     """Log customer creation and updates"""
+    caching.bump('customers')
+    events.publish('customer', 'created' if created else 'updated', instance.pk, instance.created_by_id)
     if created:
-        Log.objects.create(
-            user=instance.created_by,
+        log_writer.write(
+            user_id=instance.created_by_id,
+            username=get_creator_username(instance),
             action='customer_created',
-            description=f'Customer "{instance.name}" ({instance.email}) was created'
+            description=describe_customer_created(instance)
         )
     else:
-        Log.objects.create(
-            user=instance.created_by,
+        log_writer.write(
+            user_id=instance.created_by_id,
+            username=get_creator_username(instance),
             action='customer_updated',
             description=f'Customer "{instance.name}" ({instance.email}) was updated'
         )
@@ -49,8 +113,11 @@ def log_customer_action(sender, instance, created, **kwargs):
 @receiver(post_delete, sender=Customer)
 def log_customer_deletion(sender, instance, **kwargs):
     """Log customer deletion"""
-    Log.objects.create(
-        user=instance.created_by,
+    caching.bump('customers')
+    events.publish('customer', 'deleted', instance.pk, instance.created_by_id)
+    log_writer.write(
+        user_id=instance.created_by_id,
+        username=get_creator_username(instance),
         action='customer_deleted',
         description=f'Customer "{instance.name}" ({instance.email}) was deleted'
     )
@@ -59,26 +126,62 @@ def log_customer_deletion(sender, instance, **kwargs):
 def payment_created_log(sender, instance, created, **kwargs):
     """Log payment creation and updates"""
     if created:
-        Log.objects.create(
-            user=instance.created_by if instance.created_by else User.objects.get(username='system'),
+        log_writer.write(
+            user_id=get_payment_log_user_id(instance),
+            username=get_creator_username(instance),
             action='payment_created',
-            description=f'Customer "{instance.customer.name}" were paid {instance.amount} rupees.'
+            description=describe_payment_created(get_customer_name(instance), instance.amount)
         )
 
 @receiver(post_save, sender=Payment)
 def payment_updated_log(sender, instance, created, **kwargs):
     if not created:
-        Log.objects.create(
-            user=instance.created_by if instance.created_by else User.objects.get(username='system'),
+        log_writer.write(
+            user_id=get_payment_log_user_id(instance),
+            username=get_creator_username(instance),
             action='payment_updated',
-            description=f'Customers "{instance.customer.name}" were paid {instance.amount} rupees.'
+            description=f'Customers "{get_customer_name(instance)}" were paid {instance.amount} rupees.'
         )
 
 @receiver(post_delete, sender=Payment)
 def payment_deleted_log(sender, instance, **kwargs):
     """Log payment deletion"""
-    Log.objects.create(
-        user=instance.created_by if instance.created_by else User.objects.get(username='system'),
+    log_writer.write(
+        user_id=get_payment_log_user_id(instance),
+        username=get_creator_username(instance),
         action='payment_deleted',
-        description=f'Customers "{instance.customer.name}" payment of {instance.amount} rupees was deleted.'
-    ) 
\ No newline at end of file
+        description=f'Customers "{get_customer_name(instance)}" payment of {instance.amount} rupees was deleted.'
+    )
+
+@receiver(pre_save, sender=Payment)
+def remember_payment_rollup_values(sender, instance, **kwargs):
+    """Keep the stored values of an updated payment so its rollup and ledger entries can be moved"""
+    if not instance._state.adding and instance.pk:
+        instance._rollup_previous = (
+            Payment.objects.filter(pk=instance.pk)
+            .values('date', 'created_by_id', 'customer_id', 'amount')
+            .first()
+        )
+
+@receiver(post_save, sender=Payment)
+def update_payment_rollup(sender, instance, created, **kwargs):
+    """Fold the payment into the daily revenue rollup and the customer ledger"""
+    caching.bump('payments')
+    events.publish('payment', 'created' if created else 'updated', instance.pk, instance.created_by_id)
+    previous = getattr(instance, '_rollup_previous', None)
+    if previous is not None:
+        rollup.apply_payment(previous, -1)
+        ledger.apply_payment(previous, -1)
+        instance._rollup_previous = None
+    values = rollup.payment_values(instance)
+    rollup.apply_payment(values, 1)
+    ledger.apply_payment(values, 1)
+
+@receiver(post_delete, sender=Payment)
+def remove_payment_rollup(sender, instance, **kwargs):
+    """Take a deleted payment out of the daily revenue rollup and the customer ledger"""
+    caching.bump('payments')
+    events.publish('payment', 'deleted', instance.pk, instance.created_by_id)
+    values = rollup.payment_values(instance)
+    rollup.apply_payment(values, -1)
+    ledger.apply_payment(values, -1)
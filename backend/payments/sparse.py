@@ -0,0 +1,218 @@
+"""
+Sparse fieldsets for the payment, customer and log endpoints.
+
+Query parameters (dotted names reach into related objects):
+
+* ``?fields=id,amount,customer.name`` renders only these fields.
+* ``?expand=customer,customer.created_by`` renders these relations as
+  nested objects. Naming fields of a relation in ``?fields=`` expands it.
+* ``?include=customer,created_by`` (list endpoints) keeps the rows' ids and
+  adds each related object once to an ``included`` lookup table keyed by
+  relation and id.
+
+List responses reference related objects by id unless expanded; detail
+and write responses expand every relation, as before.
+
+The queryset is projected from the serializer that will render it:
+expanded or included relations are joined in with ``select_related`` and
+``.only()`` loads just the columns the rendered fields read, so narrowing
+the fields also narrows the SELECT.
+"""
+from django.core.exceptions import ObjectDoesNotExist
+from django.db import router
+from rest_framework import serializers
+from rest_framework.exceptions import ValidationError
+from rest_framework.mixins import ListModelMixin
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+def parse(value):
+    """``'id,customer.name,customer.email'`` -> ``{'id': {}, 'customer': {'name': {}, 'email': {}}}``."""
+    tree = {}
+    for path in (value or '').split(','):
+        path = path.strip()
+        if not path:
+            continue
+        node = tree
+        for name in path.split('.'):
+            node = node.setdefault(name, {})
+    return tree
+
+
+def model_field(model, name):
+    try:
+        return model._meta.get_field(name)
+    except Exception:
+        return None
+
+
+def source_columns(model, source):
+    """
+    The ``select_related`` paths and ``only`` columns needed to read a
+    field's ``source`` off ``model``, or None when it isn't plain model data
+    (a property or method), in which case nothing should be deferred.
+    """
+    related, path = [], []
+    parts = source.split('.')
+    for i, part in enumerate(parts):
+        field = model_field(model, part)
+        if field is None and part.startswith('get_') and part.endswith('_display') and i == len(parts) - 1:
+            field = model_field(model, part[len('get_'):-len('_display')])
+        if field is None or not field.concrete:
+            return None
+        path.append(field.name)
+        if i < len(parts) - 1:
+            if not field.is_relation:
+                return None
+            related.append('__'.join(path))
+            model = field.related_model
+    return related, ['__'.join(path)]
+
+
+def joinable(model, path):
+    """
+    Whether the relation ``path`` off ``model`` can be joined in: it stays in
+    one database and, unless nullable, is backed by a foreign key constraint.
+    An unconstrained id (a log's user) may point at a deleted row, which an
+    inner join would drop the referencing row for.
+    """
+    for name in path.split('__'):
+        field = model._meta.get_field(name)
+        related = field.related_model
+        if router.db_for_read(related) != router.db_for_read(model):
+            return False
+        if field.many_to_one and not field.null and not field.db_constraint:
+            return False
+        model = related
+    return True
+
+
+def projection(serializer, model, prefix=''):
+    """``(select_related paths, only columns)`` for what ``serializer`` renders; columns may be None."""
+    related, columns = [], []
+    for field in serializer.fields.values():
+        if field.write_only:
+            continue
+        if isinstance(field, serializers.BaseSerializer):
+            path = f'{prefix}{field.source}'
+            nested_related, nested_columns = projection(field, field.Meta.model, f'{path}__')
+            related += [path, *nested_related]
+            if columns is not None:
+                columns = None if nested_columns is None else [*columns, path, *nested_columns]
+            continue
+        needed = source_columns(model, field.source)
+        if needed is None:
+            columns = None
+            continue
+        field_related, field_columns = needed
+        related += [f'{prefix}{path}' for path in field_related]
+        if columns is not None:
+            columns += [f'{prefix}{column}' for column in field_columns]
+    return related, columns
+
+
+def narrow(queryset, related, columns):
+    """Apply a ``projection()`` to ``queryset``."""
+    joined = [path for path in dict.fromkeys(related) if joinable(queryset.model, path)]
+    # Relations that can't be joined (a log's user, see logstore.py) are
+    # fetched with a second query instead
+    prefetched = [path for path in dict.fromkeys(related) if path not in joined]
+    if joined:
+        queryset = queryset.select_related(*joined)
+    if prefetched:
+        queryset = queryset.prefetch_related(*prefetched)
+        if columns is not None:
+            columns = [column for column in columns if not column.startswith(tuple(f'{path}__' for path in prefetched))]
+    if columns is not None:
+        queryset = queryset.only(*dict.fromkeys(columns))
+    return queryset
+
+
+class SparseFieldsMixin:
+    """
+    View side of the sparse fieldsets: passes ``fields``/``expand`` to the
+    serializer, projects the queryset and side-loads ``included`` objects.
+    The serializer must use ``ExpandableFieldsMixin``.
+    """
+
+    def is_list_request(self):
+        return isinstance(self, ListModelMixin) and (self.lookup_url_kwarg or self.lookup_field) not in self.kwargs
+
+    def get_sparse_options(self):
+        """``(fields, expand, include)`` trees for this request."""
+        if getattr(self, '_sparse_options', None) is None:
+            params = self.request.query_params
+            serializer_class = self.get_serializer_class()
+            if self.request.method not in SAFE_METHODS:
+                options = (None, None, {})
+            else:
+                fields = parse(params.get('fields')) or None
+                expand = parse(params.get('expand')) if 'expand' in params or self.is_list_request() else None
+                include = {}
+                for name, nested_expand in parse(params.get('include') if self.is_list_request() else '').items():
+                    if name not in serializer_class.expandable_fields:
+                        raise ValidationError({'include': f"Can't include '{name}'."})
+                    # Fields named under an included relation shape the included
+                    # objects; the rows keep the id
+                    nested_fields = None
+                    if fields and name in fields:
+                        nested_fields, fields[name] = fields[name] or None, {}
+                    include[name] = (nested_fields, nested_expand)
+                options = (fields, expand, include)
+            self._sparse_options = options
+        return self._sparse_options
+
+    def get_serializer(self, *args, **kwargs):
+        fields, expand, _ = self.get_sparse_options()
+        kwargs.setdefault('fields', fields)
+        kwargs.setdefault('expand', expand)
+        return super().get_serializer(*args, **kwargs)
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        if self.request.method not in SAFE_METHODS:
+            return queryset
+        return self.project(queryset)
+
+    def project(self, queryset):
+        """Narrow ``queryset`` to the relations and columns the response renders."""
+        serializer = self.get_serializer()
+        related, columns = projection(serializer, queryset.model)
+        _, _, include = self.get_sparse_options()
+        for name in include:
+            nested = self.included_serializer(name)
+            nested_related, nested_columns = projection(nested, nested.Meta.model, f'{name}__')
+            related += [name, *nested_related]
+            if columns is not None:
+                columns = None if nested_columns is None else [*columns, name, *nested_columns]
+        return narrow(queryset, related, columns)
+
+    def included_serializer(self, name, instance=None, many=False):
+        _, _, include = self.get_sparse_options()
+        fields, expand = include[name]
+        return self.get_serializer_class().expandable_fields[name](instance, many=many, fields=fields, expand=expand)
+
+    def paginate_queryset(self, queryset):
+        self.page_objects = super().paginate_queryset(queryset)
+        return self.page_objects
+
+    def get_paginated_response(self, data):
+        response = super().get_paginated_response(data)
+        _, _, include = self.get_sparse_options()
+        if include and getattr(self, 'page_objects', None) is not None:
+            response.data['included'] = {name: self.side_load(name) for name in include}
+        return response
+
+    def side_load(self, name):
+        related = {}
+        for row in self.page_objects:
+            try:
+                obj = getattr(row, name)
+            except ObjectDoesNotExist:
+                # A log's user may have been deleted (see logstore.py)
+                continue
+            if obj is not None:
+                related.setdefault(obj.pk, obj)
+        data = self.included_serializer(name, list(related.values()), many=True).data
+        return {str(pk): item for pk, item in zip(related, data)}
@@ -1,3 +1,1583 @@
-from django.test import TestCase
+import asyncio
+import csv
+import datetime
+import io
+import json
+import tempfile
+import zipfile
+from pathlib import Path
+from decimal import Decimal
+from unittest.mock import Mock, patch
 
-# Create your tests here.
+from asgiref.sync import async_to_sync, iscoroutinefunction, sync_to_async
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.core.handlers.asgi import ASGIHandler
+from django.core.management import CommandError, call_command
+from django.conf import settings
+from django.db import OperationalError, connection, connections, router, transaction
+from django.db.models import Sum
+from django.http import HttpResponse
+from django.test import SimpleTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory, APITestCase, APITransactionTestCase
+from rest_framework_simplejwt.tokens import AccessToken
+
+from . import archive, billing, caching, events, ledger, logstore, metrics, rollup, writes
+from .audit import log_writer
+from .backends.sqlite.base import DatabaseWrapper
+from .fastlist import FastListMixin, Plan, plan_for
+from .middleware import RequestMetricsMiddleware
+from .models import User, Customer, Payment, Log, DailyRevenue, CustomerLedger, Invoice
+from .pagination import KeysetPagination
+from .renderers import FastJSONRenderer
+from .search import get_search_backend, SQLiteFTSSearchBackend
+from .serializers import PaymentSerializer
+from .views import PaymentListCreateAPIView, CustomerListCreateAPIView, LogListView, UserListView
+
+
+class PaymentAPITestCase(APITestCase):
+    """Common fixtures: one admin, one employee and a customer each."""
+
+    # The logs may be routed to their own database
+    databases = '__all__'
+
+    def setUp(self):
+        # Cached responses and counters live outside the test transaction
+        cache.clear()
+        self.admin = User.objects.create_user(
+            username='admin', password='pass', user_type='admin', is_staff=True, is_superuser=True
+        )
+        self.employee = User.objects.create_user(username='employee', password='pass')
+        self.admin_customer = Customer.objects.create(
+            name='Admin Customer', email='admin-customer@example.com', created_by=self.admin
+        )
+        self.employee_customer = Customer.objects.create(
+            name='Employee Customer', email='employee-customer@example.com', created_by=self.employee
+        )
+
+    def create_payment(self, customer, amount, date, created_by):
+        payment = Payment.objects.create(customer=customer, amount=amount, created_by=created_by)
+        # ``date`` is auto_now_add, so backdate it with an update, which
+        # bypasses the signals that maintain the revenue rollup
+        Payment.objects.filter(pk=payment.pk).update(date=date)
+        rollup.rebuild()
+        ledger.rebuild()
+        return payment
+
+
+class PaymentStatsTests(PaymentAPITestCase):
+    url = reverse('payment-stats')
+
+    def setUp(self):
+        super().setUp()
+        self.create_payment(self.admin_customer, '100.00', datetime.datetime(2025, 1, 6, 10), self.admin)
+        self.create_payment(self.admin_customer, '50.00', datetime.datetime(2025, 1, 6, 18), self.admin)
+        self.create_payment(self.employee_customer, '25.50', datetime.datetime(2025, 2, 14, 9), self.employee)
+        self.create_payment(self.employee_customer, '10.00', datetime.datetime(2024, 12, 31, 9), self.employee)
+
+    def test_admin_sees_all_payments(self):
+        self.client.force_authenticate(self.admin)
+        response = self.client.get(self.url)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['total_payments'], 4)
+        self.assertEqual(response.data['total_amount'], Decimal('185.50'))
+        self.assertEqual(
+            [(b['period'], b['amount'], b['count']) for b in response.data['daily']],
+            [
+                (datetime.date(2024, 12, 31), Decimal('10.00'), 1),
+                (datetime.date(2025, 1, 6), Decimal('150.00'), 2),
+                (datetime.date(2025, 2, 14), Decimal('25.50'), 1),
+            ]
+        )
+        self.assertEqual(
+            [b['period'] for b in response.data['monthly']],
+            [datetime.date(2024, 12, 1), datetime.date(2025, 1, 1), datetime.date(2025, 2, 1)]
+        )
+        self.assertEqual(
+            [(b['period'], b['count']) for b in response.data['yearly']],
+            [(datetime.date(2024, 1, 1), 1), (datetime.date(2025, 1, 1), 3)]
+        )
+
+    def test_employee_only_sees_own_payments(self):
+        self.client.force_authenticate(self.employee)
+        response = self.client.get(self.url, {'created_by': self.admin.id})
+        self.assertEqual(response.data['total_payments'], 0)
+
+        response = self.client.get(self.url)
+        self.assertEqual(response.data['total_payments'], 2)
+        self.assertEqual(response.data['total_amount'], Decimal('35.50'))
+
+    def test_date_range_and_period_filters(self):
+        self.client.force_authenticate(self.admin)
+        response = self.client.get(self.url, {
+            'start_date': '2025-01-01', 'end_date': '2025-01-31', 'period': 'weekly',
+        })
+
+        self.assertEqual(response.data['total_payments'], 2)
+        self.assertEqual(response.data['weekly'], [
+            {'period': datetime.date(2025, 1, 6), 'amount': Decimal('150.00'), 'count': 2},
+        ])
+        self.assertNotIn('daily', response.data)
+
+    def test_invalid_period(self):
+        self.client.force_authenticate(self.admin)
+        response = self.client.get(self.url, {'period': 'hourly'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_search_aggregates_matching_payments(self):
+        self.client.force_authenticate(self.admin)
+        response = self.client.get(self.url, {'search': 'employee cust', 'period': 'yearly'})
+        self.assertEqual(response.data['total_payments'], 2)
+        self.assertEqual(response.data['total_amount'], Decimal('35.50'))
+        self.assertEqual(
+            [(b['period'], b['count']) for b in response.data['yearly']],
+            [(datetime.date(2024, 1, 1), 1), (datetime.date(2025, 1, 1), 1)]
+        )
+
+
+class Tomorrow(datetime.date):
+    """Stands in for ``datetime.date`` when a test needs the next day."""
+
+    @classmethod
+    def today(cls):
+        return super().today() + datetime.timedelta(days=1)
+
+
+class PaymentChartTests(PaymentAPITestCase):
+    url = reverse('payment-chart')
+
+    def setUp(self):
+        super().setUp()
+        self.create_payment(self.admin_customer, '100.00', datetime.datetime(2025, 1, 20, 10), self.admin)
+        self.create_payment(self.employee_customer, '50.00', datetime.datetime(2025, 3, 5, 9), self.employee)
+        self.create_payment(self.employee_customer, '25.00', datetime.datetime(2025, 3, 31, 23, 30), self.employee)
+        self.params = {'bucket': 'month', 'start_date': '2025-01-15', 'end_date': '2025-04-10'}
+
+    def test_zero_filled_buckets(self):
+        self.client.force_authenticate(self.admin)
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url, self.params)
+        self.assertEqual(response.data['labels'], ['Jan 2025', 'Feb 2025', 'Mar 2025', 'Apr 2025'])
+        self.assertEqual(response.data['periods'][0], datetime.date(2025, 1, 1))
+        [series] = response.data['series']
+        self.assertEqual(series['label'], 'All payments')
+        self.assertEqual(series['amounts'], [Decimal('100'), 0, Decimal('75'), 0])
+        self.assertEqual(series['counts'], [1, 0, 2, 0])
+
+        # Searching aggregates payments instead of the rollup, with the same buckets
+        response = self.client.get(self.url, {**self.params, 'search': 'Employee'})
+        self.assertEqual(response.data['series'][0]['amounts'], [0, 0, Decimal('75'), 0])
+
+        response = self.client.get(self.url, {'bucket': 'week', 'start_date': '2025-03-01', 'end_date': '2025-03-10'})
+        self.assertEqual(response.data['labels'], ['Week of Feb 24', 'Week of Mar 3', 'Week of Mar 10'])
+        self.assertEqual(response.data['series'][0]['amounts'], [0, Decimal('50'), 0])
+
+    def test_series_per_user(self):
+        self.client.force_authenticate(self.admin)
+        response = self.client.get(self.url, {**self.params, 'by_user': '1'})
+        self.assertEqual(
+            [(s['user'], s['label'], s['amounts']) for s in response.data['series']],
+            [(self.admin.id, 'admin', [Decimal('100'), 0, 0, 0]), (self.employee.id, 'employee', [0, 0, Decimal('75'), 0])]
+        )
+
+        self.client.force_authenticate(self.employee)
+        response = self.client.get(self.url, {**self.params, 'by_user': '1'})
+        self.assertEqual([s['label'] for s in response.data['series']], ['employee'])
+
+    @override_settings(RESPONSE_CACHE_TIMEOUT=300)
+    def test_default_window_moves_with_the_date(self):
+        self.client.force_authenticate(self.admin)
+        response = self.client.get(self.url, {'bucket': 'day'})
+
+        # No write happened, but a new day has a new last bucket
+        with patch('payments.views.datetime.date', Tomorrow):
+            response = self.client.get(self.url, {'bucket': 'day'}, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual((response.status_code, response.data['periods'][-1]), (200, Tomorrow.today()))
+
+    def test_invalid_parameters(self):
+        self.client.force_authenticate(self.admin)
+        self.assertEqual(self.client.get(self.url, {'bucket': 'hour'}).status_code, 400)
+        self.assertEqual(self.client.get(self.url, {'start_date': 'yesterday'}).status_code, 400)
+        self.assertEqual(self.client.get(self.url, {'bucket': 'day', 'start_date': '2000-01-01'}).status_code, 400)
+
+
+class DailyRevenueTests(PaymentAPITestCase):
+    def rollup_rows(self):
+        return sorted(
+            DailyRevenue.objects.values_list('day', 'created_by_id', 'customer_id', 'amount', 'payment_count')
+        )
+
+    def rebuilt_rows(self):
+        current = self.rollup_rows()
+        rollup.rebuild()
+        rebuilt = self.rollup_rows()
+        self.assertEqual(current, rebuilt)
+        return rebuilt
+
+    def test_signals_keep_rollup_in_sync(self):
+        today = datetime.date.today()
+        first = Payment.objects.create(customer=self.admin_customer, amount='100.00', created_by=self.admin)
+        Payment.objects.create(customer=self.admin_customer, amount='20.00', created_by=self.admin)
+        self.assertEqual(self.rebuilt_rows(), [
+            (today, self.admin.id, self.admin_customer.id, Decimal('120.00'), 2),
+        ])
+
+        # Moving a payment to another day and customer moves its totals
+        first.date = datetime.datetime(2025, 3, 1, 12)
+        first.customer = self.employee_customer
+        first.amount = Decimal('80.00')
+        first.save()
+        self.assertEqual(self.rebuilt_rows(), [
+            (datetime.date(2025, 3, 1), self.admin.id, self.employee_customer.id, Decimal('80.00'), 1),
+            (today, self.admin.id, self.admin_customer.id, Decimal('20.00'), 1),
+        ])
+
+        first.delete()
+        self.assertEqual(self.rebuilt_rows(), [
+            (today, self.admin.id, self.admin_customer.id, Decimal('20.00'), 1),
+        ])
+
+    def test_bulk_import_updates_rollup(self):
+        self.client.force_authenticate(self.employee)
+        rows = [
+            {'customer_id': self.employee_customer.id, 'amount': '10.00'},
+            {'customer_id': self.employee_customer.id, 'amount': '2.50'},
+        ]
+        self.client.post(reverse('payment-bulk-create'), rows, format='json')
+        self.assertEqual(self.rebuilt_rows(), [
+            (datetime.date.today(), self.employee.id, self.employee_customer.id, Decimal('12.50'), 2),
+        ])
+
+    def test_concurrently_created_rows_are_added_to(self):
+        key = rollup.rollup_key(datetime.date(2025, 1, 1), self.admin.id, self.admin_customer.id)
+        real_run_write = writes.run_write
+
+        def lose_race(func):
+            # Another request creates the row between our UPDATE and INSERT
+            DailyRevenue.objects.create(
+                day=key[0], created_by_id=key[1], customer_id=key[2], amount='5.00', payment_count=1
+            )
+            with patch('payments.rollup.writes.run_write', real_run_write):
+                return real_run_write(func)
+
+        with patch('payments.rollup.writes.run_write', side_effect=lose_race):
+            rollup.apply_delta(key, Decimal('10.00'), 1)
+        self.assertEqual(self.rollup_rows(), [(*key, Decimal('15.00'), 2)])
+
+    def test_removals_from_creator_less_duplicates_keep_totals(self):
+        first = User.objects.create_user(username='first', password='x')
+        second = User.objects.create_user(username='second', password='x')
+        Payment.objects.create(customer=self.admin_customer, amount='100.00', created_by=first)
+        removed = Payment.objects.create(customer=self.admin_customer, amount='30.00', created_by=second)
+        first.delete()
+        second.delete()
+        self.assertEqual(DailyRevenue.objects.filter(created_by=None).count(), 2)
+
+        rollup.apply_payment({**rollup.payment_values(removed), 'created_by_id': None}, -1)
+        self.assertEqual(
+            DailyRevenue.objects.aggregate(amount=Sum('amount'), count=Sum('payment_count')),
+            {'amount': Decimal('100.00'), 'count': 1}
+        )
+
+    def test_rebuild_command_limits_range(self):
+        self.create_payment(self.admin_customer, '10.00', datetime.datetime(2025, 1, 1, 9), self.admin)
+        self.create_payment(self.admin_customer, '30.00', datetime.datetime(2025, 1, 2, 9), self.admin)
+        DailyRevenue.objects.update(amount=0)
+
+        call_command('rebuild_daily_revenue', '--start', '2025-01-02', '--end', '2025-01-02', stdout=io.StringIO())
+        self.assertEqual(
+            list(DailyRevenue.objects.order_by('day').values_list('amount', flat=True)),
+            [Decimal('0'), Decimal('30.00')]
+        )
+
+
+class ListQueryCountTests(PaymentAPITestCase):
+    """List endpoints must not issue per-row queries for nested objects."""
+
+    def setUp(self):
+        super().setUp()
+        for i in range(15):
+            customer = Customer.objects.create(
+                name=f'Customer {i}', email=f'customer{i}@example.com',
+                created_by=self.admin if i % 2 else self.employee
+            )
+            Payment.objects.create(
+                customer=customer, amount='10.00', created_by=self.employee if i % 2 else self.admin
+            )
+        self.client.force_authenticate(self.admin)
+
+    def assertConstantQueries(self, url, num):
+        # One COUNT(*) for the paginator plus one SELECT for the page
+        for page_size in (1, 5, 15):
+            with self.assertNumQueries(num):
+                response = self.client.get(url, {'page_size': page_size})
+            self.assertEqual(len(response.data['results']), page_size)
+
+    def test_payment_list(self):
+        self.assertConstantQueries(reverse('payment-list-create'), 2)
+
+    def test_customer_list(self):
+        self.assertConstantQueries(reverse('customer-list-create'), 2)
+
+    def test_log_list(self):
+        self.assertConstantQueries(reverse('log-list'), 2)
+
+    def test_payment_detail(self):
+        payment = Payment.objects.first()
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('payment-retrieve-update-destroy', args=[payment.pk]))
+        self.assertEqual(response.data['customer']['created_by']['username'], payment.customer.created_by.username)
+        self.assertNotIn('password', response.data['created_by'])
+
+    def test_payment_update_through_projected_queryset(self):
+        payment = Payment.objects.first()
+        response = self.client.put(
+            reverse('payment-retrieve-update-destroy', args=[payment.pk]),
+            {'customer_id': payment.customer_id, 'amount': '99.00', 'description': 'updated'}
+        )
+        self.assertEqual(response.status_code, 200)
+        payment.refresh_from_db()
+        self.assertEqual((payment.amount, payment.description), (Decimal('99.00'), 'updated'))
+
+
+class SparseFieldsTests(PaymentAPITestCase):
+    url = reverse('payment-list-create')
+
+    def setUp(self):
+        super().setUp()
+        self.payment = Payment.objects.create(customer=self.admin_customer, amount='10.00', created_by=self.employee)
+        Payment.objects.create(customer=self.employee_customer, amount='20.00', created_by=self.employee)
+        Payment.objects.create(customer=self.admin_customer, amount='30.00', created_by=self.employee)
+        self.client.force_authenticate(self.admin)
+
+    def test_lists_reference_related_objects_by_id(self):
+        row = self.client.get(self.url, {'ordering': 'amount'}).data['results'][0]
+        self.assertEqual((row['customer'], row['created_by']), (self.admin_customer.id, self.employee.id))
+
+        row = self.client.get(reverse('customer-list-create')).data['results'][0]
+        self.assertIsInstance(row['created_by'], int)
+
+        # Detail responses still embed them
+        response = self.client.get(reverse('payment-retrieve-update-destroy', args=[self.payment.pk]))
+        self.assertEqual(response.data['customer']['created_by']['username'], 'admin')
+
+    def test_fields_and_expand(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url, {'fields': 'id,amount,customer.name', 'ordering': 'amount'})
+        self.assertEqual(response.data['results'][0], {'id': self.payment.id, 'amount': '10.00', 'customer': {'name': 'Admin Customer'}})
+        # The SELECT reads just those columns
+        select = queries.captured_queries[-1]['sql']
+        self.assertIn('"payments_customer"."name"', select)
+        self.assertNotIn('"payments_customer"."email"', select)
+        self.assertNotIn('"payments_payment"."description"', select)
+
+        response = self.client.get(self.url, {'expand': 'customer.created_by', 'fields': 'id,customer', 'ordering': 'amount'})
+        self.assertEqual(response.data['results'][0]['customer']['created_by']['username'], 'admin')
+
+        response = self.client.get(reverse('log-list'), {'fields': 'action,user_username'})
+        self.assertEqual(set(response.data['results'][0]), {'action', 'user_username'})
+
+        self.assertEqual(self.client.get(self.url, {'fields': 'id,secret'}).status_code, 400)
+        self.assertEqual(self.client.get(self.url, {'include': 'amount'}).status_code, 400)
+
+    def test_include_side_loads_each_related_object_once(self):
+        with self.assertNumQueries(2):
+            response = self.client.get(self.url, {'include': 'customer,created_by', 'fields': 'id,customer,created_by,customer.name'})
+        self.assertEqual(
+            response.data['included']['customer'],
+            {str(self.admin_customer.id): {'name': 'Admin Customer'}, str(self.employee_customer.id): {'name': 'Employee Customer'}}
+        )
+        self.assertEqual(list(response.data['included']['created_by']), [str(self.employee.id)])
+        self.assertEqual(response.data['results'][0]['customer'], self.admin_customer.id)
+
+
+class FastListTests(PaymentAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.admin_customer.name = 'Zoë \u2028 "Admin"'
+        self.admin_customer.save()
+        Payment.objects.create(customer=self.admin_customer, amount='10.50', created_by=self.employee, description='Tab\there')
+        orphan = Payment.objects.create(customer=self.employee_customer, amount='20.00', created_by=self.employee)
+        # Rows whose creator was deleted render a null created_by
+        Payment.objects.filter(pk=orphan.pk).update(created_by=None)
+        Customer.objects.filter(pk=self.employee_customer.pk).update(created_by=None)
+        self.client.force_authenticate(self.admin)
+
+    def assertSameAsSerializers(self, url_name, params):
+        fast = self.client.get(reverse(url_name), params)
+        cache.clear()
+        with patch.object(FastListMixin, 'get_list_plan', return_value=None):
+            slow = self.client.get(reverse(url_name), params)
+        self.assertEqual(fast.status_code, 200)
+        self.assertEqual(fast.content, JSONRenderer().render(slow.data))
+
+    def test_rows_match_the_serializers_byte_for_byte(self):
+        for url_name in ('payment-list-create', 'customer-list-create', 'log-list', 'async-payment-list'):
+            for params in ({}, {'expand': 'customer.created_by,created_by,user'}, {'cursor': ''}):
+                with self.subTest(url_name=url_name, params=params):
+                    self.assertSameAsSerializers(url_name, params)
+        self.assertSameAsSerializers('payment-list-create', {'fields': 'id,amount,date,customer.name'})
+        self.assertSameAsSerializers('log-list', {'fields': 'action_display,user_username,created_at'})
+
+    def test_plans(self):
+        plan = plan_for(PaymentSerializer, None, {})
+        self.assertEqual(plan.columns, ['id', 'customer', 'amount', 'date', 'description', 'created_by'])
+        # Expanded relations read the joined columns
+        self.assertIn('customer__created_by__username', plan_for(PaymentSerializer, None, {'customer': {'created_by': {}}}).columns)
+        # Side-loading needs model instances, so it keeps the serializers
+        with patch.object(Plan, 'render', autospec=True, side_effect=Plan.render) as render:
+            self.client.get(reverse('payment-list-create'), {'include': 'customer'})
+            render.assert_not_called()
+            self.client.get(reverse('payment-list-create'), {'fields': 'id,customer'})
+            render.assert_called_once()
+
+    def test_benchmark_command(self):
+        out = io.StringIO()
+        call_command('benchmark_serializers', rows=5, repeat=1, stdout=out)
+        self.assertIn('payments expanded', out.getvalue())
+        self.assertEqual(Payment.objects.count(), 2)
+
+    def test_renderer_falls_back_for_what_orjson_cant_encode(self):
+        data = {'amount': Decimal('1.50'), 'at': datetime.datetime(2024, 1, 2, 3, 4, 5, 678901), 'big': 2 ** 70}
+        self.assertEqual(FastJSONRenderer().render(data), JSONRenderer().render(data))
+        self.assertEqual(
+            FastJSONRenderer().render(data, 'application/json; indent=2'),
+            JSONRenderer().render(data, 'application/json; indent=2')
+        )
+
+
+@override_settings(PAGINATION_ESTIMATE_THRESHOLD=3)
+@override_settings(PAGINATION_COUNT_STRATEGY='estimate')
+class CountStrategyTests(PaymentAPITestCase):
+    url = reverse('payment-list-create')
+
+    def setUp(self):
+        super().setUp()
+        for i in range(4):
+            Payment.objects.create(customer=self.admin_customer, amount='10.00', created_by=self.admin)
+        self.client.force_authenticate(self.admin)
+
+    def count(self, url, params=None):
+        data = self.client.get(url, params or {}).data
+        return data['count'], data['count_is_estimate']
+
+    def test_counts_below_the_threshold_are_exact(self):
+        self.assertEqual(self.count(self.url, {'created_by': self.employee.id}), (0, False))
+        with override_settings(PAGINATION_ESTIMATE_THRESHOLD=5):
+            self.assertEqual(self.count(self.url), (4, False))
+        self.assertEqual(self.count(reverse('customer-list-create')), (2, False))
+
+    @override_settings(PAGINATION_COUNT_STRATEGY='exact', PAGINATION_ESTIMATE_THRESHOLD=2)
+    def test_setting_decides_for_every_list(self):
+        DailyRevenue.objects.update(payment_count=10)
+        self.assertEqual(self.count(self.url), (4, False))
+        self.assertEqual(self.count(reverse('log-list')), (Log.objects.count(), False))
+
+    def test_payments_are_estimated_from_the_rollup(self):
+        DailyRevenue.objects.update(payment_count=10)
+        self.assertEqual(self.count(self.url), (10, True))
+        self.assertEqual(self.count(reverse('async-payment-list')), (10, True))
+        # Never below the rows already counted
+        DailyRevenue.objects.update(payment_count=1)
+        self.assertEqual(self.count(self.url, {'page_size': 2}), (3, True))
+
+    def test_unfiltered_logs_are_estimated_from_the_table(self):
+        ids = list(Log.objects.order_by('id').values_list('id', flat=True))
+        Log.objects.filter(id__in=ids[1:-1]).delete()
+        with override_settings(PAGINATION_ESTIMATE_THRESHOLD=2):
+            # The span of the ids counts the deleted rows
+            self.assertEqual(self.count(reverse('log-list')), (len(ids), True))
+
+    def test_searches_are_cached(self):
+        self.assertEqual(self.count(self.url, {'search': 'admin'}), (4, False))
+        Payment.objects.create(customer=self.admin_customer, amount='10.00', created_by=self.admin)
+        self.assertEqual(self.count(self.url, {'search': 'admin'}), (4, True))
+        self.assertEqual(self.count(self.url, {'search': 'admin', 'page_size': 2}), (4, True))
+        cache.clear()
+        self.assertEqual(self.count(self.url, {'search': 'admin'}), (5, False))
+
+    @override_settings(PAGINATION_COUNT_STRATEGY='cached')
+    def test_cached_strategy(self):
+        url = reverse('customer-list-create')
+        self.assertEqual(self.count(url), (2, False))
+        with self.assertNumQueries(1):
+            self.assertEqual(self.count(url, {'page_size': 1}), (2, True))
+
+
+class CustomerLedgerTests(PaymentAPITestCase):
+    url = reverse('customer-ledger')
+
+    def setUp(self):
+        super().setUp()
+        Customer.objects.filter(pk__in=[self.admin_customer.pk, self.employee_customer.pk]).update(package_fee='1000.00')
+        ledger.rebuild()
+        self.period = ledger.current_period()
+        self.last_period = ledger.period_of(self.period - datetime.timedelta(days=1))
+
+    def row(self, customer, period=None):
+        row = CustomerLedger.objects.get(customer=customer, period=period or self.period)
+        return row.expected, row.paid, row.balance, row.status
+
+    def assertMatchesRebuild(self):
+        rows = lambda: sorted(CustomerLedger.objects.values_list('customer_id', 'period', 'expected', 'paid', 'balance', 'status'))
+        incremental = rows()
+        ledger.rebuild()
+        self.assertEqual(incremental, rows())
+
+    def test_payments_update_ledger(self):
+        self.assertEqual(self.row(self.admin_customer), (Decimal('1000'), 0, Decimal('1000'), 'unpaid'))
+        first = Payment.objects.create(customer=self.admin_customer, amount='400.00', created_by=self.admin)
+        self.assertEqual(self.row(self.admin_customer), (Decimal('1000'), Decimal('400'), Decimal('600'), 'partial'))
+        Payment.objects.create(customer=self.admin_customer, amount='600.00', created_by=self.admin)
+        self.assertEqual(self.row(self.admin_customer)[2:], (0, 'paid'))
+        self.assertMatchesRebuild()
+
+        # Moving a payment into last month reopens this month and creates last month's row
+        first.date = datetime.datetime.combine(self.last_period, datetime.time(12))
+        first.save()
+        self.assertEqual(self.row(self.admin_customer)[2:], (Decimal('400'), 'partial'))
+        self.assertEqual(self.row(self.admin_customer, self.last_period)[1:], (Decimal('400'), Decimal('600'), 'partial'))
+        self.assertMatchesRebuild()
+
+        first.delete()
+        self.assertEqual(self.row(self.admin_customer, self.last_period)[1:], (0, Decimal('1000'), 'unpaid'))
+
+    def test_package_fee_change_applies_from_current_month(self):
+        self.create_payment(self.admin_customer, '1000.00', datetime.datetime.combine(self.last_period, datetime.time(9)), self.admin)
+        self.admin_customer.refresh_from_db()
+        self.admin_customer.package_fee = Decimal('1500.00')
+        self.admin_customer.save()
+        self.assertEqual(self.row(self.admin_customer), (Decimal('1500'), 0, Decimal('1500'), 'unpaid'))
+        self.assertEqual(self.row(self.admin_customer, self.last_period)[0], Decimal('1000'))
+
+        new = Customer.objects.create(name='New', email='new@example.com', package_fee='700', created_by=self.admin)
+        self.assertEqual(self.row(new), (Decimal('700'), 0, Decimal('700'), 'unpaid'))
+
+    def test_bulk_import_updates_ledger(self):
+        self.client.force_authenticate(self.employee)
+        rows = [{'customer_id': self.employee_customer.id, 'amount': '250.00'}] * 2
+        self.client.post(reverse('payment-bulk-create'), rows, format='json')
+        self.assertEqual(self.row(self.employee_customer)[1:], (Decimal('500'), Decimal('500'), 'partial'))
+
+        self.client.post(reverse('customer-bulk-create'), [{'name': 'B', 'email': 'b@example.com', 'package_fee': '900'}], format='json')
+        self.assertEqual(self.row(Customer.objects.get(email='b@example.com'))[2:], (Decimal('900'), 'unpaid'))
+
+    def test_endpoint_filters(self):
+        self.create_payment(self.admin_customer, '1000.00', datetime.datetime.combine(self.last_period, datetime.time(9)), self.admin)
+        self.create_payment(self.employee_customer, '300.00', datetime.datetime.combine(self.last_period, datetime.time(9)), self.employee)
+        Payment.objects.create(customer=self.admin_customer, amount='1000.00', created_by=self.admin)
+
+        self.client.force_authenticate(self.admin)
+        response = self.client.get(self.url)
+        self.assertEqual(
+            [(r['customer_name'], r['status']) for r in response.data['results']],
+            [('Employee Customer', 'unpaid'), ('Admin Customer', 'paid')]
+        )
+        response = self.client.get(self.url, {'status': 'overdue'})
+        self.assertEqual(
+            [(r['customer'], r['period'], r['balance']) for r in response.data['results']],
+            [(self.employee_customer.id, self.last_period.isoformat(), '700.00')]
+        )
+        response = self.client.get(self.url, {'period': self.last_period.isoformat()[:7], 'ordering': 'balance'})
+        self.assertEqual([r['status'] for r in response.data['results']], ['paid', 'partial'])
+
+        self.client.force_authenticate(self.employee)
+        response = self.client.get(self.url)
+        self.assertEqual([r['customer'] for r in response.data['results']], [self.employee_customer.id])
+
+        self.assertEqual(self.client.get(self.url, {'status': 'late'}).status_code, 400)
+        self.assertEqual(self.client.get(self.url, {'period': 'soon'}).status_code, 400)
+
+    def test_open_period_command_fills_missed_months(self):
+        months = [self.period]
+        for _ in range(3):
+            months.insert(0, ledger.period_of(months[0] - datetime.timedelta(days=1)))
+        Customer.objects.update(created_at=datetime.datetime.combine(months[0], datetime.time(9)))
+        ledger.rebuild()
+        CustomerLedger.objects.filter(period__gt=months[0]).delete()
+        versions = caching.get_versions(['customers'])
+
+        # The endpoint only reads
+        self.client.force_authenticate(self.admin)
+        self.client.get(self.url)
+        self.assertEqual(set(CustomerLedger.objects.values_list('period', flat=True)), {months[0]})
+
+        out = io.StringIO()
+        call_command('open_ledger_period', stdout=out)
+        self.assertIn('Created 6 ledger rows', out.getvalue())
+        self.assertEqual(
+            sorted(set(CustomerLedger.objects.values_list('period', flat=True))), months
+        )
+        self.assertNotEqual(caching.get_versions(['customers']), versions)
+
+    @override_settings(RESPONSE_CACHE_TIMEOUT=300)
+    def test_new_month_is_not_answered_from_the_old_one(self):
+        self.client.force_authenticate(self.admin)
+        etag = self.client.get(self.url)['ETag']
+        with patch('payments.ledger.current_period', return_value=ledger.next_period(self.period)):
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual((response.status_code, response.data['count']), (200, 0))
+
+    def test_rebuild_command(self):
+        CustomerLedger.objects.all().delete()
+        call_command('rebuild_ledger', '--start', self.period.isoformat()[:7], stdout=io.StringIO())
+        self.assertEqual(CustomerLedger.objects.count(), 2)
+
+
+class InvoiceGenerationTests(PaymentAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.period = ledger.current_period()
+        Customer.objects.update(package_fee='1000.00')
+        self.customers = [
+            Customer.objects.create(name=f'C{i}', email=f'c{i}@example.com', package_fee='500.00', created_by=self.admin)
+            for i in range(5)
+        ]
+        Customer.objects.create(name='Inactive', email='inactive@example.com', package_fee='500', is_active=False, created_by=self.admin)
+        Customer.objects.create(name='Free', email='free@example.com', package_fee='0', created_by=self.admin)
+
+    def test_generate_is_idempotent_and_resumable(self):
+        # An interrupted run that only finished the first range
+        first_id, last_id = billing.id_ranges(self.period, 3)[0]
+        self.assertEqual(billing.generate_range(self.period, first_id, last_id), 3)
+
+        self.assertEqual(billing.generate(self.period, chunk_size=3, batch_size=2), 4)
+        self.assertEqual(billing.generate(self.period, chunk_size=3), 0)
+        self.assertEqual(Invoice.objects.filter(period=self.period).count(), 7)
+        self.assertFalse(Invoice.objects.filter(customer__email__in=['inactive@example.com', 'free@example.com']).exists())
+
+        invoice = Invoice.objects.get(customer=self.customers[0])
+        self.assertEqual(invoice.number, f'INV-{self.period:%Y%m}-{self.customers[0].id:06d}')
+        self.assertEqual(invoice.amount, Decimal('500.00'))
+
+    def test_counts_only_invoices_it_created(self):
+        first_id, last_id = billing.id_ranges(self.period, 10)[0]
+        real_run_write = writes.run_write
+
+        def invoiced_concurrently(func):
+            # Another run invoices a customer after this one read the billable ones
+            Invoice.objects.create(customer=self.customers[0], number='INV-OTHER', period=self.period,
+                                   amount='500.00', due_date=self.period)
+            return real_run_write(func)
+
+        with patch('payments.billing.writes.run_write', side_effect=invoiced_concurrently):
+            self.assertEqual(billing.generate_range(self.period, first_id, last_id), 6)
+        self.assertEqual(Invoice.objects.filter(period=self.period).count(), 7)
+
+    def test_skips_customers_created_after_the_period(self):
+        last_period = ledger.period_of(self.period - datetime.timedelta(days=1))
+        Customer.objects.filter(pk=self.admin_customer.pk).update(created_at=datetime.datetime.combine(last_period, datetime.time(9)))
+        self.assertEqual(billing.generate(last_period), 1)
+        self.assertEqual(Invoice.objects.get().customer, self.admin_customer)
+
+    def test_command(self):
+        out = io.StringIO()
+        call_command('generate_invoices', '--period', self.period.isoformat()[:7], '--chunk-size', '2', stdout=out)
+        self.assertIn(f'Created 7 invoices for {self.period:%Y-%m}', out.getvalue())
+
+
+@override_settings(RESPONSE_CACHE_TIMEOUT=0)
+class RequestMetricsTests(PaymentAPITestCase):
+    def setUp(self):
+        super().setUp()
+        metrics.registry.clear()
+        self.client.force_authenticate(self.admin)
+        Payment.objects.create(customer=self.admin_customer, amount='10.00', created_by=self.admin)
+
+    def test_records_per_view_metrics(self):
+        self.client.get(reverse('payment-list-create'))
+        self.client.get(reverse('payment-list-create'))
+        stats = metrics.registry.snapshot()['payment-list-create', 'GET', 200]
+        self.assertEqual(stats['requests'], 2)
+        self.assertGreater(stats['queries'], 0)
+        self.assertGreater(stats['serializer_time'], 0)
+        self.assertGreater(stats['response_bytes'], 0)
+
+        body = self.client.get(reverse('metrics')).content.decode()
+        labels = 'view="payment-list-create",method="GET",status="200"'
+        self.assertIn(f'http_request_duration_seconds_count{{{labels}}} 2', body)
+        self.assertIn(f'http_request_db_queries_total{{{labels}}} {stats["queries"]}', body)
+        self.assertIn(f'http_request_serializer_duration_seconds_total{{{labels}}} ', body)
+
+    def test_metrics_endpoint_is_local_only(self):
+        self.assertEqual(self.client.get(reverse('metrics'), REMOTE_ADDR='203.0.113.5').status_code, 403)
+
+    def test_slow_requests_are_logged(self):
+        with override_settings(SLOW_REQUEST_QUERIES=1), self.assertLogs('payments.metrics', 'WARNING') as logs:
+            self.client.get(reverse('payment-list-create'))
+        self.assertIn('(payment-list-create) 200', logs.output[0])
+
+        with override_settings(SLOW_REQUEST_QUERIES=0, SLOW_REQUEST_THRESHOLD_MS=0), self.assertNoLogs('payments.metrics'):
+            self.client.get(reverse('payment-list-create'))
+
+
+    def test_async_requests_are_not_adapted_to_sync(self):
+        # Django logs every middleware it adapts, in DEBUG
+        with override_settings(DEBUG=True), self.assertNoLogs('django.request', 'DEBUG'):
+            ASGIHandler()
+
+        async def get_response(request):
+            # Queries on sync_to_async's thread count too
+            await sync_to_async(lambda: list(Payment.objects.all()))()
+            return HttpResponse('ok')
+
+        middleware = RequestMetricsMiddleware(get_response)
+        self.assertTrue(iscoroutinefunction(middleware))
+        request = APIRequestFactory().get('/')
+        request.resolver_match = None
+        async_to_sync(middleware)(request)
+        self.assertEqual(metrics.registry.snapshot()['unresolved', 'GET', 200]['queries'], 1)
+
+
+class SeedAndBenchmarkTests(PaymentAPITestCase):
+    def test_seed_then_benchmark_against_baseline(self):
+        call_command('seed_data', '--users', '2', '--customers', '20', '--payments', '200', '--logs', '50',
+                     '--password', 'secret', stdout=io.StringIO())
+        self.assertEqual(User.objects.filter(is_superuser=True).count(), 2)
+        self.assertEqual(Payment.objects.count(), 200)
+        self.assertEqual(Log.objects.filter(username__startswith='seed').count(), 50)
+        self.assertEqual(
+            DailyRevenue.objects.aggregate(total=Sum('amount'))['total'],
+            Payment.objects.aggregate(total=Sum('amount'))['total']
+        )
+
+        admin = User.objects.get(is_superuser=True, username__startswith='seed')
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        baseline = Path(directory.name) / 'baseline.json'
+        options = ['--user', admin.username, '--password', 'secret', '--requests', '2', '--warmup', '0',
+                   '--baseline', str(baseline), '--only', 'payments', 'payment create', 'token obtain']
+        call_command('benchmark_api', *options, '--save', stdout=io.StringIO())
+        report = json.loads(baseline.read_text())
+        self.assertEqual(set(report['scenarios']), {'payments', 'payment create', 'token obtain'})
+        self.assertEqual(report['meta']['rows']['payments'], 200)
+        # Writes are rolled back
+        self.assertEqual(Payment.objects.count(), 200)
+
+        report['scenarios']['payments']['queries'] = 1
+        baseline.write_text(json.dumps(report))
+        out = io.StringIO()
+        with self.assertRaises(CommandError):
+            call_command('benchmark_api', *options, '--tolerance', '100', '--fail-on-regression', stdout=out)
+        self.assertIn('REGRESSION payments: queries 1 ->', out.getvalue())
+
+
+class LogArchiveTests(PaymentAPITestCase):
+    url = reverse('log-archive')
+
+    def setUp(self):
+        super().setUp()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        settings_override = override_settings(LOG_ARCHIVE_DIR=directory.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        Log.objects.all().delete()
+        for day, user, action in [(3, self.admin, 'user_login'), (5, self.employee, 'payment_created'),
+                                  (40, self.employee, 'customer_created'), (400, self.admin, 'user_logout')]:
+            log = Log.objects.create(user=user, action=action, description=f'{action} {day} days ago')
+            Log.objects.filter(pk=log.pk).update(created_at=datetime.datetime(2024, 6, 30, 12) - datetime.timedelta(days=day))
+        self.before = datetime.datetime(2024, 6, 1)
+
+    def test_archive_moves_old_logs_by_month(self):
+        self.assertEqual(archive.archive(self.before, batch_size=1), 2)
+        self.assertEqual(sorted(Log.objects.values_list('action', flat=True)), ['payment_created', 'user_login'])
+        self.assertEqual(archive.archived_months(), [datetime.date(2023, 5, 1), datetime.date(2024, 5, 1)])
+
+        entries = archive.read(datetime.date(2024, 5, 1))
+        self.assertEqual([(e['user_username'], e['action'], e['action_display']) for e in entries],
+                         [('employee', 'customer_created', 'Customer Created')])
+        # A batch appended again after an interrupted run is read once
+        archive.append(datetime.date(2024, 5, 1), [{k: v for k, v in entries[0].items() if k != 'action_display'}])
+        self.assertEqual(len(archive.read(datetime.date(2024, 5, 1))), 1)
+
+    def test_endpoint(self):
+        call_command('archive_logs', '--days', str((datetime.date.today() - self.before.date()).days), stdout=io.StringIO())
+        self.client.force_authenticate(self.admin)
+        self.assertEqual(self.client.get(self.url).data, {'months': ['2023-05', '2024-05']})
+        response = self.client.get(self.url, {'month': '2024-05', 'search': 'CUSTOMER'})
+        self.assertEqual([r['action'] for r in response.data['results']], ['customer_created'])
+        self.assertEqual(self.client.get(self.url, {'month': '2024-05', 'action': 'user_login'}).data['count'], 0)
+        self.assertEqual(self.client.get(self.url, {'month': '2020-01'}).status_code, 404)
+        self.assertEqual(self.client.get(self.url, {'month': 'May'}).status_code, 400)
+
+        self.client.force_authenticate(self.employee)
+        self.assertEqual(self.client.get(self.url, {'month': '2023-05'}).data['count'], 0)
+        self.assertEqual(self.client.get(self.url, {'month': '2024-05'}).data['count'], 1)
+
+
+class LogStoreTests(PaymentAPITestCase):
+    def test_logs_live_in_the_main_database_by_default(self):
+        self.assertFalse(logstore.is_separate())
+        self.assertEqual(logstore.database(), 'default')
+        with self.assertRaises(CommandError):
+            call_command('move_logs', stdout=io.StringIO())
+
+    def test_router_sends_logs_to_the_log_database(self):
+        databases = {**settings.DATABASES, 'logs': {**settings.DATABASES['default'], 'NAME': 'logs.sqlite3'}}
+        with override_settings(DATABASES=databases):
+            self.assertEqual(logstore.database(), 'logs')
+            self.assertEqual(router.db_for_read(Payment), 'default')
+            log = Log(user_id=self.admin.id)
+            log._state.db = 'logs'
+            self.assertEqual(router.db_for_read(User, instance=log), 'default')
+            self.assertTrue(router.allow_relation(log, self.admin))
+            self.assertTrue(router.allow_migrate('logs', 'payments', model_name='log'))
+            self.assertFalse(router.allow_migrate('logs', 'payments', model_name='payment'))
+            self.assertTrue(router.allow_migrate('default', 'payments', model_name='log'))
+
+    def test_entries_keep_their_username_after_the_user_is_deleted(self):
+        # On the default, single database too: deleting a user no longer
+        # cascades to their entries
+        self.assertFalse(logstore.is_separate())
+        user = User.objects.create_user(username='temporary', password='x', user_type='employee')
+        self.client.force_authenticate(user)
+        self.client.post(reverse('payment-list-create'), {'customer_id': self.employee_customer.id, 'amount': '10.00'})
+        self.assertEqual(Log.objects.get(action='payment_created').username, 'temporary')
+
+        user_id = user.id
+        user.delete()
+        connection.check_constraints()
+        self.assertEqual(Log.objects.filter(user_id=user_id).count(), 3)
+        self.client.force_authenticate(self.admin)
+        response = self.client.get(reverse('log-list'), {'search': 'temporary', 'fields': 'action,user_username'})
+        self.assertEqual([r['action'] for r in response.data['results']], ['user_deleted', 'payment_created', 'user_created'])
+        self.assertEqual({r['user_username'] for r in response.data['results']}, {'temporary'})
+
+    def test_payments_without_creator_are_logged_as_the_current_system_user(self):
+        for i in range(2):
+            system = User.objects.create_user(username='system', password='x')
+            Payment.objects.create(customer=self.admin_customer, amount='1.00')
+            self.assertEqual(Log.objects.filter(action='payment_created').latest('id').user_id, system.id)
+            # Like a test database reset: the row goes away without signals
+            User.objects.filter(pk=system.pk).update(username=f'retired-{i}')
+
+    def test_user_username_ordering_is_still_accepted(self):
+        self.client.force_authenticate(self.admin)
+        url = reverse('log-list')
+        for ordering in ('username', '-username'):
+            with self.subTest(ordering=ordering):
+                expected = self.client.get(url, {'ordering': ordering, 'fields': 'id'}).data['results']
+                response = self.client.get(url, {'ordering': ordering.replace('username', 'user__username'), 'fields': 'id'})
+                self.assertEqual(response.data['results'], expected)
+        usernames = [r['user_username'] for r in self.client.get(url, {'ordering': '-user__username'}).data['results']]
+        self.assertEqual(usernames, sorted(usernames, reverse=True))
+
+    def test_entries_of_a_deleted_user_are_listed_when_expanding_the_user(self):
+        user = User.objects.create_user(username='temporary', password='x', user_type='employee')
+        user.delete()
+        self.client.force_authenticate(self.admin)
+        url = reverse('log-list')
+        expected = self.client.get(url, {'search': 'temporary'}).data['count']
+        self.assertEqual(expected, 2)
+
+        response = self.client.get(url, {'search': 'temporary', 'expand': 'user'})
+        self.assertEqual(response.data['count'], expected)
+        self.assertEqual([r['user'] for r in response.data['results']], [None, None])
+
+        response = self.client.get(url, {'search': 'temporary', 'include': 'user'})
+        self.assertEqual(response.data['count'], expected)
+        self.assertEqual(len(response.data['results']), expected)
+        self.assertEqual(response.data['included']['user'], {})
+
+
+@override_settings(RESPONSE_CACHE_TIMEOUT=300)
+class ResponseCacheTests(PaymentAPITestCase):
+    def setUp(self):
+        super().setUp()
+        Payment.objects.create(customer=self.admin_customer, amount='10.00', created_by=self.admin)
+
+    def get(self, user, name, params=None):
+        self.client.force_authenticate(user)
+        return self.client.get(reverse(name), params or {})
+
+    def test_extra_key_inputs_change_the_etag(self):
+        etag = self.get(self.admin, 'user-list')['ETag']
+        with patch.object(UserListView, 'cache_key_extra', return_value=('2026-01-01',)):
+            response = self.client.get(reverse('user-list'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual((response.status_code, response['X-Cache']), (200, 'MISS'))
+
+    def test_hit_until_a_write_invalidates(self):
+        first = self.get(self.admin, 'payment-list-create')
+        with self.assertNumQueries(0):
+            second = self.get(self.admin, 'payment-list-create')
+        self.assertEqual((first['X-Cache'], second['X-Cache']), ('MISS', 'HIT'))
+        self.assertEqual(first.data, second.data)
+
+        # A different query string is a different entry
+        self.assertEqual(self.get(self.admin, 'payment-list-create', {'page_size': 1})['X-Cache'], 'MISS')
+
+        Payment.objects.create(customer=self.admin_customer, amount='5.00', created_by=self.admin)
+        third = self.get(self.admin, 'payment-list-create')
+        self.assertEqual(third['X-Cache'], 'MISS')
+        self.assertEqual(third.data['count'], 2)
+
+        # Renaming a customer invalidates the payment list that embeds it
+        self.get(self.admin, 'payment-list-create', {'expand': 'customer'})
+        self.admin_customer.name = 'Renamed'
+        self.admin_customer.save()
+        response = self.get(self.admin, 'payment-list-create', {'expand': 'customer'})
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.data['results'][0]['customer']['name'], 'Renamed')
+
+    def test_entries_are_per_user(self):
+        self.assertEqual(self.get(self.admin, 'payment-stats').data['total_payments'], 1)
+        response = self.get(self.employee, 'payment-stats')
+        self.assertEqual((response['X-Cache'], response.data['total_payments']), ('MISS', 0))
+
+    def test_logs_and_bulk_imports_invalidate(self):
+        self.get(self.admin, 'log-list')
+        self.assertEqual(self.get(self.admin, 'log-list')['X-Cache'], 'HIT')
+        log_writer.write(user_id=self.admin.id, action='user_login', description='login')
+        self.assertEqual(self.get(self.admin, 'log-list')['X-Cache'], 'MISS')
+
+        self.get(self.admin, 'customer-list-create')
+        self.client.post(reverse('customer-bulk-create'), [{'name': 'Bulk', 'email': 'bulk@example.com'}], format='json')
+        response = self.get(self.admin, 'customer-list-create')
+        self.assertEqual((response['X-Cache'], response.data['count']), ('MISS', 3))
+
+    def test_counters(self):
+        self.get(self.admin, 'customer-list-create')
+        self.get(self.admin, 'customer-list-create')
+        self.get(self.admin, 'customer-list-create')
+        self.assertEqual(self.get(self.admin, 'cache-stats').data, {'hits': 2, 'misses': 1, 'hit_rate': 0.6667})
+        self.assertEqual(self.get(self.employee, 'cache-stats').status_code, 403)
+
+    @override_settings(RESPONSE_CACHE_TIMEOUT=0)
+    def test_disabled(self):
+        etag = self.get(self.admin, 'customer-list-create').get('ETag')
+        response = self.client.get(reverse('customer-list-create'), HTTP_IF_NONE_MATCH=etag or '*')
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('X-Cache', response)
+        self.assertNotIn('ETag', response)
+
+
+@override_settings(RESPONSE_CACHE_TIMEOUT=300)
+class ConditionalGetTests(PaymentAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(self.admin)
+
+    def test_etag_revalidation(self):
+        for name in ('payment-list-create', 'customer-list-create', 'log-list', 'user-list', 'payment-stats'):
+            with self.subTest(view=name):
+                response = self.client.get(reverse(name))
+                etag = response['ETag']
+                self.assertEqual(response['Cache-Control'], 'private, no-cache')
+
+                with self.assertNumQueries(0):
+                    response = self.client.get(reverse(name), HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 304)
+                self.assertEqual(response.content, b'')
+                self.assertEqual(response['ETag'], etag)
+
+    def test_changes_and_other_users_get_new_etag(self):
+        url = reverse('customer-list-create')
+        etag = self.client.get(url)['ETag']
+        self.assertNotEqual(self.client.get(url, {'page_size': 1})['ETag'], etag)
+
+        self.client.force_authenticate(self.employee)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+        self.client.force_authenticate(self.admin)
+        Customer.objects.create(name='New', email='new@example.com', created_by=self.admin)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual((response.status_code, response.data['count']), (200, 3))
+
+    def test_changes_within_the_same_second_are_not_missed(self):
+        url = reverse('user-list')
+        response = self.client.get(url)
+        self.assertNotIn('Last-Modified', response)
+        User.objects.create_user(username='new', password='x')
+        # Only the ETag validates: a date can't tell a change from a poll in
+        # the same second
+        response = self.client.get(url, HTTP_IF_MODIFIED_SINCE='Fri, 01 Jan 2100 00:00:00 GMT')
+        self.assertEqual(response.status_code, 200)
+
+
+class RecordingBroker:
+    def __init__(self):
+        self.published = []
+
+    def publish(self, event):
+        self.published.append(event)
+
+
+@override_settings(EVENT_BROKER='payments.tests.RecordingBroker')
+class ChangeEventTests(PaymentAPITestCase):
+    def published(self):
+        broker = events.get_broker()
+        published, broker.published = broker.published, []
+        return [(e['kind'], e['action'], e['id'], e['owner_id']) for e in published]
+
+    def test_signals_publish_after_commit(self):
+        self.published()
+        with self.captureOnCommitCallbacks(execute=True):
+            payment = Payment.objects.create(customer=self.admin_customer, amount='10.00', created_by=self.employee)
+            self.assertEqual(self.published(), [])
+        self.assertCountEqual(self.published(), [
+            ('payment', 'created', payment.id, self.employee.id),
+            ('log', 'created', Log.objects.latest('id').id, self.employee.id),
+        ])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.admin_customer.delete()
+        self.assertIn(('payment', 'deleted', payment.id, self.employee.id), self.published())
+
+    def test_role_filtering(self):
+        event = {'kind': 'payment', 'action': 'created', 'id': 1, 'owner_id': self.admin.id}
+        self.assertTrue(events.visible_to(event, self.admin))
+        self.assertFalse(events.visible_to(event, self.employee))
+        self.assertTrue(events.visible_to({**event, 'kind': 'customer'}, self.employee))
+        self.assertTrue(events.visible_to({**event, 'kind': 'log', 'owner_id': self.employee.id}, self.employee))
+
+
+class EventStreamTests(PaymentAPITestCase):
+    url = reverse('event-stream')
+
+    async def test_stream_delivers_visible_events(self):
+        token = str(AccessToken.for_user(self.employee))
+        response = await self.async_client.get(self.url, {'token': token})
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        chunks = aiter(response.streaming_content)
+        self.assertEqual(await anext(chunks), b'retry: 5000\n\n')
+
+        broker = events.get_broker()
+        broker.publish({'kind': 'payment', 'action': 'created', 'id': 1, 'owner_id': self.admin.id})
+        broker.publish({'kind': 'payment', 'action': 'updated', 'id': 2, 'owner_id': self.employee.id})
+        chunk = await asyncio.wait_for(anext(chunks), 5)
+        self.assertTrue(chunk.startswith(b'event: payment\ndata: '))
+        self.assertEqual(json.loads(chunk.split(b'data: ')[1])['id'], 2)
+
+    async def test_requires_token(self):
+        response = await self.async_client.get(self.url, {'token': 'nope'})
+        self.assertEqual(response.status_code, 401)
+
+    def test_needs_asgi(self):
+        self.assertEqual(self.client.get(self.url).status_code, 501)
+
+
+@override_settings(RESPONSE_CACHE_TIMEOUT=0)
+class AsyncViewTests(PaymentAPITestCase):
+    def setUp(self):
+        super().setUp()
+        for i in range(3):
+            Payment.objects.create(customer=self.admin_customer, amount=f'{i + 1}.00', created_by=self.admin)
+        self.payment = Payment.objects.create(customer=self.employee_customer, amount='9.00', created_by=self.employee)
+
+    def get(self, user, url, params=None):
+        token = str(AccessToken.for_user(user))
+        return self.client.get(url, params or {}, HTTP_AUTHORIZATION=f'Bearer {token}')
+
+    def test_matches_sync_views(self):
+        cases = [
+            ('payment-list-create', 'async-payment-list', [], {}),
+            ('payment-list-create', 'async-payment-list', [], {'page_size': 2, 'page': 2, 'search': 'cust'}),
+            ('payment-list-create', 'async-payment-list', [], {'cursor': '', 'page_size': 2}),
+            ('payment-retrieve-update-destroy', 'async-payment-detail', [self.payment.pk], {}),
+            ('customer-list-create', 'async-customer-list', [], {'ordering': 'name'}),
+            ('customer-retrieve-update-destroy', 'async-customer-detail', [self.admin_customer.pk], {}),
+            ('log-list', 'async-log-list', [], {}),
+            ('current-user', 'async-current-user', [], {}),
+        ]
+        for user in (self.admin, self.employee):
+            for sync_name, async_name, args, params in cases:
+                with self.subTest(user=user.username, view=async_name, params=params):
+                    expected = self.get(user, reverse(sync_name, args=args), params)
+                    response = self.get(user, reverse(async_name, args=args), params)
+                    self.assertEqual(response.status_code, expected.status_code)
+                    # Page links point at the view's own URL
+                    self.assertEqual(response.content.replace(b'/api/async/', b'/api/'), expected.content)
+
+    def test_errors(self):
+        url = reverse('async-payment-detail', args=[999999])
+        self.assertEqual(self.get(self.admin, url).status_code, 404)
+        self.assertEqual(self.client.get(reverse('async-payment-list')).status_code, 401)
+        self.assertEqual(self.get(self.admin, reverse('async-payment-list'), {'page': 99}).status_code, 404)
+        response = self.client.post(
+            reverse('async-payment-list'), {}, HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.admin)}'
+        )
+        self.assertEqual(response.status_code, 405)
+
+    async def test_served_over_asgi(self):
+        token = str(AccessToken.for_user(self.employee))
+        response = await self.async_client.get(
+            reverse('async-payment-list'), headers={'Authorization': f'Bearer {token}'}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([p['id'] for p in response.json()['results']], [self.payment.pk])
+
+
+class CachedAuthenticationTests(PaymentAPITestCase):
+    url = reverse('current-user')
+
+    def get(self):
+        return self.client.get(self.url, HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.employee)}')
+
+    def test_user_is_loaded_once(self):
+        with self.assertNumQueries(1):
+            self.get()
+        with self.assertNumQueries(0):
+            response = self.get()
+        self.assertEqual(response.data['username'], 'employee')
+        self.assertFalse(response.data['is_staff'])
+
+    def test_user_signals_invalidate(self):
+        self.get()
+        self.employee.is_staff = True
+        self.employee.save()
+        self.assertTrue(self.get().data['is_staff'])
+
+        self.employee.is_active = False
+        self.employee.save()
+        self.assertEqual(self.get().status_code, 401)
+
+        self.employee.is_active = True
+        self.employee.save()
+        self.assertEqual(self.get().status_code, 200)
+
+    def test_entries_expire_quickly(self):
+        # update() sends no signals, and other processes keep their own
+        # entries, so only the timeout bounds how stale a user can be
+        with patch('payments.authentication.cache.set', wraps=cache.set) as cache_set:
+            self.get()
+        self.assertEqual(cache_set.call_args.args[2], settings.AUTH_USER_CACHE_TIMEOUT)
+        self.assertLessEqual(settings.AUTH_USER_CACHE_TIMEOUT, 10)
+
+        User.objects.filter(pk=self.employee.pk).update(is_active=False)
+        with override_settings(AUTH_USER_CACHE_TIMEOUT=0):
+            self.assertEqual(self.get().status_code, 401)
+
+
+class KeysetPaginationTests(PaymentAPITestCase):
+    url = reverse('payment-list-create')
+
+    def setUp(self):
+        super().setUp()
+        # Several payments share a timestamp so the id tie-breaker matters
+        self.payments = [
+            self.create_payment(self.admin_customer, '10.00', datetime.datetime(2025, 1, 1 + i // 2), self.admin)
+            for i in range(7)
+        ]
+        self.client.force_authenticate(self.admin)
+
+    def expected_order(self):
+        return [p.pk for p in sorted(
+            Payment.objects.all(), key=lambda p: (p.date, p.pk), reverse=True
+        )]
+
+    def test_page_number_is_default(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.data['count'], 7)
+        self.assertIn('total_pages', response.data)
+
+    def test_walk_forward_and_back(self):
+        seen = []
+        cursor = ''
+        pages = []
+        while True:
+            with self.assertNumQueries(1):  # no COUNT(*)
+                response = self.client.get(self.url, {'cursor': cursor, 'page_size': 3})
+            self.assertNotIn('count', response.data)
+            pages.append([row['id'] for row in response.data['results']])
+            seen.extend(pages[-1])
+            if not response.data['has_next']:
+                break
+            cursor = response.data['next_cursor']
+
+        self.assertEqual(seen, self.expected_order())
+        self.assertEqual(len(pages), 3)
+
+        response = self.client.get(self.url, {'cursor': response.data['previous_cursor'], 'page_size': 3})
+        self.assertEqual([row['id'] for row in response.data['results']], pages[1])
+        self.assertTrue(response.data['has_previous'])
+
+        response = self.client.get(self.url, {'cursor': response.data['previous_cursor'], 'page_size': 3})
+        self.assertEqual([row['id'] for row in response.data['results']], pages[0])
+        self.assertFalse(response.data['has_previous'])
+        self.assertIsNone(response.data['previous'])
+
+    def test_invalid_cursor(self):
+        response = self.client.get(self.url, {'cursor': 'not-a-cursor'})
+        self.assertEqual(response.status_code, 404)
+
+        # Decodes fine but the date value is garbage
+        response = self.client.get(self.url, {'cursor': 'eyJwIjpbImdhcmJhZ2UiLDFdLCJyIjpmYWxzZX0'})
+        self.assertEqual(response.status_code, 404)
+
+
+@override_settings(AUDIT_LOG_MODE='buffered', AUDIT_LOG_BATCH_SIZE=3, AUDIT_LOG_FLUSH_INTERVAL=0)
+class BufferedLogWriterTests(PaymentAPITestCase):
+    def setUp(self):
+        super().setUp()
+        log_writer.flush()
+
+    def test_entries_are_queued_until_commit_and_flushed_in_batches(self):
+        logs_before = Log.objects.count()
+        with self.captureOnCommitCallbacks(execute=True):
+            Payment.objects.create(customer=self.admin_customer, amount='10.00', created_by=self.admin)
+            Payment.objects.create(customer=self.admin_customer, amount='20.00', created_by=self.admin)
+            self.assertEqual(log_writer.pending(), 0)
+
+        # Below the batch size nothing has been written yet
+        self.assertEqual(log_writer.pending(), 2)
+        self.assertEqual(Log.objects.count(), logs_before)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Payment.objects.create(customer=self.admin_customer, amount='30.00', created_by=self.admin)
+
+        # The third entry filled a batch, which was bulk inserted in one query
+        self.assertEqual(log_writer.pending(), 0)
+        self.assertEqual(
+            list(Log.objects.filter(action='payment_created').values_list('description', flat=True).order_by('id')),
+            [f'Customer "Admin Customer" were paid {amount} rupees.' for amount in ('10.00', '20.00', '30.00')]
+        )
+
+    def test_bad_entry_does_not_drop_batch(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            log_writer.write(user_id=self.admin.id, action='user_login', description='ok')
+            log_writer.write(user_id=None, action='user_login', description='no user')
+        with self.assertLogs('payments.audit', 'ERROR'):
+            self.assertEqual(log_writer.flush(), 1)
+        self.assertTrue(Log.objects.filter(description='ok').exists())
+
+    def test_payment_logs_do_not_refetch_customer_or_creator(self):
+        payment = Payment(customer=self.admin_customer, amount='10.00', created_by=self.admin)
+        # INSERT for the payment, the rollup UPDATE and INSERT (in a
+        # savepoint) and the ledger UPDATE; the log is only queued
+        with self.assertNumQueries(6):
+            payment.save()
+
+
+class BulkImportTests(PaymentAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(self.employee)
+
+    def test_payments_from_json_with_row_errors(self):
+        rows = [
+            {'customer_id': self.admin_customer.id, 'amount': '10.00', 'description': 'a'},
+            {'customer_id': 999999, 'amount': '10.00'},
+            {'customer_id': self.employee_customer.id, 'amount': 'lots'},
+            {'customer_id': self.employee_customer.id, 'amount': '5.50'},
+        ]
+        with self.settings(BULK_IMPORT_CHUNK_SIZE=2):
+            response = self.client.post(reverse('payment-bulk-create'), rows, format='json')
+
+        self.assertEqual(response.status_code, 207)
+        self.assertEqual(response.data['total_rows'], 4)
+        self.assertEqual(response.data['created'], 2)
+        self.assertEqual([e['row'] for e in response.data['errors']], [2, 3])
+        self.assertIn('customer_id', response.data['errors'][0]['errors'])
+        self.assertIn('amount', response.data['errors'][1]['errors'])
+
+        payments = Payment.objects.filter(created_by=self.employee).order_by('amount')
+        self.assertEqual([p.amount for p in payments], [Decimal('5.50'), Decimal('10.00')])
+        self.assertEqual(
+            Log.objects.filter(action='payment_created', user=self.employee).count(), 2
+        )
+
+    def test_customers_from_csv_upload(self):
+        upload = SimpleUploadedFile('customers.csv', (
+            '\ufeffname,email,phone,package_fee\n'
+            'New One,new1@example.com,123,1500\n'
+            'Duplicate,admin-customer@example.com,,\n'
+            'New Two,new2@example.com,,\n'
+            'Repeat,new1@example.com,,\n'
+        ).encode())
+        response = self.client.post(reverse('customer-bulk-create'), {'file': upload})
+
+        self.assertEqual(response.status_code, 207)
+        self.assertEqual(response.data['created'], 2)
+        self.assertEqual([e['row'] for e in response.data['errors']], [2, 4])
+        customer = Customer.objects.get(email='new1@example.com')
+        self.assertEqual((customer.package_fee, customer.created_by), (Decimal('1500'), self.employee))
+        self.assertEqual(Customer.objects.get(email='new2@example.com').package_fee, Decimal('0'))
+        self.assertTrue(Log.objects.filter(action='customer_created', description__contains='new2@example.com').exists())
+
+    def test_payments_from_csv_body(self):
+        body = f'customer_id,amount\n{self.admin_customer.id},12.00\n{self.admin_customer.id},13.00\n'
+        response = self.client.post(reverse('payment-bulk-create'), body, content_type='text/csv')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['created'], 2)
+
+    def test_unreadable_csv_is_a_row_error(self):
+        response = self.client.post(
+            reverse('customer-bulk-create'), b'\xff\xfen\x00a\x00m\x00e\x00', content_type='text/csv'
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['errors'][0]['row'], 1)
+
+        # Rows read before the bad one are still imported
+        body = f'customer_id,amount\n{self.admin_customer.id},12.00\n{self.admin_customer.id},\xe9\n'.encode('latin-1')
+        with self.settings(BULK_IMPORT_CHUNK_SIZE=5):
+            response = self.client.post(reverse('payment-bulk-create'), body, content_type='text/csv')
+        self.assertEqual(response.status_code, 207)
+        self.assertEqual((response.data['created'], response.data['errors'][0]['row']), (1, 2))
+
+    def test_rejects_non_list_json(self):
+        response = self.client.post(reverse('payment-bulk-create'), {'amount': '1'}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+
+class ExportTests(PaymentAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.create_payment(self.admin_customer, '100.00', datetime.datetime(2025, 1, 6, 10), self.admin)
+        self.create_payment(self.employee_customer, '25.50', datetime.datetime(2025, 2, 14, 9), self.employee)
+
+    def read_csv(self, response):
+        content = b''.join(response.streaming_content).decode()
+        return list(csv.reader(io.StringIO(content)))
+
+    def test_payment_csv_uses_list_filters(self):
+        self.client.force_authenticate(self.employee)
+        response = self.client.get(reverse('payment-export'))
+
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        rows = self.read_csv(response)
+        self.assertEqual(rows[0], ['ID', 'Date', 'Customer', 'Customer Email', 'Amount', 'Description', 'Created By'])
+        self.assertEqual(rows[1:], [[
+            str(Payment.objects.get(created_by=self.employee).id), '2025-02-14 09:00:00',
+            'Employee Customer', 'employee-customer@example.com', '25.50', '', 'employee',
+        ]])
+
+        self.client.force_authenticate(self.admin)
+        response = self.client.get(reverse('payment-export'), {'start_date': '2025-01-01', 'end_date': '2025-01-31'})
+        self.assertEqual([row[2] for row in self.read_csv(response)[1:]], ['Admin Customer'])
+
+    def test_log_xlsx(self):
+        self.client.force_authenticate(self.admin)
+        response = self.client.get(reverse('log-export'), {'type': 'xlsx', 'search': 'Employee Customer'})
+
+        self.assertEqual(response.status_code, 200)
+        archive = zipfile.ZipFile(io.BytesIO(b''.join(response.streaming_content)))
+        self.assertIsNone(archive.testzip())
+        sheet = archive.read('xl/worksheets/sheet1.xml').decode()
+        self.assertEqual(sheet.count('<row>'), 3)  # header, customer_created, payment_created
+        self.assertIn('Customer "Employee Customer" were paid 25.50 rupees.', sheet)
+
+    def test_invalid_type(self):
+        self.client.force_authenticate(self.admin)
+        self.assertEqual(self.client.get(reverse('log-export'), {'type': 'pdf'}).status_code, 400)
+
+
+class QueryPlanTests(PaymentAPITestCase):
+    """
+    Runs EXPLAIN on the page query of each list view against a seeded table
+    and fails if SQLite would scan a whole table or sort it in a temp b-tree.
+
+    ``?search=`` is left out on purpose: ``icontains`` can't use a b-tree index.
+    """
+    factory = APIRequestFactory()
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        creators = [
+            User.objects.create_user(username=f'seed{i}', password='pass') for i in range(5)
+        ]
+        customers = Customer.objects.bulk_create([
+            Customer(name=f'Seed {i}', email=f'seed{i}@example.com', created_by=creators[i % 5])
+            for i in range(200)
+        ])
+        Payment.objects.bulk_create([
+            Payment(customer=customers[i % 200], amount='10.00', created_by=creators[i % 5])
+            for i in range(2000)
+        ])
+        Log.objects.bulk_create([
+            Log(user=creators[i % 5], action='user_login', description='seed') for i in range(2000)
+        ])
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+    def list_queryset(self, view_class, user, params=None):
+        request = Request(self.factory.get('/', params or {}))
+        request.user = user
+        view = view_class(request=request, format_kwarg=None, kwargs={})
+        return view.filter_queryset(view.get_queryset())
+
+    def page_queryset(self, view_class, user, params=None):
+        return self.list_queryset(view_class, user, params)[:10]
+
+    def assertUsesIndexes(self, queryset):
+        plan = queryset.explain()
+        for line in plan.splitlines():
+            self.assertNotRegex(line, r'SCAN \w+$', f'Full table scan:\n{plan}')
+            self.assertNotIn('USE TEMP B-TREE', line, f'Unindexed sort:\n{plan}')
+
+    def test_payment_list(self):
+        user = User.objects.get(username='seed1')
+        cases = [
+            (self.admin, {}),
+            (self.admin, {'created_by': str(user.id)}),
+            (self.admin, {'start_date': '2025-01-01', 'end_date': '2025-01-31'}),
+            (user, {}),
+            (user, {'start_date': '2025-01-01', 'end_date': '2025-01-31'}),
+        ]
+        for request_user, params in cases:
+            with self.subTest(user=request_user.username, params=params):
+                self.assertUsesIndexes(self.page_queryset(PaymentListCreateAPIView, request_user, params))
+
+    def test_keyset_pages(self):
+        for view_class in (PaymentListCreateAPIView, CustomerListCreateAPIView, LogListView):
+            paginator = KeysetPagination(10)
+            paginator.ordering = view_class.cursor_ordering
+            for reverse in (False, True):
+                ordering = [f[1:] if f.startswith('-') else f'-{f}' for f in paginator.ordering] if reverse else paginator.ordering
+                position_filter = paginator.get_position_filter(['2025-01-01T00:00:00', 100], reverse)
+                for request_user in (self.admin, self.employee):
+                    with self.subTest(view=view_class.__name__, user=request_user.username, reverse=reverse):
+                        queryset = self.list_queryset(view_class, request_user)
+                        self.assertUsesIndexes(queryset.order_by(*ordering).filter(position_filter)[:10])
+
+    def test_customer_payments(self):
+        customer = Customer.objects.get(email='seed3@example.com')
+        self.assertUsesIndexes(Payment.objects.filter(customer=customer).order_by('-date')[:10])
+
+    def test_customer_list(self):
+        self.assertUsesIndexes(self.page_queryset(CustomerListCreateAPIView, self.admin))
+
+    def test_log_list(self):
+        for request_user in (self.admin, User.objects.get(username='seed2')):
+            with self.subTest(user=request_user.username):
+                self.assertUsesIndexes(self.page_queryset(LogListView, request_user))
+
+
+class SearchIndexTests(PaymentAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(self.admin)
+        self.create_payment(self.admin_customer, '10.00', datetime.datetime(2025, 1, 6), self.admin)
+        self.fiber = Payment.objects.create(
+            customer=self.employee_customer, amount='20.00', description='Fiber "Pro" upgrade', created_by=self.employee
+        )
+
+    def search(self, name, term):
+        response = self.client.get(reverse(name), {'search': term, 'page_size': 100})
+        return sorted(row['id'] for row in response.data['results'])
+
+    def test_uses_fts_backend(self):
+        self.assertIsInstance(get_search_backend(), SQLiteFTSSearchBackend)
+        queryset = get_search_backend().filter(Payment.objects.all(), ['customer__name', 'description'], 'fiber')
+        self.assertIn('VIRTUAL TABLE', queryset.explain())
+
+    def test_matches_icontains(self):
+        cases = [
+            ('payment-list-create', ['employee cust', 'ADMIN-CUSTOMER@', 'pro" up', 'iber', 'no match', 'Fi']),
+            ('customer-list-create', ['customer', 'EMPLOYEE', '@example.com', 'zz']),
+            ('log-list', ['payment_created', 'rupees', 'employee', 'Admin Customer']),
+        ]
+        for name, terms in cases:
+            for term in terms:
+                with self.subTest(view=name, term=term):
+                    indexed = self.search(name, term)
+                    with self.settings(SEARCH_BACKEND='icontains'):
+                        self.assertEqual(indexed, self.search(name, term))
+
+    def test_index_follows_writes(self):
+        self.assertEqual(self.search('payment-list-create', 'fiber'), [self.fiber.id])
+
+        self.employee_customer.name = 'Renamed Household'
+        self.employee_customer.save()
+        self.assertEqual(self.search('payment-list-create', 'household'), [self.fiber.id])
+        self.assertEqual(self.search('payment-list-create', 'employee cust'), [])
+
+        Payment.objects.filter(pk=self.fiber.pk).update(description='Copper')
+        self.assertEqual(self.search('payment-list-create', 'fiber'), [])
+
+        created = Customer.objects.bulk_create([Customer(name='Bulk Person', email='bulk@example.com')])
+        self.assertEqual(self.search('customer-list-create', 'bulk person'), [created[0].id])
+
+        self.employee_customer.delete()
+        self.assertEqual(self.search('customer-list-create', 'household'), [])
+
+
+class SQLiteBackendTests(SimpleTestCase):
+    def connect(self, options):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        settings_dict = connections.configure_settings({
+            'default': {'ENGINE': 'payments.backends.sqlite', 'NAME': f'{directory.name}/db.sqlite3', 'OPTIONS': options},
+        })['default']
+        wrapper = DatabaseWrapper(settings_dict, 'scratch')
+        self.addCleanup(wrapper.close)
+        return wrapper
+
+    def pragma(self, wrapper, name):
+        with wrapper.cursor() as cursor:
+            return cursor.execute(f'PRAGMA {name}').fetchone()[0]
+
+    def test_applies_pragmas_and_transaction_mode(self):
+        wrapper = self.connect(settings.SQLITE_PROFILES['production']['OPTIONS'])
+        self.assertEqual(self.pragma(wrapper, 'journal_mode'), 'wal')
+        self.assertEqual(self.pragma(wrapper, 'synchronous'), 1)
+        self.assertEqual(self.pragma(wrapper, 'busy_timeout'), settings.SQLITE_BUSY_TIMEOUT_MS)
+        self.assertEqual(self.pragma(wrapper, 'cache_size'), -64 * 1024)
+        with CaptureQueriesContext(wrapper) as captured:
+            wrapper._start_transaction_under_autocommit()
+        self.assertEqual(captured[0]['sql'], 'BEGIN IMMEDIATE')
+        wrapper.rollback()
+
+    def test_defaults_to_stock_behaviour(self):
+        wrapper = self.connect({})
+        self.assertEqual(self.pragma(wrapper, 'journal_mode'), 'delete')
+        self.assertEqual(wrapper.transaction_mode, 'DEFERRED')
+        with self.assertRaises(ImproperlyConfigured):
+            self.connect({'transaction_mode': 'eventually'}).transaction_mode
+
+
+class WriteRetryTests(APITransactionTestCase):
+    # Writes are only retried outside a transaction, which TestCase always has
+    def setUp(self):
+        cache.clear()
+        self.admin = User.objects.create_user(
+            username='admin', password='pass', user_type='admin', is_staff=True, is_superuser=True
+        )
+        self.customer = Customer.objects.create(name='Customer', email='customer@example.com', created_by=self.admin)
+        sleep = patch('payments.writes.time.sleep')
+        self.sleep = sleep.start()
+        self.addCleanup(sleep.stop)
+
+    def test_busy_log_insert_is_retried(self):
+        save = Log.save
+        attempts = []
+
+        def busy_once(log, *args, **kwargs):
+            attempts.append(log.action)
+            if len(attempts) == 1:
+                raise OperationalError('database is locked')
+            return save(log, *args, **kwargs)
+
+        self.client.force_authenticate(self.admin)
+        with patch.object(Log, 'save', autospec=True, side_effect=busy_once), self.assertLogs('payments.writes', 'INFO'):
+            response = self.client.post(reverse('payment-list-create'), {'customer_id': self.customer.id, 'amount': '25.00'})
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(attempts, ['payment_created', 'payment_created'])
+        self.assertEqual(self.sleep.call_count, 1)
+        self.assertEqual(Log.objects.filter(action='payment_created').count(), 1)
+
+    @override_settings(SQLITE_WRITE_RETRIES=2)
+    def test_gives_up_after_the_retries(self):
+        func = Mock(side_effect=OperationalError('database is locked'))
+        with self.assertRaises(OperationalError):
+            writes.run_write(func)
+        self.assertEqual(func.call_count, 3)
+
+        func = Mock(side_effect=OperationalError('no such table: payments_payment'))
+        with self.assertRaises(OperationalError):
+            writes.run_write(func)
+        self.assertEqual(func.call_count, 1)
+
+        # Only the outermost transaction can be retried
+        func = Mock(side_effect=OperationalError('database is locked'))
+        with self.assertRaises(OperationalError), transaction.atomic():
+            writes.run_write(func)
+        self.assertEqual(func.call_count, 1)
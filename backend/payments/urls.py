@@ -1,14 +1,34 @@
 from django.urls import path
-from .views import PaymentListCreateAPIView, PaymentRetrieveUpdateDestroyAPIView, UserRegistrationView, UserListView, CustomerListCreateAPIView, CustomerRetrieveUpdateDestroyAPIView, UserRetrieveUpdateDestroyAPIView, LogListView, CurrentUserView
+from .async_views import (
+    AsyncPaymentListView, AsyncPaymentDetailView, AsyncCustomerListView, AsyncCustomerDetailView,
+    AsyncLogListView, AsyncCurrentUserView,
+)
+from .views import PaymentListCreateAPIView, PaymentRetrieveUpdateDestroyAPIView, UserRegistrationView, UserListView, CustomerListCreateAPIView, CustomerRetrieveUpdateDestroyAPIView, UserRetrieveUpdateDestroyAPIView, LogListView, CurrentUserView, PaymentStatsView, PaymentChartView, PaymentBulkCreateAPIView, CustomerBulkCreateAPIView, PaymentExportView, LogExportView, CacheStatsView, CustomerLedgerListView, ArchivedLogListView, event_stream
 
 urlpatterns = [
     path('payments/', PaymentListCreateAPIView.as_view(), name='payment-list-create'),
+    path('payments/stats/', PaymentStatsView.as_view(), name='payment-stats'),
+    path('payments/chart/', PaymentChartView.as_view(), name='payment-chart'),
+    path('payments/bulk/', PaymentBulkCreateAPIView.as_view(), name='payment-bulk-create'),
+    path('payments/export/', PaymentExportView.as_view(), name='payment-export'),
     path('payments/<int:pk>/', PaymentRetrieveUpdateDestroyAPIView.as_view(), name='payment-retrieve-update-destroy'),
     path('customers/', CustomerListCreateAPIView.as_view(), name='customer-list-create'),
+    path('customers/ledger/', CustomerLedgerListView.as_view(), name='customer-ledger'),
+    path('customers/bulk/', CustomerBulkCreateAPIView.as_view(), name='customer-bulk-create'),
     path('customers/<int:pk>/', CustomerRetrieveUpdateDestroyAPIView.as_view(), name='customer-retrieve-update-destroy'),
     path('users/register/', UserRegistrationView.as_view(), name='user-register'),
     path('users/', UserListView.as_view(), name='user-list'),
     path('users/me/', CurrentUserView.as_view(), name='current-user'),
     path('users/<int:pk>/', UserRetrieveUpdateDestroyAPIView.as_view(), name='user-retrieve-update-destroy'),
     path('logs/', LogListView.as_view(), name='log-list'),
+    path('logs/export/', LogExportView.as_view(), name='log-export'),
+    path('logs/archive/', ArchivedLogListView.as_view(), name='log-archive'),
+    path('cache/stats/', CacheStatsView.as_view(), name='cache-stats'),
+    path('events/', event_stream, name='event-stream'),
+    path('async/payments/', AsyncPaymentListView.as_view(), name='async-payment-list'),
+    path('async/payments/<int:pk>/', AsyncPaymentDetailView.as_view(), name='async-payment-detail'),
+    path('async/customers/', AsyncCustomerListView.as_view(), name='async-customer-list'),
+    path('async/customers/<int:pk>/', AsyncCustomerDetailView.as_view(), name='async-customer-detail'),
+    path('async/logs/', AsyncLogListView.as_view(), name='async-log-list'),
+    path('async/users/me/', AsyncCurrentUserView.as_view(), name='async-current-user'),
 ] 
\ No newline at end of file
@@ -1,25 +1,61 @@
+from django.conf import settings
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpResponse, HttpResponseForbidden, JsonResponse, StreamingHttpResponse
 from django.shortcuts import render
 from rest_framework import generics, permissions, filters
-from .models import Payment, User, Customer, Log
-from .serializers import PaymentSerializer, UserSerializer, CustomerSerializer, LogSerializer
+from .models import Payment, User, Customer, Log, DailyRevenue, CustomerLedger
+from .serializers import PaymentSerializer, UserSerializer, CustomerSerializer, LogSerializer, CustomerLedgerSerializer
 from rest_framework.permissions import IsAuthenticated, IsAdminUser
-from django.db.models import Q
-from rest_framework_simplejwt.authentication import JWTAuthentication
+from django.db.models import Sum, Count, DateField
+from django.db.models.functions import TruncDay, TruncWeek, TruncMonth, TruncYear
+from .authentication import CachedJWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
 from rest_framework import status
 from rest_framework.views import APIView
+from rest_framework.parsers import JSONParser, MultiPartParser
 from .pagination import CustomPagination
+from .bulk import CSVParser, iter_csv_rows, PaymentImporter, CustomerImporter
+from .export import stream_csv, stream_xlsx
+from .search import get_search_backend, IndexedSearchFilter
+from .caching import CachedListMixin, cached_response, get_counters
+from .sparse import SparseFieldsMixin
+from .fastlist import FastListMixin
+from . import archive, charts, events, ledger, logstore, metrics
+import asyncio
+import json
 import datetime
+import logging
+from collections.abc import Iterator
+from decimal import Decimal
 from django.utils import timezone
 
+logger = logging.getLogger(__name__)
+
 # Create your views here.
 
+# Querysets for the serializers below. SparseFieldsMixin joins in related rows
+# with select_related and projects the columns down to the fields the
+# serializer renders (see payments/sparse.py), so list pages run a fixed
+# number of queries regardless of page size. FastListMixin reads list pages
+# as values_list rows instead (see payments/fastlist.py).
+
+def customer_queryset():
+    return Customer.objects.all()
+
+def payment_queryset():
+    return Payment.objects.all()
+
+def log_queryset():
+    return logstore.logs()
+
 class IsAdminOrOwner(permissions.BasePermission):
     def has_permission(self, request, view):
         return request.user and request.user.is_authenticated
 
     def has_object_permission(self, request, view, obj):
-        print(request.user.user_type in ['admin', 'Admin'])
         if request.user.is_superuser or request.user.is_staff or request.user.user_type in ['admin', 'Admin']:
             return True
         # For payments, check if user created the customer
@@ -30,17 +66,30 @@ class IsAdminOrOwner(permissions.BasePermission):
             return obj.created_by == request.user
         return False
 
-class CustomerListCreateAPIView(generics.ListCreateAPIView):
+class AliasedOrderingFilter(filters.OrderingFilter):
+    """``OrderingFilter`` that also accepts the former names in a view's ``ordering_aliases``."""
+
+    def remove_invalid_fields(self, queryset, fields, view, request):
+        aliases = getattr(view, 'ordering_aliases', {})
+        fields = [
+            ('-' if term.startswith('-') else '') + aliases.get(term.lstrip('-'), term.lstrip('-'))
+            for term in fields
+        ]
+        return super().remove_invalid_fields(queryset, fields, view, request)
+
+class CustomerListCreateAPIView(CachedListMixin, FastListMixin, SparseFieldsMixin, generics.ListCreateAPIView):
     serializer_class = CustomerSerializer
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [CachedJWTAuthentication]
     permission_classes = [IsAuthenticated]
-    filter_backends = [filters.SearchFilter, filters.OrderingFilter]
+    filter_backends = [IndexedSearchFilter, filters.OrderingFilter]
     search_fields = ['name', 'email', 'phone']
     ordering_fields = ['name', 'created_at']
     pagination_class = CustomPagination
+    cursor_ordering = ('-created_at', '-id')
+    cache_namespaces = ('customers', 'users')
 
     def get_queryset(self):
-        queryset = Customer.objects.all()
+        queryset = customer_queryset()
         user = self.request.user
         
         # Admins and employees can see all customers
@@ -51,11 +100,13 @@ class CustomerListCreateAPIView(generics.ListCreateAPIView):
         # Automatically set the created_by field to current user
         serializer.save(created_by=self.request.user)
 
-class CustomerRetrieveUpdateDestroyAPIView(generics.RetrieveUpdateDestroyAPIView):
+class CustomerRetrieveUpdateDestroyAPIView(SparseFieldsMixin, generics.RetrieveUpdateDestroyAPIView):
     serializer_class = CustomerSerializer
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [CachedJWTAuthentication]
     permission_classes = [IsAuthenticated]
-    queryset = Customer.objects.all()
+
+    def get_queryset(self):
+        return customer_queryset()
 
     def perform_update(self, serializer):
         serializer.save()
@@ -83,10 +134,11 @@ class UserRegistrationView(APIView):
         
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
-class UserListView(generics.ListAPIView):
+class UserListView(CachedListMixin, generics.ListAPIView):
     serializer_class = UserSerializer
     permission_classes = [IsAuthenticated]
     pagination_class = CustomPagination
+    cache_namespaces = ('users',)
     
     def get_queryset(self):
         queryset = User.objects.all()
@@ -99,9 +151,7 @@ class UserListView(generics.ListAPIView):
         # Apply access control based on user type
         # Non-admins should only see themselves
         if not (user.is_superuser or user.is_staff):
-            print(f"Applying non-admin access control for users: filtering by user=user")
             queryset = queryset.filter(id=user.id)
-            print("User permissions filter applied")
         
         return queryset
 
@@ -116,56 +166,44 @@ class UserRetrieveUpdateDestroyAPIView(generics.RetrieveUpdateDestroyAPIView):
     def perform_destroy(self, instance):
         instance.delete()
 
-class PaymentListCreateAPIView(generics.ListCreateAPIView):
-    serializer_class = PaymentSerializer
-    authentication_classes = [JWTAuthentication]
-    permission_classes = [IsAuthenticated]
-    # Removed all filter_backends to gain full manual control
-    # filter_backends = [filters.OrderingFilter]
-    search_fields = ['customer__name', 'customer__email', 'description'] # Still useful for documentation
-    ordering_fields = ['date', 'amount'] # Still useful for documentation
-    ordering = ['-date'] # Default ordering
-    pagination_class = CustomPagination
+class PaymentFilterMixin:
+    """
+    Shared payment scoping for every view that reads payments.
 
-    def get_queryset(self):
-        queryset = Payment.objects.all()
+    Applies role-based access control, the ``created_by`` and
+    ``start_date``/``end_date`` query parameters and the manual search filter,
+    so list and aggregate endpoints always agree on which rows are visible.
+    With ``rollup=True`` the queryset is DailyRevenue rows instead: the date
+    range applies to ``day`` and search is skipped (callers fall back to raw
+    payments when a search term is given).
+    """
+    search_fields = ['customer__name', 'customer__email', 'description']
+
+    def filter_payments(self, queryset, rollup=False):
         user = self.request.user
 
-        print(f"Request User: {user.username}, Is Superuser: {user.is_superuser}, Is Staff: {user.is_staff}")
+        logger.debug('Filtering payments for %s (superuser=%s, staff=%s)', user.username, user.is_superuser, user.is_staff)
 
         # Step 1: Apply default access control based on user type
         # Non-admins should only see payments they themselves created.
         if not (user.is_superuser or user.is_staff):
-            print("Applying non-admin access control: filtering by created_by=user")
             queryset = queryset.filter(created_by=user)
-            print("Permissions filter applied")
 
         # Step 2: Apply 'created_by' filter from query parameters
         created_by_user_id = self.request.query_params.get('created_by')
-        print(f"Created By User ID from params: {created_by_user_id}")
 
         if created_by_user_id and created_by_user_id != 'all':
             if user.is_superuser or user.is_staff: # Admin can filter by any specific user
-                print(f"Admin: Applying created_by filter for ID: {created_by_user_id}")
                 queryset = queryset.filter(created_by_id=created_by_user_id)
-            else: # Non-admin: If they specify an ID, it *must* be their own. Otherwise, return empty.
-                if str(user.id) == created_by_user_id:
-                    print(f"Non-admin: Filtering by own ID ({created_by_user_id}). Queryset remains as per permissions.")
-                    # No additional filter needed here, as it's already covered by Step 1
-                else:
-                    print(f"Non-admin: Attempted to filter by another user ({created_by_user_id}). Returning empty queryset.")
-                    queryset = queryset.none() # This will make the queryset empty, overriding any previous filters.
-        elif not (user.is_superuser or user.is_staff) and created_by_user_id == 'all':
-            # If non-admin selects 'all', they still only see their own payments (already handled by Step 1).
-            print(f"Non-admin selected 'all'. Queryset remains as per permissions.")
-            # No explicit filter needed, already covered by Step 1.
-
-        print("Created By filter applied")
+            # Non-admin: their own ID is already covered by Step 1 (as is
+            # 'all'); any other ID returns nothing
+            elif str(user.id) != created_by_user_id:
+                logger.debug('Non-admin %s asked for payments of user %s; returning none', user.username, created_by_user_id)
+                queryset = queryset.none() # This will make the queryset empty, overriding any previous filters.
 
         # Step 3: Apply date range filter if provided
         start_date = self.request.query_params.get('start_date')
         end_date = self.request.query_params.get('end_date')
-        print(f"Date Range: Start={start_date}, End={end_date}")
 
         if start_date and end_date:
             try:
@@ -174,41 +212,246 @@ class PaymentListCreateAPIView(generics.ListCreateAPIView):
                 # Convert to datetime objects for DateTimeField filtering
                 start_datetime = datetime.datetime.combine(start_date_obj, datetime.time.min)
                 end_datetime = datetime.datetime.combine(end_date_obj, datetime.time.max)
-                print(f"Applying date range filter: {start_datetime} to {end_datetime}")
-                queryset = queryset.filter(date__gte=start_datetime, date__lte=end_datetime)
-                print("Date range filter applied")
+                logger.debug('Date range filter: %s to %s', start_datetime, end_datetime)
+                if rollup:
+                    queryset = queryset.filter(day__gte=start_date_obj, day__lte=end_date_obj)
+                else:
+                    queryset = queryset.filter(date__gte=start_datetime, date__lte=end_datetime)
             except ValueError as e:
-                print(f"Invalid date format received or parsing error: {e}")
-                pass # Continue with other filters even if date parsing fails
+                # Continue with other filters even if date parsing fails
+                logger.debug('Ignoring invalid date range %r to %r: %s', start_date, end_date, e)
 
         # Step 4: Manually apply search filter
         search_term = self.request.query_params.get('search', None)
-        print(f"Search Term: {search_term}")
-        if search_term:
-            print(f"Applying search filter for term: '{search_term}'")
-            queryset = queryset.filter(
-                Q(customer__name__icontains=search_term) |
-                Q(customer__email__icontains=search_term) |
-                Q(description__icontains=search_term)
-            )
-            print("Search filter applied")
+        if search_term and not rollup:
+            logger.debug('Search filter: %r', search_term)
+            queryset = get_search_backend().filter(queryset, self.search_fields, search_term)
+
+        return queryset
+
+class PaymentListCreateAPIView(CachedListMixin, FastListMixin, SparseFieldsMixin, PaymentFilterMixin, generics.ListCreateAPIView):
+    serializer_class = PaymentSerializer
+    authentication_classes = [CachedJWTAuthentication]
+    permission_classes = [IsAuthenticated]
+    # Removed all filter_backends to gain full manual control
+    # filter_backends = [filters.OrderingFilter]
+    ordering_fields = ['date', 'amount'] # Still useful for documentation
+    ordering = ['-date'] # Default ordering
+    pagination_class = CustomPagination
+    cursor_ordering = ('-date', '-id') # Used instead of ?ordering= when ?cursor= is passed
+    cache_namespaces = ('payments', 'customers', 'users')
+
+    def get_queryset(self):
+        # Steps 1-4: access control, created_by, date range and search
+        queryset = self.filter_payments(payment_queryset())
 
         # Step 5: Apply ordering manually
         order_by = self.request.query_params.get('ordering', '-date')
-        print(f"Applying ordering by: {order_by}")
+        logger.debug('Ordering payments by %s', order_by)
         queryset = queryset.order_by(order_by)
-
-        print("All filters applied successfully")
         return queryset
 
+    def estimate_count(self, queryset):
+        # The rollup covers every filter but search
+        if self.request.query_params.get('search'):
+            return None
+        rows = self.filter_payments(DailyRevenue.objects.all(), rollup=True)
+        return rows.aggregate(count=Sum('payment_count'))['count'] or 0
+
     def perform_create(self, serializer):
         serializer.save(created_by=self.request.user)
 
-class PaymentRetrieveUpdateDestroyAPIView(generics.RetrieveUpdateDestroyAPIView):
+class PaymentStatsView(PaymentFilterMixin, APIView):
+    """
+    Aggregated payment totals for the dashboard.
+
+    Honors the same scoping and query parameters as the payment list, but
+    computes totals and daily/weekly/monthly/yearly buckets in the database
+    instead of returning the individual rows. Pass ``period`` to only compute
+    one bucket series.
+
+    Totals are read from the DailyRevenue rollup, which has at most one row
+    per day, creator and customer. Searches match payment fields the rollup
+    doesn't keep, so they are aggregated from the payments table.
+    """
+    authentication_classes = [CachedJWTAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    PERIODS = {
+        'daily': TruncDay,
+        'weekly': TruncWeek,
+        'monthly': TruncMonth,
+        'yearly': TruncYear,
+    }
+
+    def get(self, request):
+        return cached_response(self, request, ('payments', 'customers', 'users'), lambda: self.get_stats(request))
+
+    def get_stats(self, request):
+        period = request.query_params.get('period')
+        if period and period not in self.PERIODS:
+            return Response(
+                {'error': f"Invalid period '{period}'. Choose from: {', '.join(self.PERIODS)}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        # Clear the default ordering so it doesn't leak into GROUP BY
+        if request.query_params.get('search'):
+            queryset = self.filter_payments(Payment.objects.all()).order_by()
+            date_field, amount, count = 'date', Sum('amount'), Count('id')
+        else:
+            queryset = self.filter_payments(DailyRevenue.objects.all(), rollup=True).order_by()
+            date_field, amount, count = 'day', Sum('amount'), Sum('payment_count')
+
+        totals = queryset.aggregate(total_amount=amount, total_payments=count)
+        data = {
+            'total_amount': totals['total_amount'] or Decimal('0'),
+            'total_payments': totals['total_payments'] or 0,
+        }
+
+        periods = [period] if period else list(self.PERIODS)
+        for name in periods:
+            buckets = (
+                queryset
+                .annotate(period=self.PERIODS[name](date_field, output_field=DateField()))
+                .values('period')
+                .annotate(amount=amount, count=count)
+                .order_by('period')
+            )
+            data[name] = [
+                {'period': bucket['period'], 'amount': bucket['amount'], 'count': bucket['count']}
+                for bucket in buckets
+            ]
+
+        return Response(data)
+
+class PaymentChartView(PaymentFilterMixin, APIView):
+    """
+    Chart-ready payment totals per time bucket (see payments/charts.py).
+
+    ``?bucket=day|week|month|year`` (default month) over
+    ``start_date``..``end_date`` (default: the last few buckets up to
+    today), with the payment list's scoping, ``created_by`` and ``search``.
+    Every bucket in the range is returned, zero-filled, with a label.
+    ``?by_user=1`` splits the totals into one series per creating user.
+
+    Totals come from one GROUP BY over the DailyRevenue rollup, or over
+    payments when searching.
+    """
+    authentication_classes = [CachedJWTAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        # Without an end_date the window ends today, which the cache key
+        # must then cover
+        extra = () if request.query_params.get('end_date') else (datetime.date.today(),)
+        return cached_response(
+            self, request, ('payments', 'customers', 'users'), lambda: self.get_chart(request), extra=extra
+        )
+
+    def get_chart(self, request):
+        bucket = request.query_params.get('bucket', 'month')
+        if bucket not in charts.BUCKETS:
+            raise ValidationError({'bucket': f"Choose from: {', '.join(charts.BUCKETS)}"})
+        try:
+            end = datetime.date.fromisoformat(request.query_params.get('end_date') or datetime.date.today().isoformat())
+            start_date = request.query_params.get('start_date')
+            start = datetime.date.fromisoformat(start_date) if start_date else charts.default_start(end, bucket)
+        except ValueError:
+            raise ValidationError({'date': 'start_date and end_date must be YYYY-MM-DD dates.'})
+        periods = charts.bucket_range(start, end, bucket) if start <= end else []
+        if periods is None:
+            raise ValidationError({'date': f'The range spans more than {charts.MAX_BUCKETS} buckets.'})
+        by_user = request.query_params.get('by_user') in ('1', 'true')
+
+        # Clear the default ordering so it doesn't leak into GROUP BY
+        if request.query_params.get('search'):
+            queryset = self.filter_payments(Payment.objects.all()).filter(
+                date__gte=datetime.datetime.combine(start, datetime.time.min),
+                date__lte=datetime.datetime.combine(end, datetime.time.max),
+            )
+            date_field, amount, count = 'date', Sum('amount'), Count('id')
+        else:
+            queryset = self.filter_payments(DailyRevenue.objects.all(), rollup=True).filter(day__gte=start, day__lte=end)
+            date_field, amount, count = 'day', Sum('amount'), Sum('payment_count')
+
+        group_by = ['bucket', 'created_by', 'created_by__username'] if by_user else ['bucket']
+        rows = (
+            queryset.order_by()
+            .annotate(bucket=charts.BUCKETS[bucket][0](date_field, output_field=DateField()))
+            .values(*group_by)
+            .annotate(amount=amount, count=count)
+        )
+
+        def new_series(user, label):
+            return {'user': user, 'label': label, 'amounts': [Decimal('0')] * len(periods), 'counts': [0] * len(periods)}
+
+        index = {period: i for i, period in enumerate(periods)}
+        series = {} if by_user else {None: new_series(None, 'All payments')}
+        for row in rows:
+            key = row['created_by'] if by_user else None
+            if key not in series:
+                series[key] = new_series(key, row['created_by__username'] or 'Unknown')
+            position = index[row['bucket']]
+            series[key]['amounts'][position] = row['amount']
+            series[key]['counts'][position] = row['count']
+
+        return Response({
+            'bucket': bucket,
+            'start_date': start,
+            'end_date': end,
+            'periods': periods,
+            'labels': [charts.label(period, bucket) for period in periods],
+            'series': sorted(series.values(), key=lambda entry: (entry['user'] is not None, entry['label'])),
+        })
+
+class BulkImportAPIView(APIView):
+    """
+    Create many rows in one request from a JSON array, a ``text/csv`` body or
+    a multipart ``file`` upload. Responds 201 when every row was created, 207
+    when only some were, and 400 when none were; the body lists the errors
+    per (1-based) row.
+    """
+    authentication_classes = [CachedJWTAuthentication]
+    permission_classes = [IsAuthenticated]
+    parser_classes = [JSONParser, CSVParser, MultiPartParser]
+    importer_class = None
+
+    def post(self, request):
+        upload = request.FILES.get('file')
+        if upload is not None:
+            rows = iter_csv_rows(upload)
+        elif isinstance(request.data, (list, Iterator)):
+            rows = request.data
+        else:
+            return Response(
+                {'error': 'Expected a JSON array of rows or a CSV upload'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        report = self.importer_class(request.user).run(rows)
+
+        if not report['errors']:
+            response_status = status.HTTP_201_CREATED
+        elif report['created']:
+            response_status = status.HTTP_207_MULTI_STATUS
+        else:
+            response_status = status.HTTP_400_BAD_REQUEST
+        return Response(report, status=response_status)
+
+class PaymentBulkCreateAPIView(BulkImportAPIView):
+    importer_class = PaymentImporter
+
+class CustomerBulkCreateAPIView(BulkImportAPIView):
+    importer_class = CustomerImporter
+
+class PaymentRetrieveUpdateDestroyAPIView(SparseFieldsMixin, generics.RetrieveUpdateDestroyAPIView):
     serializer_class = PaymentSerializer
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [CachedJWTAuthentication]
     permission_classes = [IsAuthenticated, IsAdminOrOwner]
-    queryset = Payment.objects.all()
+
+    def get_queryset(self):
+        return payment_queryset()
 
     def perform_update(self, serializer):
         serializer.save()
@@ -216,28 +459,187 @@ class PaymentRetrieveUpdateDestroyAPIView(generics.RetrieveUpdateDestroyAPIView)
     def perform_destroy(self, instance):
         instance.delete()
 
-class LogListView(generics.ListAPIView):
+class LogListView(CachedListMixin, FastListMixin, SparseFieldsMixin, generics.ListAPIView):
     serializer_class = LogSerializer
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [CachedJWTAuthentication]
     permission_classes = [IsAuthenticated]
-    filter_backends = [filters.SearchFilter, filters.OrderingFilter]
-    search_fields = ['user__username', 'action', 'description']
-    ordering_fields = ['created_at', 'user__username', 'action']
+    filter_backends = [IndexedSearchFilter, AliasedOrderingFilter]
+    search_fields = ['username', 'action', 'description']
+    ordering_fields = ['created_at', 'username', 'action']
+    # Logs were ordered through the user before they kept the username
+    ordering_aliases = {'user__username': 'username'}
     pagination_class = CustomPagination
+    cursor_ordering = ('-created_at', '-id')
+    cache_namespaces = ('logs', 'users')
     
     def get_queryset(self):
-        queryset = Log.objects.all()
+        queryset = log_queryset()
         user = self.request.user
         
         # Apply access control based on user type
         # Non-admins should only see logs related to their own actions
         if not (user.is_superuser or user.is_staff):
-            print(f"Applying non-admin access control for logs: filtering by user=user")
             queryset = queryset.filter(user=user)
-            print("Log permissions filter applied")
         
         return queryset
 
+class ArchivedLogListView(APIView):
+    """
+    Logs moved out of the database by the archive_logs command (see
+    payments/archive.py). Without ``?month=YYYY-MM`` lists the archived
+    months; with it, pages through that month's entries, newest first,
+    filtered by ``?search=`` and ``?action=`` and scoped like LogListView.
+    """
+    authentication_classes = [CachedJWTAuthentication]
+    permission_classes = [IsAuthenticated]
+    pagination_class = CustomPagination
+
+    def get(self, request):
+        month = request.query_params.get('month')
+        if not month:
+            return Response({'months': [f'{month:%Y-%m}' for month in archive.archived_months()]})
+        try:
+            month = datetime.date.fromisoformat(f'{month}-01')
+        except ValueError:
+            raise ValidationError({'month': 'Expected a month as YYYY-MM.'})
+
+        user = request.user
+        entries = archive.read(
+            month,
+            user_id=None if user.is_superuser or user.is_staff else user.id,
+            action=request.query_params.get('action'),
+            search=request.query_params.get('search'),
+        )
+        if entries is None:
+            return Response({'error': f'No archived logs for {month:%Y-%m}'}, status=status.HTTP_404_NOT_FOUND)
+        paginator = self.pagination_class()
+        if paginator.cursor_query_param in request.query_params:
+            raise ValidationError({'cursor': 'Archived logs are paged with ?page=.'})
+        page = paginator.paginate_queryset(entries, request, view=self)
+        return paginator.get_paginated_response(page)
+
+class CustomerLedgerListView(CachedListMixin, generics.ListAPIView):
+    """
+    Monthly balance per customer (see payments/ledger.py).
+
+    ``?period=YYYY-MM`` picks the month (default: the current one),
+    ``?status=`` one of paid/partial/unpaid, or ``overdue`` for every earlier
+    month with a balance left (optionally limited by ``period``), and
+    ``?customer=`` one customer. Non-admins see the customers they created.
+
+    Read-only: a month's rows are created by the ``open_ledger_period``
+    command and the payment and customer signals.
+    """
+    serializer_class = CustomerLedgerSerializer
+    authentication_classes = [CachedJWTAuthentication]
+    permission_classes = [IsAuthenticated]
+    filter_backends = [filters.OrderingFilter]
+    ordering_fields = ['balance', 'paid', 'expected', 'period', 'customer__name']
+    ordering = ['-period', '-balance', 'id']
+    pagination_class = CustomPagination
+    cache_namespaces = ('payments', 'customers', 'users')
+
+    STATUSES = [choice for choice, _ in CustomerLedger.status_choices] + ['overdue']
+
+    def cache_key_extra(self):
+        # The default period and the overdue cut-off are the current month
+        return (ledger.current_period(),)
+
+    def get_queryset(self):
+        params = self.request.query_params
+        status_filter = params.get('status')
+        if status_filter and status_filter not in self.STATUSES:
+            raise ValidationError({'status': f"Choose from: {', '.join(self.STATUSES)}"})
+        period = None
+        if params.get('period'):
+            try:
+                period = datetime.date.fromisoformat(f"{params['period'][:7]}-01")
+            except ValueError:
+                raise ValidationError({'period': 'Expected YYYY-MM'})
+
+        current = ledger.current_period()
+
+        queryset = CustomerLedger.objects.select_related('customer').only(
+            'id', 'customer', 'period', 'expected', 'paid', 'balance', 'status', 'customer__name'
+        )
+        user = self.request.user
+        if not (user.is_superuser or user.is_staff):
+            queryset = queryset.filter(customer__created_by=user)
+
+        if status_filter == 'overdue':
+            queryset = queryset.filter(status__in=ledger.OUTSTANDING, period__lt=current)
+            if period:
+                queryset = queryset.filter(period=period)
+        else:
+            queryset = queryset.filter(period=period or current)
+            if status_filter:
+                queryset = queryset.filter(status=status_filter)
+
+        customer_id = params.get('customer')
+        if customer_id:
+            if not customer_id.isdigit():
+                raise ValidationError({'customer': 'Expected a customer id'})
+            queryset = queryset.filter(customer_id=customer_id)
+        return queryset
+
+class ExportMixin:
+    """
+    Turns a list view into a streaming file export over the same filters.
+
+    ``?type=csv`` (default) or ``?type=xlsx``. Rows are read with
+    ``values_list(...).iterator()`` so the queryset is never materialized.
+    """
+    http_method_names = ['get', 'head', 'options']
+    export_fields = []  # (column header, queryset lookup) pairs
+    export_filename = 'export'
+
+    EXPORT_TYPES = {
+        'csv': (stream_csv, 'text/csv'),
+        'xlsx': (stream_xlsx, 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'),
+    }
+
+    def list(self, request, *args, **kwargs):
+        export_type = request.query_params.get('type', 'csv')
+        if export_type not in self.EXPORT_TYPES:
+            return Response(
+                {'error': f"Invalid export type '{export_type}'. Choose from: {', '.join(self.EXPORT_TYPES)}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        writer, content_type = self.EXPORT_TYPES[export_type]
+
+        header = [name for name, _ in self.export_fields]
+        rows = (
+            self.filter_queryset(self.get_queryset())
+            .values_list(*[lookup for _, lookup in self.export_fields])
+            .iterator(chunk_size=settings.EXPORT_CHUNK_SIZE)
+        )
+        response = StreamingHttpResponse(writer(header, rows), content_type=content_type)
+        filename = f'{self.export_filename}-{datetime.date.today().isoformat()}.{export_type}'
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
+
+class PaymentExportView(ExportMixin, PaymentListCreateAPIView):
+    export_filename = 'payments'
+    export_fields = [
+        ('ID', 'id'),
+        ('Date', 'date'),
+        ('Customer', 'customer__name'),
+        ('Customer Email', 'customer__email'),
+        ('Amount', 'amount'),
+        ('Description', 'description'),
+        ('Created By', 'created_by__username'),
+    ]
+
+class LogExportView(ExportMixin, LogListView):
+    export_filename = 'logs'
+    export_fields = [
+        ('ID', 'id'),
+        ('Date', 'created_at'),
+        ('User', 'username'),
+        ('Action', 'action'),
+        ('Description', 'description'),
+    ]
+
 class CurrentUserView(APIView):
     permission_classes = [IsAuthenticated]
     
@@ -245,3 +647,64 @@ class CurrentUserView(APIView):
         user = request.user
         serializer = UserSerializer(user)
         return Response(serializer.data)
+
+class CacheStatsView(APIView):
+    """Response cache hit/miss counters (see payments/caching.py)."""
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        return Response(get_counters())
+
+def prometheus_metrics(request):
+    """Per-view request metrics for Prometheus, served to METRICS_ALLOWED_IPS only (see payments/metrics.py)."""
+    if request.META.get('REMOTE_ADDR') not in settings.METRICS_ALLOWED_IPS:
+        return HttpResponseForbidden()
+    return HttpResponse(metrics.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+async def event_stream(request):
+    """
+    Server-Sent Events stream of change events visible to the user (see
+    payments/events.py). EventSource can't send headers, so the access token
+    may be passed as ``?token=``. The stream ends after
+    ``EVENT_STREAM_MAX_AGE`` seconds and the browser reconnects.
+    """
+    if not isinstance(request, ASGIRequest):
+        return JsonResponse({'error': 'The event stream is only served over ASGI'}, status=501)
+
+    authentication = CachedJWTAuthentication()
+    raw_token = request.GET.get('token')
+    if raw_token is None:
+        header = authentication.get_header(request)
+        raw_token = header and authentication.get_raw_token(header)
+    try:
+        if not raw_token:
+            raise InvalidToken('No token given')
+        user = await sync_to_async(authentication.get_user)(authentication.get_validated_token(raw_token))
+    except (InvalidToken, AuthenticationFailed):
+        return JsonResponse({'error': 'Invalid or missing token'}, status=401)
+
+    keepalive = getattr(settings, 'EVENT_STREAM_KEEPALIVE', 15)
+    max_age = getattr(settings, 'EVENT_STREAM_MAX_AGE', 300)
+
+    async def stream():
+        broker = events.get_broker()
+        subscription = broker.subscribe()
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + max_age
+        try:
+            yield 'retry: 5000\n\n'
+            while loop.time() < deadline:
+                try:
+                    event = await subscription.get(min(keepalive, deadline - loop.time()))
+                except asyncio.TimeoutError:
+                    yield ': keepalive\n\n'
+                    continue
+                if events.visible_to(event, user):
+                    yield f"event: {event['kind']}\ndata: {json.dumps(event)}\n\n"
+        finally:
+            broker.unsubscribe(subscription)
+
+    response = StreamingHttpResponse(stream(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
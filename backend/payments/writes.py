@@ -0,0 +1,51 @@
+"""
+Write transactions that are retried while the database is busy.
+
+SQLite has one writer at a time. A writer that can't get the lock within
+the busy timeout fails with "database is locked", and so does a deferred
+transaction whose snapshot went stale (see payments/backends/sqlite). Under
+concurrent POSTs those errors reached the client as 500s.
+
+``run_write(func)`` runs ``func`` in a transaction and, when it fails that
+way, rolls back, sleeps a jittered, doubling delay (``SQLITE_RETRY_DELAY``
+seconds first) and runs it again, up to ``SQLITE_WRITE_RETRIES`` times.
+Everything ``func`` did is undone before a retry, including on_commit
+callbacks, so ``func`` must only have side effects through the database or
+on_commit. Inside an enclosing transaction ``func`` runs in a savepoint
+once: only the outermost transaction can be retried.
+
+The write transactions of the app go through it: the audit log inserts,
+the ledger row creation, bulk import chunks and the rollup, ledger and
+invoice rebuilds. Requests themselves are not wrapped in one transaction:
+with one writer at a time, holding the lock through validation and
+rendering measured slower than committing statement by statement.
+"""
+import logging
+import random
+import time
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, OperationalError, connections, transaction
+
+logger = logging.getLogger(__name__)
+
+BUSY_MESSAGES = ('database is locked', 'database table is locked', 'database is busy')
+
+
+def is_busy(exc):
+    return isinstance(exc, OperationalError) and any(message in str(exc) for message in BUSY_MESSAGES)
+
+
+def run_write(func, using=DEFAULT_DB_ALIAS):
+    """Run ``func`` in a transaction on ``using``, retried while the database is busy."""
+    retries = 0 if connections[using].in_atomic_block else settings.SQLITE_WRITE_RETRIES
+    for attempt in range(retries + 1):
+        try:
+            with transaction.atomic(using=using):
+                return func()
+        except OperationalError as exc:
+            if attempt == retries or not is_busy(exc):
+                raise
+            delay = settings.SQLITE_RETRY_DELAY * 2 ** attempt * random.uniform(0.5, 1.5)
+            logger.info('Database busy, retrying the write in %.0f ms (%s)', delay * 1000, exc)
+            time.sleep(delay)
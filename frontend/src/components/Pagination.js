@@ -7,6 +7,7 @@ const Pagination = ({
   hasPrevious, 
   onPageChange, 
   totalItems,
+  countIsEstimate = false,
   itemsPerPage = 4,
   onPageSizeChange,
   pageSizeOptions = [4, 10, 50, 100]
@@ -91,6 +92,7 @@ const Pagination = ({
             <p className="text-sm text-gray-700">
               Showing <span className="font-medium">{startItem}</span> to{' '}
               <span className="font-medium">{endItem}</span> of{' '}
+              {countIsEstimate && 'about '}
               <span className="font-medium">{totalItems}</span> results
             </p>
           </div>
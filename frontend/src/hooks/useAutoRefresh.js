@@ -1,6 +1,13 @@
 import { useEffect, useRef } from 'react';
+import { subscribeToChanges } from '../services/events';
 
-export const useAutoRefresh = (callback, dependencies = [], interval = 30000) => {
+// Changes arriving within this window trigger a single refresh
+const EVENT_DEBOUNCE = 500;
+
+// Calls `callback` every `interval` ms. When `topics` (e.g. ['payment', 'log'])
+// are given, the page refreshes on matching change events from the server
+// instead, and only polls while the event stream is unavailable.
+export const useAutoRefresh = (callback, dependencies = [], interval = 30000, topics = null) => {
   const intervalRef = useRef(null);
   const callbackRef = useRef(callback);
 
@@ -11,23 +18,49 @@ export const useAutoRefresh = (callback, dependencies = [], interval = 30000) =>
 
   // Set up auto refresh
   useEffect(() => {
-    // Clear existing interval
-    if (intervalRef.current) {
-      clearInterval(intervalRef.current);
-    }
-
-    // Set up new interval
-    intervalRef.current = setInterval(() => {
+    const refresh = () => {
       if (callbackRef.current) {
         callbackRef.current();
       }
-    }, interval);
+    };
 
-    // Cleanup on unmount or dependency change
-    return () => {
+    const startPolling = () => {
+      if (!intervalRef.current) {
+        intervalRef.current = setInterval(refresh, interval);
+      }
+    };
+
+    const stopPolling = () => {
       if (intervalRef.current) {
         clearInterval(intervalRef.current);
+        intervalRef.current = null;
       }
     };
+
+    stopPolling();
+    startPolling();
+
+    if (!topics) {
+      return stopPolling;
+    }
+
+    let debounceTimer = null;
+    const unsubscribe = subscribeToChanges((message) => {
+      if (message.type === 'open') {
+        stopPolling();
+      } else if (message.type === 'error') {
+        startPolling();
+      } else if (topics.includes(message.event.kind)) {
+        clearTimeout(debounceTimer);
+        debounceTimer = setTimeout(refresh, EVENT_DEBOUNCE);
+      }
+    });
+
+    // Cleanup on unmount or dependency change
+    return () => {
+      clearTimeout(debounceTimer);
+      unsubscribe();
+      stopPolling();
+    };
   }, dependencies);
-}; 
\ No newline at end of file
+};
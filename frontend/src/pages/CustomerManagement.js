@@ -49,7 +49,7 @@ const CustomerManagement = () => {
   // Auto refresh data every 30 seconds
   useAutoRefresh(() => {
     fetchCustomers();
-  }, [searchTerm, pagination.currentPage, pagination.itemsPerPage], 30000);
+  }, [searchTerm, pagination.currentPage, pagination.itemsPerPage], 30000, ['customer']);
 
   useEffect(() => {
     const handleClickOutside = (event) => {
@@ -73,7 +73,9 @@ const CustomerManagement = () => {
       setLoading(true);
       const params = {
         page: pagination.currentPage,
-        page_size: pagination.itemsPerPage
+        page_size: pagination.itemsPerPage,
+        // Lists reference the creator by id unless it is expanded
+        expand: 'created_by',
       };
       if (searchTerm) {
         params.search = searchTerm;
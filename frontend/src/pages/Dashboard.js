@@ -59,71 +59,30 @@ const Dashboard = () => {
     return d;
   };
 
-  // Helper to get week number within a year (ISO week date system)
-  const getWeekNumber = (d) => {
-    d = new Date(Date.UTC(d.getFullYear(), d.getMonth(), d.getDate()));
-    d.setUTCDate(d.getUTCDate() + 4 - (d.getUTCDay() || 7));
-    const yearStart = new Date(Date.UTC(d.getUTCFullYear(), 0, 1));
-    const weekNo = Math.ceil((((d - yearStart) / 86400000) + 1) / 7);
-    return weekNo;
+  // Local date as YYYY-MM-DD (toISOString would give the UTC date)
+  const toDateParam = (d) => {
+    const month = String(d.getMonth() + 1).padStart(2, '0');
+    const day = String(d.getDate()).padStart(2, '0');
+    return `${d.getFullYear()}-${month}-${day}`;
   };
 
-  const processPaymentDataForChart = (payments, period) => {
-    const now = new Date();
-    let labels = [];
-    const totalPeriodData = {};
-
+  // Chart bucket and date range for each time period; the chart endpoint
+  // returns a label and a (zero-filled) total for every bucket in the range
+  const getChartParams = (period, now) => {
     if (period === 'daily') {
-      const currentWeekStart = getStartOfWeek(now);
-
-      labels = [];
-      for (let i = 0; i < 7; i++) {
-        const date = new Date(currentWeekStart);
-        date.setDate(currentWeekStart.getDate() + i);
-        labels.push(date.toLocaleDateString('en-US', { month: 'short', day: 'numeric' })); // e.g., Jun 10
-      }
-
-      payments.forEach(p => {
-        const pDate = new Date(p.date);
-        pDate.setHours(0, 0, 0, 0);
-
-        if (pDate >= currentWeekStart && pDate <= now) {
-          const label = pDate.toLocaleDateString('en-US', { month: 'short', day: 'numeric' });
-          totalPeriodData[label] = (totalPeriodData[label] || 0) + parseFloat(p.amount);
-        }
-      });
-
-    } else if (period === 'weekly') {
-      labels = Array.from({ length: 5 }, (_, i) => `Week ${i + 1}`);
-
-      const currentMonthStart = new Date(now.getFullYear(), now.getMonth(), 1);
-      const currentMonthEnd = new Date(now.getFullYear(), now.getMonth() + 1, 0);
-
-      payments.forEach(p => {
-        const pDate = new Date(p.date);
-        if (pDate >= currentMonthStart && pDate <= currentMonthEnd) {
-          const weekNum = getWeekNumber(pDate) - getWeekNumber(currentMonthStart) + 1;
-          if (weekNum <= 5) {
-            totalPeriodData[labels[weekNum - 1]] = (totalPeriodData[labels[weekNum - 1]] || 0) + parseFloat(p.amount);
-          }
-        }
-      });
-
-    } else if (period === 'monthly' || period === 'yearly') {
-      labels = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec'];
-      const currentYear = now.getFullYear();
-
-      payments.forEach(p => {
-        const pDate = new Date(p.date);
-        if (pDate.getFullYear() === currentYear) {
-          totalPeriodData[labels[pDate.getMonth()]] = (totalPeriodData[labels[pDate.getMonth()]] || 0) + parseFloat(p.amount);
-        }
-      });
+      const weekStart = getStartOfWeek(now);
+      const weekEnd = new Date(weekStart);
+      weekEnd.setDate(weekStart.getDate() + 6);
+      return { bucket: 'day', start_date: toDateParam(weekStart), end_date: toDateParam(weekEnd) };
     }
-
-    const totalAmounts = labels.map(label => totalPeriodData[label] || 0);
-
-    return { labels, totalAmounts };
+    if (period === 'weekly') {
+      const monthEnd = new Date(now.getFullYear(), now.getMonth() + 1, 0);
+      return { bucket: 'week', start_date: toDateParam(new Date(now.getFullYear(), now.getMonth(), 1)), end_date: toDateParam(monthEnd) };
+    }
+    if (period === 'monthly') {
+      return { bucket: 'month', start_date: `${now.getFullYear()}-01-01`, end_date: `${now.getFullYear()}-12-31` };
+    }
+    return { bucket: 'year', start_date: `${now.getFullYear() - 4}-01-01`, end_date: `${now.getFullYear()}-12-31` };
   };
 
   useEffect(() => {
@@ -134,7 +93,7 @@ const Dashboard = () => {
   // Auto refresh data every 30 seconds
   useAutoRefresh(() => {
     fetchDashboardData();
-  }, [timePeriod, selectedUser], 30000);
+  }, [timePeriod, selectedUser], 30000, ['payment', 'customer']);
 
   const fetchDashboardData = async () => {
     try {
@@ -160,15 +119,28 @@ const Dashboard = () => {
         endDateParam = now.toISOString().split('T')[0];
       }
 
-      const paymentParams = {};
+      // Stats only feed the totals; asking for one bucket series keeps them cheap
+      const statsParams = { period: 'monthly' };
       if (startDateParam && endDateParam) {
-        paymentParams.start_date = startDateParam;
-        paymentParams.end_date = endDateParam;
-        paymentParams.page_size = 9999; // Request all data for charting
+        statsParams.start_date = startDateParam;
+        statsParams.end_date = endDateParam;
       }
 
-      const [paymentsResponse, customersResponse, logsResponse] = await Promise.all([
-        paymentService.getPayments(paymentParams),
+      // Apply user filter if admin and specific user selected
+      const chartParams = getChartParams(timePeriod, now);
+      if (isAdmin() && selectedUser !== 'all') {
+        chartParams.created_by = selectedUser;
+      }
+
+      const [statsResponse, chartResponse, paymentsResponse, customersResponse, logsResponse] = await Promise.all([
+        paymentService.getPaymentStats(statsParams),
+        paymentService.getPaymentChart(chartParams),
+        paymentService.getPayments({
+          ...statsParams,
+          period: undefined,
+          page_size: 10,
+          fields: 'id,amount,date,description,customer.name,created_by.username',
+        }),
         customerService.getCustomers(),
         logService.getLogs(),
       ]);
@@ -187,32 +159,24 @@ const Dashboard = () => {
       const usersData = usersResponse ? (usersResponse.results || usersResponse) : null;
       const logsData = logsResponse.results || logsResponse;
       
-      console.log('Fetched Payments:', payments);
+      console.log('Fetched Payment Stats:', statsResponse);
       console.log('Fetched Customers:', customers);
       console.log('Fetched Users:', usersData);
       console.log('Fetched Logs:', logsData);
       
-      // Backend now properly filters data based on user role, so no need for client-side filtering
-      const totalAmount = payments.reduce((sum, payment) => sum + parseFloat(payment.amount), 0);
+      // Backend filters and aggregates based on user role, so no need for client-side filtering
+      const totalAmount = parseFloat(statsResponse.total_amount);
       const activeCustomers = customers.filter(customer => customer.is_active).length;
       
       // For user stats, employees might not have access to all users, so handle gracefully
       const activeUsers = usersData ? usersData.filter(user => user.is_active).length : 0;
       const inactiveUsers = usersData ? usersData.filter(user => !user.is_active).length : 0;
 
-      // Apply user filter if admin and specific user selected
-      const chartPayments = (!isAdmin() || selectedUser === 'all') 
-        ? payments 
-        : payments.filter(p => p.customer && p.customer.created_by && p.customer.created_by.id === selectedUser);
-      
-      console.log('Chart Payments:', chartPayments);
-
-      const { labels, totalAmounts } = processPaymentDataForChart(chartPayments, timePeriod);
-      console.log('Processed Chart Labels:', labels);
-      console.log('Processed Total Amounts:', totalAmounts);
+      const labels = chartResponse.labels;
+      const totalAmounts = chartResponse.series[0].amounts.map(amount => parseFloat(amount));
 
       setStats({
-        totalPayments: payments.length,
+        totalPayments: statsResponse.total_payments,
         totalAmount,
         totalCustomers: customers.length,
         activeCustomers,
@@ -17,6 +17,7 @@ const Logs = () => {
     hasNext: false,
     hasPrevious: false,
     totalItems: 0,
+    countIsEstimate: false,
     itemsPerPage: 10
   });
 
@@ -32,7 +33,7 @@ const Logs = () => {
     if (isAdmin && isAdmin()) {
       fetchLogs();
     }
-  }, [isAdmin, pagination.currentPage, pagination.itemsPerPage], 30000);
+  }, [isAdmin, pagination.currentPage, pagination.itemsPerPage], 30000, ['log']);
 
   const fetchLogs = async () => {
     setLoading(true);
@@ -54,6 +55,8 @@ const Logs = () => {
           hasNext: response.has_next || false,
           hasPrevious: response.has_previous || false,
           totalItems: response.count || 0,
+          // Large or searched lists may report an approximate count
+          countIsEstimate: response.count_is_estimate || false,
           itemsPerPage: response.page_size || prev.itemsPerPage
         }));
       } else {
@@ -201,6 +204,7 @@ const Logs = () => {
             hasNext={pagination.hasNext}
             hasPrevious={pagination.hasPrevious}
             totalItems={pagination.totalItems}
+            countIsEstimate={pagination.countIsEstimate}
             itemsPerPage={pagination.itemsPerPage}
             onPageChange={handlePageChange}
             onPageSizeChange={handlePageSizeChange}
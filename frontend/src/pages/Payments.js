@@ -37,6 +37,7 @@ const Payments = () => {
     hasNext: false,
     hasPrevious: false,
     totalItems: 0,
+    countIsEstimate: false,
     itemsPerPage: 10
   });
 
@@ -57,7 +58,7 @@ const Payments = () => {
     if (isAdmin()) {
       fetchUsers();
     }
-  }, [searchTerm, startDate, endDate, pagination.currentPage, pagination.itemsPerPage, selectedUser], 30000);
+  }, [searchTerm, startDate, endDate, pagination.currentPage, pagination.itemsPerPage, selectedUser], 30000, ['payment', 'customer']);
 
   useEffect(() => {
     const handleClickOutside = (event) => {
@@ -103,6 +104,9 @@ const Payments = () => {
         params.created_by = selectedUser;
       }
 
+      // Only what the table shows; naming customer/created_by fields embeds them
+      params.fields = 'id,amount,date,description,customer.id,customer.name,customer.email,created_by.username';
+
       console.log('Fetching payments with params:', params);
       
       const response = await paymentService.getPayments(params);
@@ -117,6 +121,8 @@ const Payments = () => {
           hasNext: response.has_next || false,
           hasPrevious: response.has_previous || false,
           totalItems: response.count || 0,
+          // Large or searched lists may report an approximate count
+          countIsEstimate: response.count_is_estimate || false,
           itemsPerPage: response.page_size || prev.itemsPerPage
         }));
       } else {
@@ -377,7 +383,7 @@ const Payments = () => {
             </div>
             <div className="ml-4">
               <p className="text-sm opacity-75">Total Payments</p>
-              <p className="text-2xl font-bold">{pagination.totalItems}</p>
+              <p className="text-2xl font-bold">{pagination.countIsEstimate && '~'}{pagination.totalItems}</p>
             </div>
           </div>
         </div>
@@ -522,6 +528,7 @@ const Payments = () => {
                   onPageChange={handlePageChange}
                   onPageSizeChange={handlePageSizeChange}
                   totalItems={pagination.totalItems}
+                  countIsEstimate={pagination.countIsEstimate}
                   itemsPerPage={pagination.itemsPerPage}
                 />
               );
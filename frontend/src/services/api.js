@@ -1,6 +1,6 @@
 import axios from 'axios';
 
-const API_BASE_URL = 'http://localhost:8000/api';
+export const API_BASE_URL = 'http://localhost:8000/api';
 
 // Create axios instance
 const api = axios.create({
@@ -10,6 +10,44 @@ const api = axios.create({
   },
 });
 
+// Conditional GETs: keep the ETag and body of recent GET responses and send
+// If-None-Match, so polling an unchanged list gets an empty 304 that is
+// answered from the kept body
+const ETAG_CACHE_SIZE = 100;
+const etagCache = new Map();
+
+api.interceptors.request.use((config) => {
+  if (config.method === 'get' && config.responseType !== 'blob') {
+    const cached = etagCache.get(api.getUri(config));
+    if (cached) {
+      config.headers['If-None-Match'] = cached.etag;
+    }
+    config.validateStatus = (status) => (status >= 200 && status < 300) || status === 304;
+  }
+  return config;
+});
+
+api.interceptors.response.use((response) => {
+  if (response.config.method !== 'get') {
+    return response;
+  }
+  const key = api.getUri(response.config);
+  if (response.status === 304) {
+    const cached = etagCache.get(key);
+    if (cached) {
+      return { ...response, status: 200, data: cached.data };
+    }
+  } else if (response.headers.etag) {
+    // Re-insert so the Map's insertion order tracks recency
+    etagCache.delete(key);
+    etagCache.set(key, { etag: response.headers.etag, data: response.data });
+    if (etagCache.size > ETAG_CACHE_SIZE) {
+      etagCache.delete(etagCache.keys().next().value);
+    }
+  }
+  return response;
+});
+
 // Add token to requests if available
 api.interceptors.request.use(
   (config) => {
@@ -76,6 +114,20 @@ export const userService = {
   },
 };
 
+// Bulk endpoints take either an array of rows or a CSV File upload
+const postBulk = async (url, rowsOrCsvFile) => {
+  if (Array.isArray(rowsOrCsvFile)) {
+    const response = await api.post(url, rowsOrCsvFile);
+    return response.data;
+  }
+  const formData = new FormData();
+  formData.append('file', rowsOrCsvFile);
+  const response = await api.post(url, formData, {
+    headers: { 'Content-Type': 'multipart/form-data' },
+  });
+  return response.data;
+};
+
 // Customer services
 export const customerService = {
   getCustomers: async (params = {}) => {
@@ -97,6 +149,8 @@ export const customerService = {
     const response = await api.delete(`/customers/${id}/`);
     return response.data;
   },
+
+  bulkCreateCustomers: (rowsOrCsvFile) => postBulk('/customers/bulk/', rowsOrCsvFile),
 };
 
 // Payment services
@@ -120,9 +174,21 @@ export const paymentService = {
     const response = await api.delete(`/payments/${id}/`);
     return response.data;
   },
+
+  bulkCreatePayments: (rowsOrCsvFile) => postBulk('/payments/bulk/', rowsOrCsvFile),
+
+  // type: 'csv' or 'xlsx'; other params match getPayments
+  exportPayments: async (params = {}) => {
+    const response = await api.get('/payments/export/', { params, responseType: 'blob' });
+    return response.data;
+  },
   
-  getPaymentStats: async () => {
-    const response = await api.get('/payments/stats/');
+  getPaymentStats: async (params = {}) => {
+    const response = await api.get('/payments/stats/', { params });
+    return response.data;
+  },
+  getPaymentChart: async (params = {}) => {
+    const response = await api.get('/payments/chart/', { params });
     return response.data;
   },
 };
@@ -132,6 +198,11 @@ export const logService = {
     const response = await api.get('/logs/', { params });
     return response.data;
   },
+
+  exportLogs: async (params = {}) => {
+    const response = await api.get('/logs/export/', { params, responseType: 'blob' });
+    return response.data;
+  },
 };
 
 export default api; 
\ No newline at end of file
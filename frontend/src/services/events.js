@@ -0,0 +1,55 @@
+import { API_BASE_URL } from './api';
+
+// One shared EventSource for every subscriber. EventSource can't send an
+// Authorization header, so the access token goes in the query string.
+const listeners = new Set();
+let source = null;
+let connected = false;
+
+const notify = (message) => {
+  listeners.forEach((listener) => listener(message));
+};
+
+const open = () => {
+  const token = localStorage.getItem('token');
+  if (!token || typeof EventSource === 'undefined') {
+    return;
+  }
+  source = new EventSource(`${API_BASE_URL}/events/?token=${encodeURIComponent(token)}`);
+  source.onopen = () => {
+    connected = true;
+    notify({ type: 'open' });
+  };
+  source.onerror = () => {
+    connected = false;
+    notify({ type: 'error' });
+    // A closed source (e.g. 401 or no ASGI server) isn't retried by the browser
+    if (source && source.readyState === EventSource.CLOSED) {
+      source = null;
+    }
+  };
+  ['payment', 'customer', 'log'].forEach((kind) => {
+    source.addEventListener(kind, (event) => {
+      notify({ type: 'change', event: JSON.parse(event.data) });
+    });
+  });
+};
+
+// listener receives { type: 'open' | 'error' } and { type: 'change', event }.
+// Returns an unsubscribe function.
+export const subscribeToChanges = (listener) => {
+  listeners.add(listener);
+  if (!source) {
+    open();
+  } else if (connected) {
+    listener({ type: 'open' });
+  }
+  return () => {
+    listeners.delete(listener);
+    if (listeners.size === 0 && source) {
+      source.close();
+      source = null;
+      connected = false;
+    }
+  };
+};